@@ -68,9 +68,11 @@ def init_pypi_blank(target_dir: str = 'chore/pypi_blank') -> None:
     if you want to repair `chore/pypi_blank/index`, run this command.
     """
     fs.make_dir(f'{target_dir}')
+    fs.make_dir(f'{target_dir}/blobs')
     fs.make_dir(f'{target_dir}/cache')
     fs.make_dir(f'{target_dir}/downloads')
     fs.make_dir(f'{target_dir}/index')
+    fs.make_dir(f'{target_dir}/index/linkplan')
     fs.make_dir(f'{target_dir}/index/snapdep')
     fs.make_dir(f'{target_dir}/installed')
     fs.dump({}, f'{target_dir}/index/id_2_paths.json')
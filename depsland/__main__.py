@@ -21,6 +21,7 @@ from . import __path__
 from . import __version__
 from . import api
 from . import paths
+from .config import controls
 from .depsolver import resolve_dependencies
 from .manifest import T
 from .manifest import get_last_installed_version
@@ -225,6 +226,7 @@ def init(target: str = '.', app_name: str = '') -> None:
 def build(
     manifest: str = '.',
     offline: bool = False,
+    no_cache: bool = False,
     # gen_exe: bool = True,
     # target_system: str = sysinfo.SYSTEM,
 ) -> None:
@@ -235,7 +237,9 @@ def build(
     
     kwargs:
         manifest (-m): see `init : [param] target : [docstring]`.
+        no_cache: resolve dependencies again, ignore the cached snapshot.
     """
+    controls.no_cache = no_cache
     if offline:
         api.build_offline(_normalize_manifest_path(manifest))
     else:
@@ -247,6 +251,8 @@ def publish(
     target: str = '.',
     full_upload: bool = False,
     upload_dependencies: bool = False,
+    make_patches: bool = False,
+    no_cache: bool = False,
 ) -> None:
     """
     publish dist assets to oss.
@@ -259,12 +265,39 @@ def publish(
             which may already exist in oss (they all will be overwritten).
             this option is useful if you found the oss server not work properly.
         upload_dependencies (-d):
+        make_patches (-p): make binary patches of updated assets against -
+            the previous published version. users upgrading from that -
+            version download only the patches.
+        no_cache: resolve dependencies again, ignore the cached snapshot.
     """
+    controls.no_cache = no_cache
     api.publish(
-        _normalize_manifest_path(target), full_upload, upload_dependencies
+        _normalize_manifest_path(target),
+        full_upload,
+        upload_dependencies,
+        make_patches,
     )
 
 
+@cli.cmd()
+def oss_server(
+    root: str = None,
+    host: str = '127.0.0.1',
+    port: int = 8000,
+    token: str = '',
+) -> None:
+    """
+    start a local http server as the oss, for the 'http' oss backend.
+    see `depsland.oss.http_server`.
+    
+    kwargs:
+        root: the served directory, defaults to "<depsland>/oss".
+        token: if set, uploading and deleting require it.
+    """
+    from .oss.http_server import serve
+    serve(root or paths.oss.root, host, port, token)
+
+
 @cli.cmd()
 def install(appid: str, upgrade: bool = True, reinstall: bool = False) -> None:
     """
@@ -367,7 +400,10 @@ def show(appid: str, version: str = None) -> None:
 
 
 @cli.cmd()
-def show_packages(poetry_file: str, save_result: str = None) -> None:
+def show_packages(
+    poetry_file: str, save_result: str = None, no_cache: bool = False
+) -> None:
+    controls.no_cache = no_cache
     pkgs = resolve_dependencies('poetry.lock', fs.parent(poetry_file))
     rows = [('index', 'name', 'version', 'files count')]
     indx = 0
@@ -6,16 +6,19 @@ from lk_utils import fs
 
 from ... import paths
 from ...manifest import T as T0
+from ...manifest import diff_asset_files
 from ...manifest import diff_manifest
 from ...manifest import dump_manifest
 from ...manifest import get_app_info
 from ...manifest import init_manifest
 from ...manifest import load_manifest
 from ...oss import T as T1
+from ...oss import UploadQueue
 from ...oss import get_oss_server
 from ...platform.launcher import bat_2_exe
 from ...platform.system_info import IS_WINDOWS
 from ...pypi import pypi
+from ...utils import binpatch
 from ...utils import init_target_tree
 from ...utils import make_temp_dir
 from ...utils import ziptool
@@ -36,6 +39,7 @@ def main(
     manifest_file: str,
     full_upload: bool = False,
     upload_dependencies: bool = False,
+    make_patches: bool = False,
 ) -> None:
     app_info = get_app_info(manifest_file)
     manifest = load_manifest(manifest_file)
@@ -69,6 +73,7 @@ def main(
             else init_manifest(app_info['appid'], app_info['name'])
         ),
         upload_dependencies=upload_dependencies,
+        make_patches=make_patches,
     )
     
     if oss.type in ('local', 'fake'):
@@ -118,6 +123,7 @@ def _upload(
     manifest_new: T.Manifest,
     manifest_old: T.Manifest,
     upload_dependencies: bool = False,
+    make_patches: bool = False,
 ) -> T.Oss:
     # print(':lv', manifest_new, manifest_old)
     
@@ -136,8 +142,10 @@ def _upload(
     
     oss = get_oss_server(manifest_new['appid'])
     print(oss.path)
+    queue = UploadQueue(oss)
     
     diff = diff_manifest(manifest_new, manifest_old)
+    assets = manifest_new.model['assets']  # updated with delta and patch info.
     
     # -------------------------------------------------------------------------
     
@@ -148,6 +156,12 @@ def _upload(
         
         for action, relpath, (info0, info1) in diff['assets']:
             if action == 'ignore':
+                if info0.delta is not None or info0.patch is not None:
+                    # the objects in oss are unchanged, keep referring to -
+                    # them.
+                    assets[relpath] = info1._replace(
+                        delta=info0.delta, patch=info0.patch
+                    )
                 continue
             
             _print_change(
@@ -157,18 +171,50 @@ def _upload(
                 True,
             )
             
+            # the patch is made from the old objects in oss, so it goes -
+            # before they are replaced.
+            if not (
+                action == 'update' and
+                make_patches and
+                upload_patch(relpath, info0, info1)
+            ):
+                if action != 'append' and info0.patch is not None:
+                    oss.delete(f'{oss.path.assets}/{info0.uid}.patch')
+            
+            delta = _make_delta(info0, info1) if action == 'update' else None
+            if delta is not None:
+                print(':v1', f'pack {len(delta)} files into delta archive')
+                zipped_file = ziptool.compress_files(
+                    f'{root_new}/{relpath}',
+                    delta,
+                    f'{temp_dir}/{info1.uid}.delta.zip',
+                )
+                queue.put(zipped_file, f'{oss.path.assets}/{info1.uid}.delta')
+                assets[relpath] = assets[relpath]._replace(delta=delta)
+            
+            # the full archive is refreshed even if a delta is made. old -
+            # clients do not know about the delta, they would install -
+            # outdated files from a stale full archive.
             if action in ('append', 'update'):
                 zipped_file = _compress_asset(info1, relpath)
             else:
                 zipped_file = None
             
             if action == 'append':
-                oss.upload(zipped_file, f'{oss.path.assets}/{info1.uid}')
+                queue.put(zipped_file, f'{oss.path.assets}/{info1.uid}')
             elif action == 'update':
-                oss.delete(f'{oss.path.assets}/{info0.uid}')
-                oss.upload(zipped_file, f'{oss.path.assets}/{info1.uid}')
+                # if uid is not changed, the upload overwrites it.
+                if info0.uid != info1.uid:
+                    oss.delete(f'{oss.path.assets}/{info0.uid}')
+                queue.put(zipped_file, f'{oss.path.assets}/{info1.uid}')
             else:  # action == 'delete'
                 oss.delete(f'{oss.path.assets}/{info0.uid}')
+            if (
+                action in ('update', 'delete') and
+                info0.delta is not None and
+                delta is None
+            ):
+                oss.delete(f'{oss.path.assets}/{info0.uid}.delta')
     
     def upload_dependencies_() -> None:
         # `depsland.manifest.manifest._diff_dependencies`
@@ -193,17 +239,56 @@ def _upload(
                 zipped_file = None
             
             if action == 'append':
-                oss.upload(
+                queue.put(
                     zipped_file, f'{oss.path.pypi}/{info1["id"]}'
                 )
             elif action == 'update':
                 oss.delete(f'{oss.path.pypi}/{info0["id"]}')
-                oss.upload(
+                queue.put(
                     zipped_file, f'{oss.path.pypi}/{info1["id"]}'
                 )
             else:  # action == 'delete'
                 oss.delete(f'{oss.path.pypi}/{info0["id"]}')
     
+    def upload_patch(
+        relpath: str, info0: T.AssetInfo, info1: T.AssetInfo
+    ) -> bool:
+        """
+        make a binary patch from the previous version to the new one, see -
+        `depsland.utils.binpatch`.
+        returns: False if the patch is not available or not worth it.
+        """
+        if info0.uid != info1.uid:
+            return False
+        if info1.type == 'dir':
+            if (x := diff_asset_files(info1, info0)) is None:
+                return False
+            changed = x[0]
+        
+        path_new = fs.normpath(f'{root_new}/{relpath}')
+        path_old = _fetch_old_asset(info0, fs.basename(path_new))
+        patch_file = f'{temp_dir}/{info1.uid}.patch'
+        if info1.type == 'file':
+            patch = binpatch.make_patch(path_old, path_new)
+            with open(patch_file, 'wb') as f:
+                f.write(patch)
+            patch_size = len(patch)
+            full_size = os.path.getsize(path_new)
+        else:
+            # noinspection PyUnboundLocalVariable
+            patch_size = binpatch.make_dir_patch(
+                path_old, path_new, changed, patch_file
+            )
+            full_size = sum(info1.files[k][0] for k in changed)
+        
+        if patch_size > full_size * 0.5:
+            print(':v1', 'skip patch, it is not much smaller than the files')
+            return False
+        print(':v1', f'patch size: {patch_size} (files: {full_size})')
+        queue.put(patch_file, f'{oss.path.assets}/{info1.uid}.patch')
+        assets[relpath] = assets[relpath]._replace(patch=info0.hash)
+        return True
+    
     # -------------------------------------------------------------------------
     
     def _compress_asset(info: T.AssetInfo, relpath: str) -> T.Path:
@@ -214,6 +299,18 @@ def _upload(
         )
         return zipped_file
     
+    def _fetch_old_asset(info: T.AssetInfo, name: str) -> T.Path:
+        """
+        download the previous version of an asset from oss.
+        """
+        path_m = '{}/{}.old.{}'.format(
+            temp_dir, info.uid, 'zip' if info.type == 'dir' else 'fzip'
+        )
+        path_o = '{}/{}'.format(make_temp_dir(temp_dir), name)
+        oss.download(f'{oss.path.assets}/{info.uid}', path_m)
+        ziptool.extract_file(path_m, path_o, overwrite=True)
+        return path_o
+    
     _lib_root = get_library_root(manifest_new.start_directory)
     
     def _compress_dependency(
@@ -256,6 +353,9 @@ def _upload(
     upload_assets()
     if upload_dependencies:
         upload_dependencies_()
+    # the manifest goes last, clients must not see it before the files it -
+    # refers to.
+    queue.join()
     
     pkl_file = _save_manifest(manifest_new)
     oss.upload(pkl_file, oss.path.manifest)
@@ -287,6 +387,33 @@ def _save_manifest(manifest_new: T.Manifest) -> str:
 # -----------------------------------------------------------------------------
 
 
+def _make_delta(
+    info0: T.AssetInfo, info1: T.AssetInfo
+) -> t.Optional[t.Tuple[str, ...]]:
+    """
+    a dir asset is stored as a full archive "assets/<uid>", which is always -
+    up to date, plus an optional delta archive "assets/<uid>.delta" which -
+    contains all files changed since the delta was started. clients which -
+    have a version since then download only the delta.
+    
+    returns: relpaths to pack in the new delta archive. or None if the delta -
+        should be dropped, because the files are not comparable or the -
+        delta grows too large.
+    """
+    if info0.uid != info1.uid or info1.type != 'dir':
+        return None
+    if (x := diff_asset_files(info1, info0)) is None:
+        return None
+    delta = set(x[0])
+    if info0.delta:
+        delta.update(k for k in info0.delta if k in info1.files)
+    total_size = sum(v[0] for v in info1.files.values())
+    delta_size = sum(info1.files[k][0] for k in delta)
+    if delta_size > total_size * 0.5:
+        return None
+    return tuple(sorted(delta))
+
+
 def _compress(path_i: T.Path, file_o: T.Path) -> T.Path:
     if file_o.endswith('.zip'):
         ziptool.compress_dir(path_i, file_o)
@@ -1,17 +1,24 @@
 import os
+import shutil
 import typing as t
+from concurrent.futures import Future
+from time import time
 
 from lk_utils import Signal
 from lk_utils import fs
 
 from ... import paths
+from ...config import app_settings
 from ...manifest import T as T0
+from ...manifest import diff_asset_files
 from ...manifest import diff_manifest
 from ...manifest import dump_manifest
 from ...manifest import get_last_installed_version
 from ...manifest import init_manifest
 from ...manifest import load_manifest
+from ...oss import DownloadQueue
 from ...oss import T as T1
+from ...oss import download_and_extract
 from ...oss import get_oss_client
 # from ...platform import create_launcher
 from ...platform import sysinfo
@@ -19,7 +26,11 @@ from ...platform.launcher import create_desktop_shortcut
 from ...platform.launcher.make_exe import add_icon_to_exe
 from ...pypi import pypi
 from ...pypi.pypi import LocalPyPI
+from ...utils import binpatch
 from ...utils import make_temp_dir
+from ...utils import run_in_pool
+from ...utils.bytecode import compile_bytecode
+from ...utils.bytecode import find_sources
 from ...utils import ziptool
 from ...verspec import compare_version
 
@@ -29,7 +40,7 @@ class T(T0):
     Oss = T1.Oss
     Path = str
     PackageResolver = t.Union[LocalPyPI, T1.Oss]
-    ProgressStage = t.Literal['assets', 'deps', 'venv', 'cleanup']
+    ProgressStage = t.Literal['assets', 'deps', 'venv', 'cleanup', 'compile']
 
 
 # Signal[stage, total, current, text]
@@ -139,9 +150,18 @@ def _install(
             print(':v3s', 'experimental feature: use oss as package provider')
             package_resolver = oss
     
-    _install_files(manifest_new, manifest_old, oss, dir_m)
-    _install_packages(manifest_new, manifest_old, package_resolver)
+    new_assets = _install_files(manifest_new, manifest_old, oss, dir_m)
+    new_packages = _install_packages(
+        manifest_new, manifest_old, package_resolver
+    )
     _create_launchers(manifest_new)
+    if app_settings.get('install', {}).get('compile_bytecode', True):
+        try:
+            _compile_bytecode(new_assets, new_packages)
+        except Exception as e:
+            # it only speeds up the first launch, the installation is done -
+            # without it.
+            print(':v3', 'compiling bytecode failed, skipped', e)
     
     _save_history(manifest_new['appid'], manifest_new['version'])
     _save_manifest(manifest_new)
@@ -213,12 +233,62 @@ def _install_files(
     manifest_old: T.Manifest,
     oss: T.Oss,
     temp_dir: T.Path,
-) -> None:
+) -> t.List[T.Path]:
+    """
+    returns: paths of appended or updated assets.
+    
+    all the remote files we need are put in a download queue at first, so -
+    they are downloaded concurrently. meanwhile the assets are installed one -
+    by one in the manifest order (an asset may be a child path of another), -
+    each waits only for its own downloads.
+    """
     root0 = manifest_old['start_directory']
     root1 = manifest_new['start_directory']
     _root00 = fs.parent(root0)
     _root10 = fs.parent(root1)
     
+    queue = DownloadQueue(oss)
+    downloads: t.Dict[T.Path, Future] = {}
+    
+    def prefetch(info: T.AssetInfo, kind: str, name: str = '') -> T.Path:
+        """
+        start downloading (if not yet) and return the local path.
+        
+        params:
+            kind: 'full', 'delta' or 'patch'.
+            name: basename of the asset, required by the full archive of dir.
+        returns: for a full archive of dir, it is extracted while downloading, -
+            the path of the extracted dir is returned.
+        """
+        if kind == 'full' and info.type == 'dir':
+            # keep the basename of the asset, see -
+            # `ziptool._move_up_single_dir`.
+            assert name
+            dir_m = fs.normpath(f'{temp_dir}/{info.uid}/{name}')
+            if dir_m not in downloads:
+                downloads[dir_m] = queue.extract(
+                    f'{oss.path.assets}/{info.uid}', dir_m
+                )
+            return dir_m
+        if kind == 'full':
+            key = info.uid
+            ext = 'fzip'
+        elif kind == 'delta':
+            key = f'{info.uid}.delta'
+            ext = 'delta.zip'
+        else:
+            key = f'{info.uid}.patch'
+            ext = 'patch'
+        file = fs.normpath(f'{temp_dir}/{info.uid}.{ext}')
+        if file not in downloads:
+            downloads[file] = queue.put(f'{oss.path.assets}/{key}', file)
+        return file
+    
+    def fetch(info: T.AssetInfo, kind: str, name: str = '') -> T.Path:
+        file = prefetch(info, kind, name)
+        queue.wait(downloads[file])
+        return file
+    
     def copy_from_old(i: str, o: str, t: str) -> None:
         # `o` must not be child path of `i`.
         assert not o.startswith(i + '/')
@@ -229,44 +299,153 @@ def _install_files(
         else:
             fs.copy_tree(i, o, True)
     
-    def download_from_oss(i: str, m: str, o: str) -> None:
+    def download_from_oss(info: T.AssetInfo, o: str) -> None:
         print(fs.relpath(o, _root10))
-        oss.download(i, m)
-        ziptool.extract_file(m, o, overwrite=True)
+        if info.type == 'file':
+            ziptool.extract_file(fetch(info, 'full'), o, overwrite=True)
+        else:
+            m = fetch(info, 'full', fs.basename(o))
+            if os.path.isdir(o):
+                fs.remove_tree(o)
+            elif os.path.exists(o):
+                fs.remove_file(o)
+            fs.make_dirs(fs.parent(o))
+            shutil.move(m, o)
+    
+    def apply_delta(info: T.AssetInfo, o: str) -> None:
+        """
+        extract the delta archive over `o`, which is a copy of the old version.
+        """
+        print(fs.relpath(o, _root10), '(delta)')
+        ziptool.extract_files(fetch(info, 'delta'), o)
+    
+    def can_patch_binary(
+        i: str, info0: T.AssetInfo, info1: T.AssetInfo
+    ) -> bool:
+        if info1.patch is None or info1.patch != info0.hash:
+            return False
+        if not os.path.exists(i):
+            return False
+        if info1.type == 'dir' and diff_asset_files(info1, info0) is None:
+            return False
+        return True
+    
+    def patch_binary(
+        i: str, o: str, info0: T.AssetInfo, info1: T.AssetInfo
+    ) -> bool:
+        """
+        apply the binary patch made against the old version. returns False -
+        if the old files mismatch.
+        """
+        print(fs.relpath(o, _root10), '(patch)')
+        m = fetch(info1, 'patch')
+        try:
+            if info1.type == 'file':
+                with open(m, 'rb') as f:
+                    binpatch.apply_patch(i, f.read(), o)
+            else:
+                copy_from_old(i, o, 'dir')
+                for relpath in diff_asset_files(info1, info0)[1]:
+                    fs.remove_file(f'{o}/{relpath}')
+                binpatch.apply_dir_patch(m, o)
+        except binpatch.PatchError as e:
+            print(':v3', 'failed to apply patch, fall back to download', e)
+            return False
+        return True
+    
+    def can_patch_from_old(
+        i: str, info0: T.AssetInfo, info1: T.AssetInfo
+    ) -> bool:
+        """
+        check if we can reuse the old version of a dir asset, and only -
+        download the files that changed.
+        """
+        if not os.path.isdir(i):
+            return False
+        if (x := diff_asset_files(info1, info0)) is None:
+            return False
+        changed = x[0]
+        return not changed or (
+            info1.delta is not None and set(changed).issubset(info1.delta)
+        )
+    
+    def patch_from_old(
+        i: str, o: str, info0: T.AssetInfo, info1: T.AssetInfo
+    ) -> None:
+        changed, deleted = diff_asset_files(info1, info0)
+        copy_from_old(i, o, 'dir')
+        for relpath in deleted:
+            fs.remove_file(f'{o}/{relpath}')
+        if changed:
+            apply_delta(info1, o)
+        print(':v1', 'patched {} files, removed {} files in "{}"'.format(
+            len(changed), len(deleted), fs.relpath(o, _root10)
+        ))
     
     total_diff = diff_manifest(manifest_new, manifest_old)
     assets_diff = tuple(total_diff['assets'])
     assets_diff_cnt = len(assets_diff)
-    curr_cnt = 0  # 1-based
     
+    # plan how to install each asset, and start downloading what it needs.
+    plans = []  # [(method, action, relpath, info0, info1), ...]
     for action, relpath, (info0, info1) in assets_diff:
-        curr_cnt += 1
-        progress_updated.emit(
-            'assets', assets_diff_cnt, curr_cnt,
-            'updating asset "{}" ({})'.format(relpath, action)
-        )
-        
+        method = None
         if action == 'ignore':
+            if os.path.exists(f'{root0}/{relpath}'):
+                method = 'copy'
+            else:
+                print('turn ignore to append action', relpath)
+                action = 'append'
+        if action == 'update' and info1.type == info0.type:
+            path0 = fs.normpath(f'{root0}/{relpath}')
+            if can_patch_binary(path0, info0, info1):
+                method = 'patch'
+                prefetch(info1, 'patch')
+            elif info1.type == 'dir' and \
+                    can_patch_from_old(path0, info0, info1):
+                method = 'delta'
+                if diff_asset_files(info1, info0)[0]:
+                    prefetch(info1, 'delta')
+        if action in ('append', 'update') and method is None:
+            method = 'full'
+            # the full archive is up to date, the delta is not needed.
+            prefetch(info1, 'full', fs.basename(relpath))
+        plans.append((method, action, relpath, info0, info1))
+    
+    new_assets = []
+    try:
+        for curr_cnt, (method, action, relpath, info0, info1) in enumerate(
+            plans, 1
+        ):
+            progress_updated.emit(
+                'assets', assets_diff_cnt, curr_cnt,
+                'updating asset "{}" ({})'.format(relpath, action)
+            )
+            if method is None:
+                continue
             path0 = fs.normpath(f'{root0}/{relpath}')
             path1 = fs.normpath(f'{root1}/{relpath}')
-            if os.path.exists(path0):
+            if method == 'copy':
                 copy_from_old(path0, path1, info1.type)
                 continue
+            if method == 'patch':
+                if not patch_binary(path0, path1, info0, info1):
+                    if info1.type == 'dir' and \
+                            can_patch_from_old(path0, info0, info1):
+                        patch_from_old(path0, path1, info0, info1)
+                    else:
+                        download_from_oss(info1, path1)
+            elif method == 'delta':
+                patch_from_old(path0, path1, info0, info1)
             else:
-                print('turn ignore to append action')
-                action = 'append'
-        
-        if action in ('append', 'update'):
-            path_i = '{}/{}'.format(oss.path.assets, info1.uid)  # an url
-            path_m = fs.normpath(  # an intermediate file (zip)
-                '{}/{}.{}'.format(
-                    temp_dir,
-                    info1.uid,
-                    'zip' if info1.type == 'dir' else 'fzip',
-                )
-            )
-            path_o = fs.normpath(f'{root1}/{relpath}')  # a file or a directory
-            download_from_oss(path_i, path_m, path_o)
+                download_from_oss(info1, path1)
+            new_assets.append(path1)
+        queue.join()
+    except BaseException:
+        queue.cancel()
+        raise
+    
+    return new_assets
 
 
 def _install_packages(
@@ -274,10 +453,13 @@ def _install_packages(
     manifest_old: T.Manifest,
     # package_resolver: t.Literal['oss', 'pypi'] = 'pypi',
     package_resolver: T.PackageResolver = pypi,
-) -> None:
+) -> t.List[T.Path]:
+    """
+    returns: install paths of newly fetched packages.
+    """
     if not manifest_new['dependencies']:
         print('no dependency for this project')
-        return
+        return []
     
     total_diff = diff_manifest(manifest_new, manifest_old)
     deps_diff = tuple(total_diff['dependencies'])
@@ -315,10 +497,10 @@ def _install_packages(
                 # this case should always be False in production environment. -
                 # but may be True in development environment.
                 return
-            dl_path = pypi.download_one(
-                info['id'],
-                info['appendix'] and info['appendix'].get('custom_url')
-            )
+            if not (dl_path := predownloaded.get(info['id'])):
+                dl_path = pypi.download_one(
+                    info['id'], _get_custom_url(info)
+                )
             pypi.install_one(info['id'], dl_path)
         
         def oss_download_and_install(info: T.PackageInfo) -> None:
@@ -336,41 +518,74 @@ def _install_packages(
             )
             fs.make_dirs('{}/{}'.format(paths.pypi.installed, info['name']))
             
-            _oss.download(resource_path, download_path)
-            ziptool.extract_file(download_path, install_path, True)
+            download_and_extract(
+                _oss, resource_path, install_path, download_path
+            )
             pypi.index.update_index(info['id'], download_path, install_path)
         
-        # FIXME: thread_pool makes pip install stucked, and ctrl+c cannot -
-        #   terminate the process.
-        # we will have IO heavy tasks, so promoting max workers is fine.
-        # http://c.biancheng.net/view/2627.html
-        # https://stackoverflow.com/questions/42541893
-        # thread_pool = ThreadPoolExecutor(max_workers=len(tasks_ignitor))
-        # tasks = [
-        #     thread_pool.submit(download_and_install, info)
-        #     for info in tasks_ignitor
-        # ]
-        # for x in tasks: x.result()
-        
         if package_resolver is pypi:
             resolve = pip_download_and_install
+            # fetch all missing packages in one pip call, the rest of work -
+            # (installing) goes to the worker pool below. if batch downloading -
+            # failed, each worker downloads its package by itself.
+            progress_updated.emit(
+                'deps', len(tasks_ignitor), 0, 'downloading dependencies'
+            )
+            try:
+                predownloaded = pypi.download_many(
+                    (info['id'], _get_custom_url(info))
+                    for info in tasks_ignitor
+                    if info['id'] not in pypi.index.id_2_paths
+                )
+            except Exception as e:
+                print(':v3', 'batch downloading failed, fall back to download '
+                      'packages one by one', e)
+                predownloaded = {}
         else:
             _oss: T.Oss = package_resolver
             resolve = oss_download_and_install
         
-        for i, info in enumerate(tasks_ignitor, 1):
+        # packages are independent to each other, we download and install -
+        # them in a bounded worker pool, so that the downloading of one -
+        # package overlaps with the installing of another.
+        # ctrl+c is handled by the pool: it cancels the pending jobs and -
+        # terminates running pip processes.
+        for i, (info, _) in enumerate(run_in_pool(
+            resolve,
+            tasks_ignitor,
+            max_workers=app_settings['pypi'].get('max_workers', 4),
+        ), 1):
             progress_updated.emit(
                 'deps', len(tasks_ignitor), i,
-                'fetching dependency "{}"'.format(info['id'])
+                'fetched dependency "{}"'.format(info['id'])
             )
-            resolve(info)
     
     progress_updated.emit('cleanup', 2, 1, 'linking venv')
     venv_dir = paths.apps.make_packages(
         manifest_new['appid'], manifest_new['version'], clear_exists=True
     )
     if has_new_packages:
-        pypi.linking(package_ids, venv_dir)
+        import_index = app_settings.get('venv', {}).get('import_index', True)
+        old_venv_dir = paths.apps.get_packages(
+            manifest_old['appid'], manifest_old['version']
+        )
+        if app_settings.get('venv', {}).get('mode', 'symlink') == 'pth':
+            pypi.linking(package_ids, venv_dir, mode='pth')
+        elif (
+            app_settings.get('venv', {}).get('incremental', True) and
+            manifest_old['version'] != '0.0.0' and
+            manifest_old['dependencies'] and
+            os.path.isdir(old_venv_dir)
+        ):
+            pypi.relinking(
+                (info0['id'] for _, _, (info0, _) in deps_diff if info0),
+                package_ids,
+                venv_dir,
+                base_dir=old_venv_dir,
+                import_index=import_index,
+            )
+        else:
+            pypi.linking(package_ids, venv_dir, import_index=import_index)
     else:
         def fast_link_venv(dst_dir: T.Path) -> None:
             print('fast link venv from old version')
@@ -385,6 +600,42 @@ def _install_packages(
         fast_link_venv(venv_dir)
     
     pypi.index.save_index()
+    return [pypi.get_install_path(x['id']) for x in tasks_ignitor]
+
+
+def _compile_bytecode(
+    new_assets: t.Iterable[T.Path], new_packages: t.Iterable[T.Path]
+) -> None:
+    """
+    compile ".py" files of newly installed assets and packages, so that the -
+    first launch of the app does not have to.
+    files in `pypi/installed` never change, they use unchecked-hash pycs. -
+    assets use checked-hash pycs, their mtime is not reliable after being -
+    extracted from archives.
+    """
+    start = time()
+    tasks = (
+        (find_sources(new_packages), 'UNCHECKED_HASH'),
+        (find_sources(new_assets, skip_compiled=False), 'CHECKED_HASH'),
+    )
+    total = sum(len(files) for files, _ in tasks)
+    if not total:
+        return
+    finished = 0
+    for files, mode in tasks:
+        for count in compile_bytecode(files, mode):
+            progress_updated.emit(
+                'compile', total, finished + count, 'compiling bytecode'
+            )
+        finished += len(files)
+    progress_updated.emit(
+        'compile', total, total,
+        'compiled {} files in {:.1f}s'.format(total, time() - start)
+    )
+
+
+def _get_custom_url(info: T.PackageInfo) -> t.Optional[str]:
+    return info['appendix'] and info['appendix'].get('custom_url')
 
 
 def _create_launchers(manifest: T.Manifest) -> None:
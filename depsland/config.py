@@ -11,9 +11,12 @@ __all__ = ['app_settings', 'auto_saved', 'controls']
 class T:
     # noinspection PyTypedDict
     AppSettings = t.TypedDict('AppSettings', {
-        'oss' : t.TypedDict('Oss', {
-            'server': t.Literal['aliyun', 'local', 'fake'],
-            'config': t.Union[
+        'oss'    : t.TypedDict('Oss', {
+            'server'           : t.Literal['aliyun', 'http', 'local', 'fake'],
+            'chunked'          : bool,
+            'chunk_cache_limit': int,
+            'max_workers'      : int,
+            'config'           : t.Union[
                 t.TypedDict('AliyunOssConfig', {
                     'user_role'    : str,
                     'access_key'   : str,
@@ -21,6 +24,11 @@ class T:
                     'endpoint'     : str,
                     'bucket_name'  : str,
                 }),
+                t.TypedDict('HttpOssConfig', {
+                    'url'    : str,
+                    'token'  : str,
+                    'timeout': float,
+                }),
                 t.TypedDict('LocalOssConfig', {
                     'symlinks': bool,
                 }),
@@ -29,12 +37,27 @@ class T:
                 }),
             ]
         }),
-        'pip' : t.TypedDict('Pip', {
+        'install': t.TypedDict('Install', {
+            'compile_bytecode': bool,
+        }),
+        'pip'    : t.TypedDict('Pip', {
             'index_url': str,
             'quiet'    : bool,
         }),
-        'pypi': t.TypedDict('PyPI', {
+        'publish': t.TypedDict('Publish', {
+            'hash_algorithm': t.Literal['md5', 'xxh3', 'blake3', 'auto'],
+        }),
+        'pypi'   : t.TypedDict('PyPI', {
             'update_interval': int,
+            'max_workers'    : int,
+            'blob_store'     : bool,
+            'index_backend'  : t.Literal['json', 'sqlite'],
+            'snapdep_limit'  : int,
+        }),
+        'venv'   : t.TypedDict('Venv', {
+            'import_index': bool,
+            'incremental' : bool,
+            'mode'        : t.Literal['symlink', 'pth'],
         }),
     })
     
@@ -49,9 +72,10 @@ class T:
     ]
 
 
-class GlobalControls:  # TODO: no usage yet.
+class GlobalControls:
     debug_mode = False
     ignore_old_manifest = False
+    no_cache = False  # do not read `pypi/index/snapdep` snapshots.
 
 
 app_settings: T.AppSettings = load(paths.config.depsland)
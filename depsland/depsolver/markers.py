@@ -0,0 +1,207 @@
+"""
+evaluate PEP 508 environment markers, e.g.:
+    python_version >= "3.10" and sys_platform == "win32"
+    (platform_machine == "arm64" or "freebsd" in sys_platform) and extra == "x"
+
+ref: https://packaging.python.org/en/latest/specifications/dependency -
+    -specifiers/#environment-markers
+"""
+import os
+import platform as _platform
+import re
+import sys
+import typing as t
+from functools import lru_cache
+
+from ..verspec import match_version
+from ..verspec import version_key
+
+
+class T:
+    Environment = t.Dict[str, str]
+    Marker = str
+    Node = t.Union[
+        t.Tuple[str, str, str],  # ('<lhs>', '<op>', '<rhs>')
+        t.Tuple[str, t.List['Node']],  # ('and' | 'or', [node, ...])
+    ]
+
+
+class InvalidMarker(Exception):
+    pass
+
+
+def default_environment() -> T.Environment:
+    """
+    the marker values of the current interpreter.
+    """
+    impl = sys.implementation
+    impl_ver = '{0.major}.{0.minor}.{0.micro}'.format(impl.version)
+    if impl.version.releaselevel != 'final':
+        impl_ver += impl.version.releaselevel[0] + str(impl.version.serial)
+    return {
+        'implementation_name'           : impl.name,
+        'implementation_version'        : impl_ver,
+        'os_name'                       : os.name,
+        'platform_machine'              : _platform.machine(),
+        'platform_python_implementation': _platform.python_implementation(),
+        'platform_release'              : _platform.release(),
+        'platform_system'               : _platform.system(),
+        'platform_version'              : _platform.version(),
+        'python_full_version'           : _platform.python_version(),
+        'python_version'                : '.'.join(
+            _platform.python_version_tuple()[:2]
+        ),
+        'sys_platform'                  : sys.platform,
+    }
+
+
+def evaluate_marker(
+    marker: T.Marker,
+    env: T.Environment = None,
+    extras: t.Iterable[str] = (),
+) -> bool:
+    """
+    params:
+        env: if not given, use `default_environment()`. a partial dict is -
+            also acceptable, it updates the default one.
+        extras: the requested extras. a marker with `extra == "..."` is true -
+            if any of them matches.
+    """
+    if not marker or not marker.strip():
+        return True
+    env = {**_get_default_environment(), **(env or {})}
+    node = _parse(marker)
+    for extra in tuple(extras) or ('',):
+        env['extra'] = _normalize_extra(extra)
+        if _evaluate(node, env):
+            return True
+    return False
+
+
+# -----------------------------------------------------------------------------
+
+
+_default_env = None
+_TOKEN = re.compile(
+    r'''
+    \s*(
+        \( | \)
+        | '[^']*' | "[^"]*"
+        | === | == | != | <= | >= | ~= | < | >
+        | not\s+in\b | in\b | and\b | or\b
+        | [a-zA-Z_][a-zA-Z0-9_.]*
+    )
+    ''',
+    re.X,
+)
+_VERSION_OPERATORS = ('<', '<=', '==', '!=', '>=', '>', '~=')
+
+
+def _get_default_environment() -> T.Environment:
+    global _default_env
+    if _default_env is None:
+        _default_env = default_environment()
+    return _default_env
+
+
+def _normalize_extra(extra: str) -> str:
+    return re.sub(r'[-_.]+', '-', extra).lower()
+
+
+def _tokenize(marker: T.Marker) -> t.List[str]:
+    tokens = []
+    pos = 0
+    marker = marker.rstrip()
+    while pos < len(marker):
+        m = _TOKEN.match(marker, pos)
+        if not m:
+            raise InvalidMarker(marker, pos)
+        tokens.append(re.sub(r'\s+', ' ', m.group(1)))
+        pos = m.end()
+    return tokens
+
+
+@lru_cache(maxsize=None)
+def _parse(marker: T.Marker) -> T.Node:
+    tokens = _tokenize(marker)
+    pos = 0
+    
+    def peek() -> t.Optional[str]:
+        return tokens[pos] if pos < len(tokens) else None
+    
+    def take() -> str:
+        nonlocal pos
+        if pos >= len(tokens):
+            raise InvalidMarker('unexpected end', marker)
+        pos += 1
+        return tokens[pos - 1]
+    
+    def parse_or() -> T.Node:
+        nodes = [parse_and()]
+        while peek() == 'or':
+            take()
+            nodes.append(parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+    
+    def parse_and() -> T.Node:
+        nodes = [parse_atom()]
+        while peek() == 'and':
+            take()
+            nodes.append(parse_atom())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+    
+    def parse_atom() -> T.Node:
+        if peek() == '(':
+            take()
+            node = parse_or()
+            if take() != ')':
+                raise InvalidMarker('unclosed parenthesis', marker)
+            return node
+        lhs, op, rhs = take(), take(), take()
+        if op not in (*_VERSION_OPERATORS, '===', 'in', 'not in'):
+            raise InvalidMarker('unknown operator', op, marker)
+        return lhs, op, rhs
+    
+    out = parse_or()
+    if pos != len(tokens):
+        raise InvalidMarker('unexpected token', tokens[pos], marker)
+    return out
+
+
+def _evaluate(node: T.Node, env: T.Environment) -> bool:
+    if len(node) == 2:
+        kind, children = node
+        if kind == 'and':
+            return all(_evaluate(x, env) for x in children)
+        else:
+            return any(_evaluate(x, env) for x in children)
+    
+    lhs, op, rhs = node
+    is_extra = 'extra' in (lhs, rhs)
+    lhs, rhs = _resolve_value(lhs, env), _resolve_value(rhs, env)
+    if is_extra:
+        lhs, rhs = _normalize_extra(lhs), _normalize_extra(rhs)
+    if op == 'in':
+        return lhs in rhs
+    if op == 'not in':
+        return lhs not in rhs
+    if op == '===':
+        return lhs == rhs
+    if version_key(lhs).epoch >= 0 and version_key(rhs).epoch >= 0:
+        #   both are valid versions. (invalid ones get epoch -1.)
+        return match_version(lhs, op, rhs)
+    if op == '==':
+        return lhs == rhs
+    if op == '!=':
+        return lhs != rhs
+    return False
+
+
+def _resolve_value(token: str, env: T.Environment) -> str:
+    if token[0] in '\'"':
+        return token[1:-1]
+    # some old markers use dots, e.g. 'python.version', 'os.name'.
+    key = token.replace('.', '_')
+    if key not in env:
+        raise InvalidMarker('unknown variable', token)
+    return env[key]
@@ -0,0 +1,292 @@
+"""
+resolve "poetry.lock" without running poetry.
+
+`poetry_lock_resolver_2` asks poetry (`poetry show`, `poetry show -t` and -
+`poetry env info`) for the top-level names and the packages available on -
+current platform. each call takes seconds because of poetry's import cost.
+here we read "pyproject.toml" for the top-level names, and walk the -
+dependency graph in "poetry.lock" from them, evaluating markers by -
+ourselves (see `.markers`).
+"""
+import re
+import typing as t
+from collections import defaultdict
+
+from lk_utils import fs
+
+from .markers import T as T1
+from .markers import default_environment
+from .markers import evaluate_marker
+from .poetry_lock_resolver_2 import T as T0
+from ..normalization import normalize_name
+from ..verspec import match_version
+from ..verspec import version_key
+from ..venv.target_venv import get_library_root
+from ..venv.target_venv.indexer import analyze_records
+from ..venv.target_venv.indexer import index_all_package_references
+
+
+class T(T0):
+    Environment = T1.Environment
+    Extras = t.FrozenSet[str]
+    LockPackage = dict  # an item of `poetry_data['package']`
+    Requirement = t.Tuple[T0.PackageName, Extras]
+
+
+def resolve_poetry_lock(
+    pyproj_file: str, poetry_file: str, env: T.Environment = None
+) -> T.Packages:
+    """
+    params:
+        env: marker values of the target platform, see -
+            `.markers.default_environment`. if not given, use the current -
+            interpreter.
+    """
+    env = {**default_environment(), **(env or {})}
+    pyproj_root = fs.parent(pyproj_file)
+    pyproj_data = fs.load(pyproj_file, 'toml')
+    poetry_data = fs.load(poetry_file, 'toml')
+    
+    top_reqs = tuple(_get_top_requirements(pyproj_data, env))
+    tiled_pkgs = _walk_dependencies(poetry_data, top_reqs, env)
+    print(
+        ':v1', 'resolved {} top names, {} packages from poetry.lock'.format(
+            len(top_reqs), len(tiled_pkgs)
+        )
+    )
+    return dict(_fill_packages_info(pyproj_root, tiled_pkgs))
+
+
+# -----------------------------------------------------------------------------
+
+
+def _get_top_requirements(
+    pyproj_data: dict, env: T.Environment
+) -> t.Iterator[T.Requirement]:
+    """
+    yields names from:
+        - "project.dependencies" (PEP 621)
+        - "tool.poetry.dependencies", if "project.dependencies" is absent.
+        - "tool.poetry.group.<group>.dependencies", except "dev" group and -
+            optional groups. (this is the same as what `poetry_lock -
+            _resolver_2._get_top_package_names` got from `poetry show -t`.)
+    """
+    project = pyproj_data.get('project', {})
+    poetry = pyproj_data.get('tool', {}).get('poetry', {})
+    
+    if 'dependencies' in project:
+        for line in project['dependencies']:
+            if req := _parse_pep508_requirement(line, env):
+                yield req
+    else:
+        yield from _parse_poetry_dependencies(
+            poetry.get('dependencies', {}), env
+        )
+    
+    for group_name, group in poetry.get('group', {}).items():
+        if group_name == 'dev' or group.get('optional'):
+            continue
+        yield from _parse_poetry_dependencies(
+            group.get('dependencies', {}), env
+        )
+
+
+def _walk_dependencies(
+    poetry_data: dict,
+    top_reqs: t.Iterable[T.Requirement],
+    env: T.Environment,
+) -> t.Dict[T.PackageName, T.LockPackage]:
+    """
+    returns: packages which are required on the target platform.
+    """
+    lock_pkgs: t.Dict[T.PackageName, t.List[T.LockPackage]] = defaultdict(list)
+    for item in poetry_data['package']:
+        lock_pkgs[normalize_name(item['name'])].append(item)
+    
+    resolved: t.Dict[T.PackageName, T.LockPackage] = {}
+    requested_extras: t.Dict[T.PackageName, t.Set[str]] = defaultdict(set)
+    queue: t.List[T.Requirement] = list(top_reqs)
+    
+    while queue:
+        name, extras = queue.pop()
+        if name in resolved and extras <= requested_extras[name]:
+            continue
+        if (item := _pick_locked_package(lock_pkgs.get(name), env)) is None:
+            print(':v3', 'package not found in poetry.lock', name)
+            continue
+        resolved[name] = item
+        requested_extras[name].update(extras)
+        
+        extra_names = {
+            normalize_name(re.match(r'[-\w.]+', x).group())
+            for e in requested_extras[name]
+            for x in item.get('extras', {}).get(e, ())
+        }
+        for dep_name, specs in item.get('dependencies', {}).items():
+            dep_name = normalize_name(dep_name)
+            for spec in (specs if isinstance(specs, list) else (specs,)):
+                if isinstance(spec, str):
+                    spec = {'version': spec}
+                if spec.get('optional') and dep_name not in extra_names:
+                    continue
+                if not _check_poetry_spec(
+                    spec, env, requested_extras[name]
+                ):
+                    continue
+                queue.append((dep_name, frozenset(spec.get('extras', ()))))
+                break
+    
+    return resolved
+
+
+def _fill_packages_info(
+    pyproj_root: str, tiled_pkgs: t.Dict[T.PackageName, T.LockPackage]
+) -> t.Iterator[t.Tuple[T.PackageName, T.PackageInfo]]:
+    def get_custom_url() -> t.Optional[str]:
+        source = item.get('source', {})
+        if source.get('type') == 'legacy':
+            if source['reference'] in (  # TODO
+                'likianta-host', 'likianta-hosted'
+            ):
+                return '{}/{}/{}'.format(
+                    source['url'],
+                    name.replace('_', '-'),
+                    item['files'][0]['file']
+                )
+    
+    lib_root = get_library_root(pyproj_root)
+    all_pkg_refs = dict(index_all_package_references(lib_root))
+    print(pyproj_root, lib_root, len(all_pkg_refs), len(tiled_pkgs), ':l')
+    
+    for name, item in sorted(tiled_pkgs.items()):
+        ver = item['version']
+        record_file = '{}/RECORD'.format(all_pkg_refs[name][1])
+        relpaths = tuple(sorted(analyze_records(record_file)))
+        if url := get_custom_url():
+            appendix = {'custom_url': url}
+        else:
+            appendix = {}
+        info: T.PackageInfo = {
+            'id'      : f'{name}-{ver}',
+            'name'    : name,
+            'version' : ver,
+            'files'   : relpaths,
+            'appendix': appendix,  # noqa
+        }
+        yield name, info
+
+
+# -----------------------------------------------------------------------------
+
+
+def _check_poetry_spec(
+    spec: dict, env: T.Environment, extras: t.Iterable[str] = ()
+) -> bool:
+    """
+    check "markers", "python" and "platform" fields of a poetry dependency -
+    spec. for example:
+        {version = ">=4.0", markers = "python_version < \"3.11\""}
+        {version = "^1.0", python = "^3.10", platform = "win32"}
+    """
+    if (x := spec.get('markers')) and not evaluate_marker(x, env, extras):
+        return False
+    if (x := spec.get('python')) and not _match_poetry_constraint(
+        env['python_full_version'], x
+    ):
+        return False
+    if (x := spec.get('platform')) and x != env['sys_platform']:
+        return False
+    return True
+
+
+def _match_poetry_constraint(version: str, constraint: str) -> bool:
+    """
+    poetry's constraint syntax, e.g. '^3.8', '~3.10', '>=3.8,<4.0', -
+    '>=3.8 <4.0', '3.9.*', '<3.9 || >=3.10'.
+    """
+    def match_one(c: str) -> bool:
+        if c in ('', '*'):
+            return True
+        if c.startswith(('^', '~')) and not c.startswith('~='):
+            base = c[1:].strip()
+            nums = [int(x) for x in re.match(r'\d+(?:\.\d+)*', base)
+                    .group().split('.')]
+            if c[0] == '^':
+                # bump the first non-zero component.
+                i = next((i for i, x in enumerate(nums) if x), len(nums) - 1)
+            else:
+                # '~1.2.3' -> '<1.3', '~1' -> '<2'
+                i = min(1, len(nums) - 1)
+            upper = nums[:i] + [nums[i] + 1]
+            return (
+                match_version(version, '>=', base) and
+                match_version(version, '<', '.'.join(map(str, upper)))
+            )
+        m = re.match(r'(===|==|!=|<=|>=|~=|<|>)?\s*(.+)', c)
+        op, ver = m.group(1) or '==', m.group(2)
+        if ver.endswith('.*'):
+            prefix = tuple(map(int, ver[:-2].split('.')))
+            release = version_key(version).release + (0,) * len(prefix)
+            matched = release[:len(prefix)] == prefix
+            return matched if op == '==' else not matched
+        return match_version(version, op, ver)
+    
+    for alternative in constraint.split('||'):
+        parts = re.split(r'\s*,\s*|\s+(?=[<>=!~^])', alternative.strip())
+        if all(match_one(x.strip()) for x in parts):
+            return True
+    return False
+
+
+def _parse_pep508_requirement(
+    line: str, env: T.Environment
+) -> t.Optional[T.Requirement]:
+    """
+    e.g. "streamlit[charts] >=1.40.0; python_version != '3.9.7'"
+    returns: None if markers are not satisfied.
+    """
+    line, _, marker = line.partition(';')
+    if marker and not evaluate_marker(marker, env):
+        return None
+    m = re.match(r'\s*([-\w.]+)\s*(?:\[([^]]*)])?', line)
+    extras = frozenset(
+        x.strip() for x in (m.group(2) or '').split(',') if x.strip()
+    )
+    return normalize_name(m.group(1)), extras
+
+
+def _parse_poetry_dependencies(
+    deps: dict, env: T.Environment
+) -> t.Iterator[T.Requirement]:
+    for name, specs in deps.items():
+        if name == 'python':
+            continue
+        for spec in (specs if isinstance(specs, list) else (specs,)):
+            if isinstance(spec, str):
+                spec = {'version': spec}
+            if spec.get('optional'):
+                continue
+            if _check_poetry_spec(spec, env):
+                yield normalize_name(name), frozenset(spec.get('extras', ()))
+                break
+
+
+def _pick_locked_package(
+    candidates: t.Optional[t.List[T.LockPackage]], env: T.Environment
+) -> t.Optional[T.LockPackage]:
+    """
+    poetry may lock multiple versions of one package for different markers. -
+    pick the one matches the target platform.
+    """
+    if not candidates:
+        return None
+    if len(candidates) == 1:
+        return candidates[0]
+    for item in candidates:
+        markers = item.get('markers', '')
+        if isinstance(markers, dict):  # {group: marker, ...}
+            if any(evaluate_marker(x, env) for x in markers.values()):
+                return item
+        elif evaluate_marker(markers, env):
+            return item
+    return None
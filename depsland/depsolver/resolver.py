@@ -5,13 +5,16 @@ from functools import cache
 from lk_utils import fs
 from lk_utils import run_cmd_args
 
-from .poetry_lock_resolver_2 import resolve_poetry_lock
+from .poetry_lock_resolver_3 import resolve_poetry_lock
 from .requirements_lock import resolve_requirements_lock
+from .snapshot import get_snapshot_key
+from .snapshot import load_snapshot
+from .snapshot import save_snapshot
 # from .requirements_lock import T as T0
-from .. import paths
 from .. import utils
 from ..normalization import normalize_name
 from ..pypi import pypi
+from ..venv.target_venv import get_library_root
 
 index = pypi.index
 
@@ -49,13 +52,14 @@ def resolve_dependencies(
     
     if isinstance(deps0, str):
         assert deps0 in ('poetry.lock', 'pyproject.toml', 'requirements.lock')
-        specfile = f'{proj_dir}/{deps0}'
+        lib_root = get_library_root(proj_dir)
+    elif isinstance(deps0, list):
+        lib_root = None
     else:
-        specfile = None
-    lock_file = _get_snapshot_file(specfile or deps0)
-    # raise Exception
-    if fs.exists(lock_file):
-        return fs.load(lock_file)
+        raise NotImplementedError
+    snapshot_key = get_snapshot_key(deps0, proj_dir, lib_root)
+    if (out := load_snapshot(snapshot_key)) is not None:
+        return out
     
     print(
         'the first time building dependencies tree, this may take a while...',
@@ -73,8 +77,6 @@ def resolve_dependencies(
             out = resolve_requirements_lock(a, b, c)
         else:  # NOTE (2024-07-01): currently this is mainly used.
             out = resolve_poetry_lock(a, b)
-        fs.dump(out, lock_file)
-        return out
     
     elif isinstance(deps0, list):
         raw_requirements = '\n'.join(deps0)
@@ -110,21 +112,6 @@ def resolve_dependencies(
     else:
         raise Exception
     
-    fs.dump(out, lock_file)
+    save_snapshot(snapshot_key, out)
     return out
 
-
-def _get_snapshot_file(deps0: T.Dependencies0) -> str:
-    if isinstance(deps0, str):
-        hash = utils.get_file_hash(deps0)[::4]  # 8 chars
-    elif isinstance(deps0, list):
-        raw_requirements = '\n'.join(deps0)
-        hash = utils.get_content_hash(raw_requirements)[::4]  # 8 chars
-    elif isinstance(deps0, dict):
-        raise NotImplementedError
-    else:
-        raise Exception
-    
-    print(f'snapdep/{hash}.pkl', ':p')
-    lock_file = f'{paths.pypi.snapdep}/{hash}.pkl'
-    return lock_file
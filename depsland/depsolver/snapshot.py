@@ -0,0 +1,144 @@
+"""
+cache the resolved dependencies in `pypi/index/snapdep/<key>.pkl`.
+
+the key is a sha256 digest of everything that may change the result:
+    - the spec files (pyproject.toml, poetry.lock, requirements.lock), or -
+        the requirement list.
+    - the interpreter tag, because markers are evaluated against the -
+        current interpreter.
+    - stamps (size and mtime) of `*.dist-info/RECORD` in the library root, -
+        because the file lists of packages are read from there.
+
+the least recently used snapshots are evicted when the count exceeds -
+`app_settings['pypi']['snapdep_limit']`.
+"""
+import hashlib
+import os
+import platform
+import sys
+import typing as t
+
+from lk_utils import fs
+
+from ..config import app_settings
+from ..config import controls
+from ..paths import pypi as pypi_paths
+from ..utils.fs import atomic_write
+from ..utils.fs import sha256_file
+
+
+class T:
+    Dependencies0 = t.Union[str, t.List[str]]
+    Key = str  # sha256 hex digest
+    Packages = t.Dict[str, dict]
+
+
+# bump it when the structure of resolved result changes.
+_SCHEMA = 1
+
+
+def get_snapshot_key(
+    deps0: T.Dependencies0, proj_dir: str, lib_root: str = None
+) -> T.Key:
+    """
+    params:
+        deps0: a spec file name ('poetry.lock', 'pyproject.toml', -
+            'requirements.lock'), or a list of requirements.
+        lib_root: the "site-packages" folder of the project venv. only -
+            used when `deps0` is a file name.
+    """
+    sha256 = hashlib.sha256()
+    
+    def update(*parts: t.Any) -> None:
+        for x in parts:
+            sha256.update(x if isinstance(x, bytes) else str(x).encode())
+            sha256.update(b'\0')
+    
+    update(_SCHEMA, _get_interpreter_tag())
+    
+    if isinstance(deps0, str):
+        for n in sorted({'pyproject.toml', 'poetry.lock', deps0}):
+            file = f'{proj_dir}/{n}'
+            update(n)
+            if os.path.exists(file):
+                update(sha256_file(file))
+        if lib_root:
+            for name, size, mtime in _get_record_stamps(lib_root):
+                update(name, size, mtime)
+    else:
+        for line in deps0:
+            update(line)
+    
+    return sha256.hexdigest()
+
+
+def load_snapshot(key: T.Key) -> t.Optional[T.Packages]:
+    if controls.no_cache:
+        return None
+    file = _get_snapshot_file(key)
+    if not os.path.exists(file):
+        return None
+    try:
+        out = fs.load(file)
+    except Exception as e:
+        print(':v3', 'broken snapshot, ignored', file, e)
+        return None
+    os.utime(file)  # mark it as recently used.
+    print(':v1', 'hit snapshot', f'snapdep/{key[:8]}...')
+    return out
+
+
+def save_snapshot(key: T.Key, packages: T.Packages) -> None:
+    file = _get_snapshot_file(key)
+    with atomic_write(file) as tmp:
+        fs.dump(packages, tmp, 'pickle')
+    evict_snapshots()
+
+
+def evict_snapshots(limit: int = None) -> int:
+    """
+    remove the least recently used snapshots, keep at most `limit` files.
+    
+    returns: count of removed files.
+    """
+    if limit is None:
+        limit = app_settings['pypi'].get('snapdep_limit', 100)
+    files = sorted(
+        (f for f in os.scandir(pypi_paths.snapdep)
+         if f.name.endswith('.pkl')),
+        key=lambda f: f.stat().st_mtime,
+        reverse=True,
+    )
+    removed = 0
+    for f in files[limit:]:
+        try:
+            os.remove(f.path)
+            removed += 1
+        except FileNotFoundError:  # removed by another process.
+            pass
+    return removed
+
+
+# -----------------------------------------------------------------------------
+
+
+def _get_interpreter_tag() -> str:
+    return '{}-{}-{}'.format(
+        sys.implementation.cache_tag, sys.platform, platform.machine()
+    )
+
+
+def _get_record_stamps(
+    lib_root: str
+) -> t.Iterator[t.Tuple[str, int, int]]:
+    for d in sorted(os.scandir(lib_root), key=lambda x: x.name):
+        if d.name.endswith('.dist-info'):
+            try:
+                st = os.stat(f'{d.path}/RECORD')
+            except FileNotFoundError:
+                continue
+            yield d.name, st.st_size, st.st_mtime_ns
+
+
+def _get_snapshot_file(key: T.Key) -> str:
+    return f'{pypi_paths.snapdep}/{key}.pkl'
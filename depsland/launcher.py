@@ -4,6 +4,7 @@ TODO: rethink which situation to use this launcher, is it be used like as
     related: ./__main__.py > def run()
 """
 import os
+import runpy
 import subprocess
 import sys
 from importlib.util import find_spec
@@ -17,8 +18,12 @@ def run(appid: str, version: str, command: str, error_output='terminal'):
     assert os.path.exists(app_dir)
     
     os.chdir(app_dir)
-    sys.path.insert(0, paths.apps.get_packages(appid, version))
+    pkg_dir = paths.apps.get_packages(appid, version)
+    sys.path.insert(0, pkg_dir)
     sys.path.insert(0, app_dir)
+    if os.path.exists(x := f'{pkg_dir}/sitecustomize.py'):
+        # see `depsland.venv.venv_hook`.
+        runpy.run_path(x)
     
     try:
         exec(dedent(command), globals(), locals())
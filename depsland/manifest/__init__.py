@@ -2,6 +2,7 @@ from .appinfo import T
 from .appinfo import get_app_info
 from .appinfo import get_last_installed_version
 from .appinfo import get_last_released_version
+from .manifest import diff_asset_files
 from .manifest import diff_manifest
 from .manifest import dump_manifest
 from .manifest import init_manifest
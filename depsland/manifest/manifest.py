@@ -1,22 +1,34 @@
+import copyreg
 import os
+import pickle
 import shlex
 import sys
 import typing as t
 from collections import namedtuple
 from functools import cache
+from itertools import chain
 
 from lk_utils import fs
 from lk_utils.textwrap import dedent
 
 from .. import normalization as norm
+from .. import paths
+from ..config import app_settings
 from ..depsolver import T as T0
 from ..depsolver import resolve_dependencies
+from ..utils import HashCache
 from ..utils import get_content_hash
-from ..utils import get_file_hash
 from ..utils import get_updated_time
 from ..utils import init_target_tree
 
 
+# see `_update_assets`.
+_hash_cache = HashCache(
+    paths.project.hash_cache,
+    app_settings.get('publish', {}).get('hash_algorithm', 'md5'),
+)
+
+
 # noinspection PyTypedDict
 class T(T0):
     AbsPath = RelPath = AnyPath = str
@@ -42,8 +54,24 @@ class T(T0):
                 ('type', t.Literal['file', 'dir']),
                 ('scheme', Scheme1),
                 ('utime', int),  # updated time
-                ('hash', str),  # if type is dir, the hash is empty
+                ('hash', str),  # if type is dir, the hash is empty -
+                #   unless `files` is available.
                 ('uid', str),  # the uid will be used as key to filename in oss.
+                ('files', t.Optional[AssetFiles := t.Dict[
+                    RelPath,  # relative to the asset dir.
+                    t.Tuple[int, str],  # (size, hash)
+                ]]),
+                #   only for dirs with scheme 'all'. for other assets (or -
+                #   manifests generated by old depsland) it is None.
+                ('delta', t.Optional[t.Tuple[RelPath, ...]]),
+                #   files packed in the delta archive "assets/<uid>.delta", -
+                #   which should be extracted over the full archive -
+                #   "assets/<uid>". None means there is no delta archive. see -
+                #   `depsland.api.dev_api.publish._upload.upload_assets`.
+                ('patch', t.Optional[str]),
+                #   the hash of the previous version, which the binary patch -
+                #   "assets/<uid>.patch" applies to. None means no patch. see -
+                #   `depsland.utils.binpatch`.
             ),
         ),
     ]
@@ -200,6 +228,20 @@ def dump_manifest(manifest: 'Manifest', file: T.AnyPath) -> None:
     manifest.dump_to_file(file)
 
 
+def diff_asset_files(
+    new: T.AssetInfo, old: T.AssetInfo
+) -> t.Optional[t.Tuple[t.List[T.RelPath], t.List[T.RelPath]]]:
+    """
+    returns: (changed, deleted) file relpaths in the asset dir. or None if -
+        any side has no file list.
+    """
+    if new.files is None or old.files is None:
+        return None
+    changed = [k for k, v in new.files.items() if old.files.get(k) != v]
+    deleted = [k for k in old.files if k not in new.files]
+    return changed, deleted
+
+
 def diff_manifest(new: 'Manifest', old: 'Manifest') -> T.ManifestDiff:
     return {
         'assets'      : _diff_assets(
@@ -216,7 +258,23 @@ def diff_manifest(new: 'Manifest', old: 'Manifest') -> T.ManifestDiff:
 # -----------------------------------------------------------------------------
 
 
-AssetInfo = namedtuple('AssetInfo', ('type', 'scheme', 'utime', 'hash', 'uid'))
+AssetInfo = namedtuple(
+    'AssetInfo',
+    ('type', 'scheme', 'utime', 'hash', 'uid', 'files', 'delta', 'patch'),
+    defaults=(None, None, None),  # compatible with old manifest.pkl.
+)
+
+
+class _ManifestPickler(pickle.Pickler):
+    """
+    used by `Manifest.dump_to_file` only. `AssetInfo` is pickled with its -
+    first 5 fields, so that old depsland versions can still load -
+    "manifest.pkl". the others are stored under the "assets_ext" key.
+    """
+    dispatch_table = {
+        **copyreg.dispatch_table,
+        AssetInfo: lambda x: (AssetInfo, tuple(x[:5])),
+    }
 
 
 class Manifest:
@@ -279,6 +337,11 @@ class Manifest:
             data0: T.Manifest1 = fs.load(self._file)
             data1 = data0
             data1['start_directory'] = self._start_directory
+            if ext := data1.pop('assets_ext', None):
+                data1['assets'] = {
+                    k: AssetInfo(*v[:5], *ext[k]) if k in ext else v
+                    for k, v in data1['assets'].items()
+                }
             if icon_relpath := data0['launcher']['icon']:
                 data1['launcher']['icon'] = '{}/{}'.format(
                     self._start_directory, icon_relpath
@@ -363,11 +426,18 @@ class Manifest:
             #     data0['launcher']['icon'],
             #     ':vl'
             # )
-        if not file.endswith('.pkl'):
-            data0['assets'] = self._plainify_assets(data1['assets'])
-            if file.endswith('.toml'):
-                data0 = {'tool': {'depsland': {'manifest': data0}}}  # noqa
+        if file.endswith('.pkl'):
+            data0['assets_ext'] = {
+                k: tuple(v[5:]) for k, v in data1['assets'].items()
+                if any(x is not None for x in v[5:])
+            }
+            with open(file, 'wb') as f:
+                _ManifestPickler(f).dump(data0)
+            return
         
+        data0['assets'] = self._plainify_assets(data1['assets'])
+        if file.endswith('.toml'):
+            data0 = {'tool': {'depsland': {'manifest': data0}}}  # noqa
         fs.dump(data0, file)
     
     def make_tree(self, root: str = None) -> None:
@@ -517,7 +587,11 @@ class Manifest:
         """
         def generate_hash(abspath: str, ftype: str) -> str:
             if ftype == 'file':
-                return get_file_hash(abspath)
+                return file_hashes[abspath]
+            if (files := generate_files(abspath)) is not None:
+                return get_content_hash('\n'.join(
+                    '{}:{}'.format(k, v[1]) for k, v in sorted(files.items())
+                ))
             if calculate_dir_hash:
                 meta_info = []
                 for d in fs.findall_dirs(abspath):
@@ -538,7 +612,15 @@ class Manifest:
         def generate_uid(ftype: str, relpath: str) -> str:
             return get_content_hash(f'{ftype}:{relpath}')
         
-        out = {}
+        def generate_files(abspath: str) -> t.Optional[T.AssetFiles]:
+            if abspath not in dir_files:
+                return None
+            return {
+                relpath: (os.path.getsize(path), file_hashes[path])
+                for relpath, path in dir_files[abspath]
+            }
+        
+        items = []
         for path, scheme in assets0.items():
             if scheme == '':
                 scheme = 'all'
@@ -556,12 +638,33 @@ class Manifest:
             # minor fix relpath
             if relpath == '.': relpath = ''
             ftype = 'file' if os.path.isfile(abspath) else 'dir'
+            items.append((relpath, abspath, ftype, scheme))
+        
+        # a dir with scheme 'all' records its files, so that it can be -
+        # diffed (and published, installed) file by file.
+        dir_files = {
+            abspath: [(f.relpath, f.path) for f in fs.findall_files(abspath)]
+            for _, abspath, ftype, scheme in items
+            if ftype == 'dir' and scheme == 'all'
+        }
+        
+        # file digests are computed in bulk: unchanged files (by size, mtime -
+        # and inode) are read from the cache, others are hashed in parallel.
+        file_hashes = _hash_cache.get_hashes(chain(
+            (x[1] for x in items if x[2] == 'file'),
+            (path for v in dir_files.values() for _, path in v),
+        ))
+        _hash_cache.save()
+        
+        out = {}
+        for relpath, abspath, ftype, scheme in items:
             out[relpath] = AssetInfo(
                 type=ftype,
                 scheme=scheme,
                 utime=generate_utime(abspath, ftype),
                 hash=generate_hash(abspath, ftype),
                 uid=generate_uid(ftype, relpath),
+                files=generate_files(abspath),
             )
         return out  # noqa
     
@@ -636,8 +739,19 @@ def _diff_assets(new: T.Assets1, old: T.Assets1) -> T.AssetsDiff:
             return False
         if new.type != old.type:
             return False
-        if new.type == 'file' and new.hash == old.hash:
-            return True
+        if new.type == 'file':
+            if new.hash == old.hash:
+                return True
+            # digests of the same algorithm are decisive, don't fall back -
+            # to utime (a modified file may keep its mtime, e.g. when -
+            # extracted from an archive).
+            if _hash_algorithm(new.hash) == _hash_algorithm(old.hash):
+                return False
+        if new.type == 'dir' and new.files is not None and \
+                old.files is not None:
+            # a file may be modified in place without changing the mtime of -
+            # any dir, so the file list is decisive.
+            return new.hash == old.hash
         if new.utime == old.utime:  # FIXME: used for dir only?
             return True
         if new.type == 'dir' and new.hash == old.hash != '':
@@ -659,6 +773,11 @@ def _diff_assets(new: T.Assets1, old: T.Assets1) -> T.AssetsDiff:
             yield 'ignore', key1, (info0, info1)
 
 
+def _hash_algorithm(digest: str) -> str:
+    """ see `depsland.utils.fs.get_file_hash`. """
+    return digest.split(':', 1)[0] if ':' in digest else 'md5'
+
+
 def _diff_dependencies(new: T.Packages, old: T.Packages) -> T.DependenciesDiff:
     info0: T.PackageInfo
     info1: T.PackageInfo
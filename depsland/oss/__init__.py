@@ -1,3 +1,11 @@
+from .async_oss import AsyncBaseOss
+from .async_oss import gather
+from .async_oss import run_sync
+from .chunked import ChunkedOss
 from .get_oss import T
 from .get_oss import get_oss as get_oss_server
 from .get_oss import get_oss as get_oss_client
+from .http_oss import HttpOss
+from .transfer import DownloadQueue
+from .transfer import UploadQueue
+from .transfer import download_and_extract
@@ -1,3 +1,6 @@
+import typing as t
+
+
 class BaseOss:
     type = 'base'
     path: 'BaseOssPath'
@@ -11,9 +14,19 @@ class BaseOss:
     def download(self, link: str, file: str) -> None:
         raise NotImplementedError
     
+    def download_stream(self, link: str) -> t.Iterator[bytes]:
+        """
+        yield the content in blocks while downloading. it is not resumable, -
+        the caller should fall back to `download` if the stream breaks.
+        """
+        raise NotImplementedError
+    
     def delete(self, link: str) -> None:
         raise NotImplementedError
     
+    def exists(self, link: str) -> bool:
+        raise NotImplementedError
+    
     @staticmethod
     def _update_progress(desc: str, curr_bytes: int, total_bytes: int) -> None:
         print('{}: {:.2%}'.format(desc, curr_bytes / total_bytes), end='\r')
@@ -1,7 +1,9 @@
 import atexit
+import os
 import typing as t
 from functools import partial
 from os.path import basename
+from time import sleep
 
 from lk_utils import fs
 
@@ -15,6 +17,16 @@ if __name__ == '__main__':
     from oss2 import Auth
     from oss2 import Bucket
 
+# files larger than this are uploaded / downloaded in parts (ranges), by -
+# `_PART_THREADS` threads. an interrupted transfer resumes from the finished -
+# parts, the checkpoints are kept in "temp/oss_upload" and "temp/oss_download".
+_MULTIPART_THRESHOLD = 20 * 1024 * 1024
+_PART_SIZE = 8 * 1024 * 1024
+_PART_THREADS = 4
+# a download failed by network or server errors is retried (resuming from -
+# the checkpoint), with a backoff of 1, 2, 4... seconds.
+_RETRIES = 4
+
 
 class AliyunOss(BaseOss):
     type = 'aliyun'
@@ -62,24 +74,76 @@ class AliyunOss(BaseOss):
         if x := link.startswith(self.path.pypi + '/'):
             if name in self._pypi:
                 return
-        self._bucket.put_object_from_file(
-            link, file, progress_callback=partial(
-                self._update_progress, f'uploading {name}'
+        if os.path.getsize(file) >= _MULTIPART_THRESHOLD:
+            self._upload_multipart(file, link)
+        else:
+            self._bucket.put_object_from_file(
+                link, file, progress_callback=partial(
+                    self._update_progress, f'uploading {name}'
+                )
             )
-        )
         if x:
             self._pypi.add(name)
             self._pypi_has_changed = True
         print(':rpt2', f'upload done [cyan]({name})[/]')
     
+    def _upload_multipart(self, file: str, link: str) -> None:
+        from oss2 import ResumableStore
+        from oss2 import determine_part_size
+        from oss2 import resumable_upload
+        resumable_upload(
+            self._bucket,
+            link,
+            file,
+            store=ResumableStore(root=paths.temp.root, dir='oss_upload'),
+            multipart_threshold=_MULTIPART_THRESHOLD,
+            part_size=determine_part_size(
+                os.path.getsize(file), preferred_size=_PART_SIZE
+            ),
+            num_threads=_PART_THREADS,
+            progress_callback=partial(
+                self._update_progress, f'uploading {basename(file)}'
+            ),
+        )
+    
     def download(self, link: str, file: str) -> None:
+        from oss2 import ResumableDownloadStore
+        from oss2 import resumable_download
         name = basename(file)
-        # noinspection PyUnusedLocal
-        resp = self._bucket.get_object_to_file(
-            link, file, progress_callback=partial(
-                self._update_progress, f'downloading {name}'
-            )
-        )
+        for i in range(_RETRIES + 1):
+            try:
+                resumable_download(
+                    self._bucket,
+                    link,
+                    file,
+                    store=ResumableDownloadStore(
+                        root=paths.temp.root, dir='oss_download'
+                    ),
+                    multiget_threshold=_MULTIPART_THRESHOLD,
+                    part_size=_PART_SIZE,
+                    num_threads=_PART_THREADS,
+                    progress_callback=partial(
+                        self._update_progress, f'downloading {name}'
+                    ),
+                )
+                break
+            except Exception as e:
+                if i == _RETRIES or not _is_transient(e):
+                    raise
+                print(':v3', 'download failed, retry in {}s ({}/{})'.format(
+                    2 ** i, i + 1, _RETRIES
+                ), name, e)
+                sleep(2 ** i)
+        print(':rpt2', f'download done [cyan]({name})[/]')
+    
+    def download_stream(self, link: str) -> t.Iterator[bytes]:
+        name = basename(link)
+        resp = self._bucket.get_object(link, progress_callback=partial(
+            self._update_progress, f'downloading {name}'
+        ))
+        # the crc64 of the whole object is checked by oss2 when the response -
+        # is read to the end.
+        yield from iter(lambda: resp.read(1024 * 1024), b'')
         print(':rpt2', f'download done [cyan]({name})[/]')
     
     def delete(self, link: str) -> None:
@@ -95,6 +159,9 @@ class AliyunOss(BaseOss):
             self._bucket.delete_object(link)
         print(':rpt2', f'[dim]delete done [cyan]({name})[/][/]')
     
+    def exists(self, link: str) -> bool:
+        return self._bucket.object_exists(link)
+    
     def pypi_sync(self) -> None:  # not used for now
         self.upload(
             self.path.local_manifest,
@@ -102,6 +169,21 @@ class AliyunOss(BaseOss):
         )
 
 
+def _is_transient(e: Exception) -> bool:
+    """
+    network errors, crc mismatches and 5xx responses are worth a retry, -
+    others (e.g. 403, 404) are not.
+    """
+    from oss2.exceptions import InconsistentError
+    from oss2.exceptions import RequestError
+    from oss2.exceptions import ServerError
+    if isinstance(e, (RequestError, InconsistentError)):
+        return True
+    if isinstance(e, ServerError):
+        return e.status >= 500
+    return False
+
+
 class AliyunOssPath(BaseOssPath):
     def __init__(self, appid: str) -> None:
         super().__init__(appid)
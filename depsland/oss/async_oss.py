@@ -0,0 +1,127 @@
+"""
+asyncio interface of any `BaseOss`.
+
+the backends are built on blocking libraries (oss2, http.client, file copy), -
+so `AsyncBaseOss` runs their calls in one bounded thread pool. any number of -
+transfers can be awaited (or gathered) at the same time, while at most -
+`max_workers` of them are running, no matter how many files there are. a -
+backend with native async io can subclass `AsyncBaseOss` and override the -
+coroutines.
+
+usage:
+    aoss = AsyncBaseOss(get_oss_client(appid))
+    # in a coroutine:
+    await gather(*(aoss.download(link, file) for link, file in items))
+    # or from sync code:
+    aoss.download_all(items)
+"""
+import asyncio
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from ._base import BaseOss
+from ..config import app_settings
+
+_T = t.TypeVar('_T')
+
+
+class AsyncBaseOss:
+    
+    def __init__(self, oss: BaseOss, max_workers: int = None) -> None:
+        if max_workers is None:
+            max_workers = app_settings['oss'].get('max_workers', 4)
+        self.oss = oss
+        self.path = oss.path
+        self.type = oss.type
+        self._pool = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+    
+    def __getattr__(self, item: str) -> t.Any:
+        # the blocking methods (and others) are still available, e.g. -
+        # `aoss.make_link`.
+        return getattr(self.oss, item)
+    
+    async def upload(self, file: str, link: str) -> None:
+        await self._run(self.oss.upload, file, link)
+    
+    async def download(self, link: str, file: str) -> None:
+        await self._run(self.oss.download, link, file)
+    
+    async def download_stream(self, link: str) -> t.AsyncIterator[bytes]:
+        stream = iter(self.oss.download_stream(link))
+        try:
+            while (data := await self._run(next, stream, None)) is not None:
+                yield data
+        finally:
+            await self._run(stream.close)
+    
+    async def delete(self, link: str) -> None:
+        await self._run(self.oss.delete, link)
+    
+    async def exists(self, link: str) -> bool:
+        return await self._run(self.oss.exists, link)
+    
+    # -------------------------------------------------------------------------
+    # sync wrappers of batch operations.
+    
+    def upload_all(self, items: t.Iterable[t.Tuple[str, str]]) -> None:
+        """
+        params:
+            items: [(file, link), ...]
+        """
+        run_sync(gather(*(self.upload(f, k) for f, k in items)))
+    
+    def download_all(self, items: t.Iterable[t.Tuple[str, str]]) -> None:
+        """
+        params:
+            items: [(link, file), ...]
+        """
+        run_sync(gather(*(self.download(k, f) for k, f in items)))
+    
+    def exists_all(self, links: t.Iterable[str]) -> t.List[bool]:
+        return run_sync(gather(*(self.exists(x) for x in links)))
+    
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+    
+    # -------------------------------------------------------------------------
+    
+    async def _run(self, func: t.Callable[..., _T], *args: t.Any) -> _T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(func, *args))
+
+
+async def gather(*aws: t.Awaitable[_T]) -> t.List[_T]:
+    """
+    like `asyncio.gather`, but once any of them failed (or the gathering is -
+    cancelled), the others are cancelled before the error is re-raised. -
+    note a job already running in the thread pool cannot be stopped, it is -
+    left to finish in background.
+    
+    returns: results in the same order of `aws`.
+    """
+    tasks = [asyncio.ensure_future(x) for x in aws]
+    if not tasks:
+        return []
+    try:
+        done, _ = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_EXCEPTION
+        )
+        for x in done:
+            if x.exception() is not None:
+                raise x.exception()
+    except BaseException:
+        for x in tasks:
+            x.cancel()
+        # let the cancelled tasks finish their cleanup.
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return [x.result() for x in tasks]
+
+
+def run_sync(coro: t.Coroutine[t.Any, t.Any, _T]) -> _T:
+    """
+    run a coroutine from sync code. it cannot be called inside a running -
+    event loop, `await` it there instead.
+    """
+    return asyncio.run(coro)
@@ -0,0 +1,245 @@
+"""
+content-defined chunked storage on top of any `BaseOss`.
+
+a large file is split into chunks at content-defined boundaries, each chunk -
+is stored by its sha256 digest at "<root>/chunks/<digest>". the object at -
+the original link becomes a small index file, which lists the chunks. since -
+the boundaries depend on the content (not the offset), an archive with a few -
+changed members shares most of its chunks with the previous version, only -
+the new chunks are uploaded.
+
+the client side keeps downloaded chunks in `paths.temp.chunks`, so an update -
+only downloads the chunks it does not have.
+
+the index file is self-describing (starts with `_MAGIC`), so `download` -
+(and `download_stream`) works for both plain objects and indexes. only the uploading side needs -
+`app_settings['oss']['chunked']` turned on.
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import typing as t
+from collections import Counter
+from uuid import uuid1
+
+from ._base import BaseOss
+from .. import paths
+from ..utils.chunking import find_chunks
+from ..utils.fs import atomic_write
+from ..utils.fs import sha256_file
+
+_MAGIC = b'depsland-chunks:1\n'
+
+# an anchor is `_PATTERN` plus a 4-bit crc mask test. in random-like data -
+# (archives are mostly deflated) it appears every 1MB on average. see -
+# `depsland.utils.chunking`.
+_PATTERN = re.compile(b'\\x8a\\x3f')
+_MIN_SIZE = 256 * 1024
+_MAX_SIZE = 8 * 1024 * 1024
+
+
+class T:
+    Chunk = t.Tuple[str, int]  # (digest, size)
+    Index = t.TypedDict('Index', {'size': int, 'chunks': t.List[Chunk]})
+
+
+class ChunkedOss(BaseOss):
+    
+    def __init__(
+        self,
+        oss: BaseOss,
+        chunked_upload: bool = False,
+        cache_limit: int = 1024,
+    ) -> None:
+        """
+        params:
+            chunked_upload: if False, `upload` passes through to `oss`. -
+                `download` always understands indexes.
+            cache_limit: max size (MB) of the local chunk cache.
+        """
+        self.oss = oss
+        self.path = oss.path
+        self.type = oss.type
+        self._cache_limit = cache_limit * 1024 * 1024
+        self._chunked_upload = chunked_upload
+        self._uploaded: t.Set[str] = set()
+        # downloads may run concurrently (see `.transfer.DownloadQueue`), the -
+        # chunks being assembled must not be evicted by others.
+        self._in_use: t.Counter[str] = Counter()
+        self._lock = threading.Lock()
+    
+    def __getattr__(self, item: str) -> t.Any:
+        # e.g. `AliyunOss.bucket`, `AliyunOss.make_link`.
+        return getattr(self.oss, item)
+    
+    @property
+    def chunks_root(self) -> str:
+        return f'{self.path.root}/chunks'
+    
+    def upload(self, file: str, link: str) -> None:
+        if not self._chunked_upload or os.path.getsize(file) <= _MAX_SIZE:
+            self.oss.upload(file, link)
+            return
+        
+        index: T.Index = {'size': os.path.getsize(file), 'chunks': []}
+        uploaded_count = uploaded_size = 0
+        with open(file, 'rb') as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as m:
+            for start, size in find_chunks(
+                m, _MIN_SIZE, _MAX_SIZE, _PATTERN, 0x0F
+            ):
+                data = m[start:start + size]
+                digest = hashlib.sha256(data).hexdigest()
+                index['chunks'].append((digest, size))
+                if self._has_chunk(digest):
+                    continue
+                tmp = _get_temp_file()
+                with open(tmp, 'wb') as g:
+                    g.write(data)
+                try:
+                    self.oss.upload(tmp, f'{self.chunks_root}/{digest}')
+                finally:
+                    os.remove(tmp)
+                self._uploaded.add(digest)
+                uploaded_count += 1
+                uploaded_size += size
+        
+        print(':v1', 'uploaded {} of {} chunks ({:.1%} bytes) for "{}"'.format(
+            uploaded_count,
+            len(index['chunks']),
+            uploaded_size / index['size'],
+            os.path.basename(file),
+        ))
+        tmp = _get_temp_file()
+        with open(tmp, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(json.dumps(index).encode('utf-8'))
+        try:
+            self.oss.upload(tmp, link)
+        finally:
+            os.remove(tmp)
+    
+    def download(self, link: str, file: str) -> None:
+        self.oss.download(link, file)
+        with open(file, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                return
+            index: T.Index = json.loads(f.read().decode('utf-8'))
+        
+        with atomic_write(file) as tmp, open(tmp, 'wb') as f:
+            for data in self._iter_chunks(index, os.path.basename(file)):
+                f.write(data)
+        assert os.path.getsize(file) == index['size'], file
+    
+    def download_stream(self, link: str) -> t.Iterator[bytes]:
+        stream = iter(self.oss.download_stream(link))
+        head = b''
+        for data in stream:
+            head += data
+            if len(head) >= len(_MAGIC):
+                break
+        if not head.startswith(_MAGIC):
+            yield head
+            yield from stream
+            return
+        
+        data = head + b''.join(stream)
+        index: T.Index = json.loads(data[len(_MAGIC):].decode('utf-8'))
+        size = 0
+        for data in self._iter_chunks(index, os.path.basename(link)):
+            size += len(data)
+            yield data
+        assert size == index['size'], link
+    
+    def delete(self, link: str) -> None:
+        # chunks may be shared with other objects, only the index (or the -
+        # plain object) is deleted.
+        self.oss.delete(link)
+    
+    def exists(self, link: str) -> bool:
+        return self.oss.exists(link)
+    
+    # -------------------------------------------------------------------------
+    
+    def _iter_chunks(self, index: T.Index, name: str) -> t.Iterator[bytes]:
+        """
+        yield the content of the chunks in order. missing chunks are fetched -
+        into the local cache.
+        """
+        os.makedirs(paths.temp.chunks, exist_ok=True)
+        digests = [x[0] for x in index['chunks']]
+        with self._lock:
+            self._in_use.update(digests)
+        try:
+            fetched = 0
+            for digest in digests:
+                cached_file = f'{paths.temp.chunks}/{digest}'
+                if os.path.exists(cached_file):
+                    os.utime(cached_file)  # mark it as recently used.
+                else:
+                    self._download_chunk(digest, cached_file)
+                    fetched += 1
+                with open(cached_file, 'rb') as f:
+                    yield from iter(lambda: f.read(1024 * 1024), b'')
+            print(':v1', 'downloaded {} of {} chunks for "{}"'.format(
+                fetched, len(digests), name
+            ))
+        finally:
+            with self._lock:
+                self._in_use.subtract(digests)
+                self._in_use = +self._in_use  # drop zero counts
+        with self._lock:
+            evict_chunks(self._cache_limit, keep=set(self._in_use))
+    
+    def _download_chunk(self, digest: str, file: str) -> None:
+        with atomic_write(file) as tmp:
+            self.oss.download(f'{self.chunks_root}/{digest}', tmp)
+            if sha256_file(tmp) != digest:
+                raise Exception('chunk digest mismatch', digest)
+    
+    def _has_chunk(self, digest: str) -> bool:
+        if digest in self._uploaded:
+            return True
+        if self.oss.exists(f'{self.chunks_root}/{digest}'):
+            self._uploaded.add(digest)
+            return True
+        return False
+
+
+def evict_chunks(limit: int, keep: t.Container[str] = ()) -> int:
+    """
+    remove the least recently used chunks in the local cache, until its total -
+    size is under `limit` (bytes).
+    
+    params:
+        keep: digests of the chunks which must not be removed.
+    returns: count of removed files.
+    """
+    entries = sorted(
+        (
+            x for x in os.scandir(paths.temp.chunks)
+            if x.is_file() and not x.name.endswith('.tmp')
+        ),
+        key=lambda x: x.stat().st_mtime,
+        reverse=True,
+    )
+    total = 0
+    removed = 0
+    for x in entries:
+        total += x.stat().st_size
+        if total > limit and x.name not in keep:
+            try:
+                os.remove(x.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def _get_temp_file() -> str:
+    os.makedirs(paths.temp.root, exist_ok=True)
+    return f'{paths.temp.root}/{uuid1().hex}.chunk'
@@ -21,4 +21,5 @@ class FakeOssPath(LocalOssPath):
         self.root = f'{paths.oss.test}/{appid}'
         fs.make_dir(f'{self.root}')
         fs.make_dir(f'{self.root}/assets')
+        fs.make_dir(f'{self.root}/chunks')
         fs.make_dir(f'{self.root}/pypi')
@@ -1,7 +1,9 @@
 import typing as t
 
 from .aliyun_oss import AliyunOss
+from .chunked import ChunkedOss
 from .fake_oss import FakeOss
+from .http_oss import HttpOss
 from .local_oss import LocalOss
 from .. import config
 
@@ -12,10 +14,20 @@ oss_config = config.app_settings['oss']
 
 
 class T:
-    Oss = t.Union[AliyunOss, LocalOss, FakeOss]
+    Oss = t.Union[AliyunOss, HttpOss, LocalOss, FakeOss, ChunkedOss]
 
 
 def get_oss(appid: str, server: str = oss_config['server']) -> T.Oss:
+    # `ChunkedOss.download` handles both plain objects and chunked ones, so -
+    # we always wrap it. `chunked` only decides how to upload.
+    return ChunkedOss(
+        _get_oss(appid, server),
+        chunked_upload=oss_config.get('chunked', False),
+        cache_limit=oss_config.get('chunk_cache_limit', 1024),
+    )
+
+
+def _get_oss(appid: str, server: str) -> T.Oss:
     if server == 'aliyun':
         config = oss_config['config']
         assert all(config.values()), (
@@ -23,6 +35,8 @@ def get_oss(appid: str, server: str = oss_config['server']) -> T.Oss:
             '(likianta <likianta@foxmail.com>) to get the access key.'
         )
         return AliyunOss(appid=appid, **config)
+    elif server == 'http':
+        return HttpOss(appid=appid, **oss_config['config'])
     elif server == 'local':
         return LocalOss(appid=appid)
     elif server == 'fake':
@@ -0,0 +1,309 @@
+"""
+a generic http(s) backend. any static file server (or cdn) which serves -
+"<url>/<key>" works for downloading. uploading and deleting need a server -
+which accepts PUT and DELETE, e.g. the bundled `.http_server`.
+
+- connections are kept alive and reused, by a small pool shared by threads.
+- an interrupted download is kept as "<file>.part", the next try continues -
+  from it by a range request.
+- uploads carry "Content-MD5". downloads are checked against the ETag if it -
+  is a plain md5 (as aliyun, s3 and our server do).
+- responses may be gzip encoded.
+"""
+import base64
+import hashlib
+import http.client
+import os
+import re
+import threading
+import typing as t
+import zlib
+from contextlib import contextmanager
+from os.path import basename
+from time import sleep
+from urllib.parse import quote
+from urllib.parse import urlsplit
+
+from ._base import BaseOss
+from ._base import BaseOssPath
+
+_BLOCK_SIZE = 1024 * 1024
+# network errors and 5xx responses are retried, with a backoff of 0, 1, 2... -
+# seconds. the first retry is immediate, since it is usually caused by a -
+# kept-alive connection which was closed by the server.
+_RETRIES = 3
+_MD5_ETAG = re.compile(r'^"?([0-9a-f]{32})"?$')
+
+
+class HttpOssError(Exception):
+    
+    def __init__(self, status: int, reason: str, url: str) -> None:
+        super().__init__(status, reason, url)
+        self.status = status
+
+
+class HttpOss(BaseOss):
+    type = 'http'
+    path: 'HttpOssPath'
+    
+    def __init__(
+        self,
+        appid: str,
+        url: str,
+        token: str = '',
+        timeout: float = 30,
+        **_
+    ) -> None:
+        """
+        params:
+            url: e.g. 'http://127.0.0.1:8000', 'https://cdn.example.com/abc'.
+            token: sent as "Authorization: Bearer <token>" when uploading and -
+                deleting.
+        """
+        self.path = HttpOssPath(appid)
+        self._pool = _ConnectionPool(url, timeout)
+        self._token = token
+    
+    def upload(self, file: str, link: str) -> None:
+        name = basename(file)
+        if link.startswith(self.path.pypi + '/') and self.exists(link):
+            # packages are immutable (the filename contains the version).
+            return
+        md5 = _md5_file(file)
+        with self._request('PUT', link, {
+            'Content-Length': str(os.path.getsize(file)),
+            'Content-MD5'   : base64.b64encode(md5.digest()).decode(),
+        }, file=file, ok=(200, 201, 204)) as resp:
+            resp.read()
+            if (etag := _md5_etag(resp)) and etag != md5.hexdigest():
+                raise HttpOssError(resp.status, 'etag mismatch', link)
+        print(':rpt2', f'upload done [cyan]({name})[/]')
+    
+    def download(self, link: str, file: str) -> None:
+        name = basename(file)
+        part = f'{file}.part'
+        meta = f'{file}.part.etag'
+        for i in range(_RETRIES + 1):
+            try:
+                self._download_part(link, part, meta, name)
+                break
+            except (http.client.HTTPException, OSError) as e:
+                if i == _RETRIES:
+                    raise
+                print(
+                    ':v3',
+                    'download interrupted, resume in {}s ({}/{})'.format(
+                        i, i + 1, _RETRIES
+                    ),
+                    name,
+                    e,
+                )
+                sleep(i)
+        
+        etag = ''
+        if os.path.exists(meta):
+            with open(meta, 'r') as f:
+                etag = f.read()
+            os.remove(meta)
+        if (x := _MD5_ETAG.match(etag)) and \
+                _md5_file(part).hexdigest() != x.group(1):
+            os.remove(part)
+            raise HttpOssError(200, 'etag mismatch', link)
+        os.replace(part, file)
+        print(':rpt2', f'download done [cyan]({name})[/]')
+    
+    def download_stream(self, link: str) -> t.Iterator[bytes]:
+        name = basename(link)
+        with self._request('GET', link, {'Accept-Encoding': 'gzip'}) as resp:
+            decoder = _get_decoder(resp)
+            etag = None if decoder else _md5_etag(resp)
+            md5 = hashlib.md5()
+            for data in iter(lambda: resp.read(_BLOCK_SIZE), b''):
+                if decoder:
+                    data = decoder.decompress(data)
+                elif etag:
+                    md5.update(data)
+                yield data
+            if decoder:
+                yield decoder.flush()
+        if etag and md5.hexdigest() != etag:
+            raise HttpOssError(200, 'etag mismatch', link)
+        print(':rpt2', f'download done [cyan]({name})[/]')
+    
+    def delete(self, link: str) -> None:
+        name = basename(link)
+        with self._request('DELETE', link, ok=(200, 204, 404)) as resp:
+            resp.read()
+        print(':rpt2', f'[dim]delete done [cyan]({name})[/][/]')
+    
+    def exists(self, link: str) -> bool:
+        with self._request('HEAD', link, ok=(200, 404)) as resp:
+            resp.read()
+            return resp.status == 200
+    
+    # -------------------------------------------------------------------------
+    
+    def _download_part(
+        self, link: str, part: str, meta: str, name: str
+    ) -> None:
+        """
+        download to `part`, continue from its end if it exists. the ETag of -
+        the object is saved in `meta`, so that a changed object is downloaded -
+        from start again.
+        """
+        headers = {'Accept-Encoding': 'gzip'}
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset and os.path.exists(meta):
+            with open(meta, 'r') as f:
+                etag = f.read()
+            if etag:
+                # the range is of the identity encoding.
+                headers['Accept-Encoding'] = 'identity'
+                headers['Range'] = f'bytes={offset}-'
+                headers['If-Range'] = etag
+        
+        with self._request('GET', link, headers, ok=(200, 206, 416)) as resp:
+            if resp.status == 416:  # the range is beyond the object.
+                resp.read()
+                os.remove(part)
+                self._download_part(link, part, meta, name)
+                return
+            if resp.status == 200:
+                offset = 0
+                with open(meta, 'w') as f:
+                    f.write(resp.getheader('ETag') or '')
+            decoder = _get_decoder(resp)
+            total = 0 if decoder else (
+                offset + int(resp.getheader('Content-Length') or 0)
+            )
+            with open(part, 'ab' if offset else 'wb') as f:
+                for data in iter(lambda: resp.read(_BLOCK_SIZE), b''):
+                    offset += len(data)
+                    if decoder:
+                        data = decoder.decompress(data)
+                    f.write(data)
+                    if total:
+                        self._update_progress(
+                            f'downloading {name}', offset, total
+                        )
+                if decoder:
+                    f.write(decoder.flush())
+    
+    @contextmanager
+    def _request(
+        self,
+        method: str,
+        link: str,
+        headers: t.Dict[str, str] = None,
+        file: str = None,
+        ok: t.Tuple[int, ...] = (200,),
+    ) -> t.Iterator[http.client.HTTPResponse]:
+        """
+        send a request (with retries), the connection is given back to the -
+        pool after the response is read to the end.
+        
+        params:
+            file: the request body.
+            ok: expected status codes, others raise `HttpOssError`.
+        """
+        headers = dict(headers or {})
+        if self._token and method in ('PUT', 'DELETE'):
+            headers['Authorization'] = f'Bearer {self._token}'
+        url = '{}/{}'.format(self._pool.prefix, quote(link))
+        
+        for i in range(_RETRIES + 1):
+            conn = self._pool.get()
+            try:
+                if file:
+                    with open(file, 'rb') as f:
+                        conn.request(method, url, body=f, headers=headers)
+                else:
+                    conn.request(method, url, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if i == _RETRIES:
+                    raise
+                print(':v3', 'request failed, retry ({}/{})'.format(
+                    i + 1, _RETRIES
+                ), method, link, e)
+                sleep(i)
+                continue
+            if resp.status >= 500 and i < _RETRIES:
+                resp.read()
+                conn.close()
+                print(':v3', 'server error, retry ({}/{})'.format(
+                    i + 1, _RETRIES
+                ), method, link, resp.status)
+                sleep(i)
+                continue
+            break
+        
+        # noinspection PyUnboundLocalVariable
+        try:
+            if resp.status not in ok:
+                resp.read()
+                raise HttpOssError(resp.status, resp.reason, url)
+            yield resp
+        finally:
+            if resp.isclosed() and not resp.will_close:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+
+class HttpOssPath(BaseOssPath):
+    def __init__(self, appid: str) -> None:
+        super().__init__(appid)
+        self.root = f'apps/{appid}'
+
+
+class _ConnectionPool:
+    
+    def __init__(self, url: str, timeout: float, max_idle: int = 8) -> None:
+        x = urlsplit(url)
+        self.prefix = x.path.rstrip('/')
+        self._cls = (
+            http.client.HTTPSConnection if x.scheme == 'https' else
+            http.client.HTTPConnection
+        )
+        self._host = x.netloc
+        self._idle: t.List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._max_idle = max_idle
+        self._timeout = timeout
+    
+    def get(self) -> http.client.HTTPConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._cls(
+            self._host, timeout=self._timeout, blocksize=_BLOCK_SIZE
+        )
+    
+    def put(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self._max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+def _get_decoder(resp: http.client.HTTPResponse) -> t.Optional[t.Any]:
+    if resp.getheader('Content-Encoding') == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    return None
+
+
+def _md5_etag(resp: http.client.HTTPResponse) -> t.Optional[str]:
+    if x := _MD5_ETAG.match(resp.getheader('ETag') or ''):
+        return x.group(1)
+    return None
+
+
+def _md5_file(file: str) -> 'hashlib._Hash':
+    md5 = hashlib.md5()
+    with open(file, 'rb') as f:
+        for data in iter(lambda: f.read(_BLOCK_SIZE), b''):
+            md5.update(data)
+    return md5
@@ -0,0 +1,309 @@
+"""
+a small http server for `.http_oss.HttpOss`, as a local stand-in for a cdn -
+or an object storage. so the whole publish and install path can be run (and -
+benchmarked) offline.
+
+it serves the files under `root` (GET and HEAD, with range requests and -
+gzip), and accepts uploads (PUT) and deletions (DELETE), which require the -
+token if given.
+
+usage:
+    depsland oss-server --port 8000 --token abc
+    # depsland.yaml:
+    #   oss:
+    #     server: http
+    #     config: {url: 'http://127.0.0.1:8000', token: abc}
+
+since the keys are "apps/<appid>/...", serving "<depsland>/oss" (the default) -
+shares the published apps with the 'local' backend.
+"""
+import base64
+import gzip
+import hashlib
+import os
+import re
+import threading
+import typing as t
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+from ..utils.fs import atomic_write
+
+_BLOCK_SIZE = 1024 * 1024
+# small files which shrink well are sent gzip encoded, if the client accepts.
+_GZIP_MAX_SIZE = 16 * 1024 * 1024
+_GZIP_CACHE_SIZE = 64 * 1024 * 1024
+# the published objects have no extensions (e.g. "apps/<appid>/assets/<uid>"), -
+# we tell the compressed ones by their leading bytes: zip archives (assets, -
+# deltas, packages), gzip, and binary patches (see `depsland.utils.binpatch`). -
+# the chunks of `.chunked.ChunkedOss` are parts of archives, they are told -
+# by their directory.
+_COMPRESSED_MAGICS = (
+    b'PK\x03\x04', b'PK\x05\x06', b'\x1f\x8b', b'depsland-patch:'
+)
+_RANGE = re.compile(r'^bytes=(\d+)-(\d*)$')
+
+
+def make_server(
+    root: str, host: str = '127.0.0.1', port: int = 8000, token: str = ''
+) -> ThreadingHTTPServer:
+    handler = type('_BoundHandler', (_Handler,), {
+        'root' : os.path.realpath(root),
+        'token': token,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(
+    root: str, host: str = '127.0.0.1', port: int = 8000, token: str = ''
+) -> None:
+    server = make_server(root, host, port, token)
+    print(':v2', 'serving "{}" at http://{}:{}'.format(root, host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# the uploaded body is incomplete, or its md5 mismatches.
+class _BadBody(Exception):
+    pass
+
+
+class _GzipCache:
+    """
+    gzip encoded contents keyed by path and (size, mtime_ns). an empty value -
+    means the file does not shrink well, so it is not compressed again on -
+    each request. the least recently used are dropped once the total size -
+    exceeds `max_size`.
+    """
+    
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._items: t.Dict[str, t.Tuple[t.Tuple[int, int], bytes]] = {}
+        self._lock = threading.Lock()
+        self._size = 0
+    
+    def get(self, path: str, stamp: t.Tuple[int, int]) -> t.Optional[bytes]:
+        with self._lock:
+            if (x := self._items.pop(path, None)) is None:
+                return None
+            if x[0] != stamp:
+                self._size -= len(x[1])
+                return None
+            self._items[path] = x  # move to the end.
+            return x[1]
+    
+    def put(self, path: str, stamp: t.Tuple[int, int], data: bytes) -> None:
+        with self._lock:
+            if (x := self._items.pop(path, None)) is not None:
+                self._size -= len(x[1])
+            self._items[path] = (stamp, data)
+            self._size += len(data)
+            while self._size > self.max_size:
+                x = self._items.pop(next(iter(self._items)))
+                self._size -= len(x[1])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    root: str
+    token: str
+    
+    # md5 digests (as ETags) keyed by path and (size, mtime_ns).
+    _etags: t.Dict[str, t.Tuple[t.Tuple[int, int], str]] = {}
+    _gzip_cache = _GzipCache(_GZIP_CACHE_SIZE)
+    _lock = threading.Lock()
+    
+    def do_HEAD(self) -> None:
+        self._get(head=True)
+    
+    def do_GET(self) -> None:
+        self._get(head=False)
+    
+    def do_PUT(self) -> None:
+        if not (path := self._resolve()) or not self._check_token():
+            return
+        if (size := self.headers.get('Content-Length')) is None:
+            self._send_empty(411)
+            return
+        size = int(size)
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        md5 = hashlib.md5()
+        try:
+            with atomic_write(path) as tmp:
+                with open(tmp, 'wb') as f:
+                    while size:
+                        data = self.rfile.read(min(size, _BLOCK_SIZE))
+                        if not data:
+                            break
+                        size -= len(data)
+                        md5.update(data)
+                        f.write(data)
+                if size or (
+                    (x := self.headers.get('Content-MD5')) and
+                    base64.b64decode(x) != md5.digest()
+                ):
+                    raise _BadBody
+        except _BadBody:
+            self.close_connection = True
+            self._send_empty(400)
+            return
+        
+        etag = md5.hexdigest()
+        with self._lock:
+            self._etags[path] = (_get_stamp(path), etag)
+        self._send_empty(201, {'ETag': f'"{etag}"'})
+    
+    def do_DELETE(self) -> None:
+        if not (path := self._resolve()) or not self._check_token():
+            return
+        if os.path.isfile(path):
+            os.remove(path)
+            self._send_empty(204)
+        else:
+            self._send_empty(404)
+    
+    def log_message(self, format: str, *args: t.Any) -> None:
+        print(':v1', '{} - {}'.format(self.address_string(), format % args))
+    
+    # -------------------------------------------------------------------------
+    
+    def _get(self, head: bool) -> None:
+        if not (path := self._resolve()):
+            return
+        if not os.path.isfile(path):
+            self._send_empty(404)
+            return
+        size = os.path.getsize(path)
+        etag = f'"{self._get_etag(path)}"'
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'Content-Type' : 'application/octet-stream',
+            'ETag'         : etag,
+        }
+        
+        start, end = 0, size
+        if (x := _RANGE.match(self.headers.get('Range', ''))) and (
+            self.headers.get('If-Range', etag) == etag
+        ):
+            start = int(x.group(1))
+            end = min(int(x.group(2)) + 1, size) if x.group(2) else size
+            if start >= end:
+                self._send_empty(416, {'Content-Range': f'bytes */{size}'})
+                return
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        
+        elif 'gzip' in self.headers.get('Accept-Encoding', '') and (
+            data := self._get_gzipped(path, size)
+        ) is not None:
+            # the encoded entity has its own ETag, it must not be taken as -
+            # the md5 of the file.
+            headers['ETag'] = f'"{etag[1:-1]}-gzip"'
+            headers['Content-Encoding'] = 'gzip'
+            headers['Content-Length'] = str(len(data))
+            headers['Vary'] = 'Accept-Encoding'
+            self._send_head(200, headers)
+            if not head:
+                self.wfile.write(data)
+            return
+        
+        headers['Content-Length'] = str(end - start)
+        self._send_head(206 if 'Content-Range' in headers else 200, headers)
+        if head:
+            return
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining:
+                data = f.read(min(remaining, _BLOCK_SIZE))
+                if not data:
+                    break
+                remaining -= len(data)
+                self.wfile.write(data)
+    
+    def _check_token(self) -> bool:
+        if self.token and self.headers.get('Authorization') != \
+                f'Bearer {self.token}':
+            # read the body away, otherwise the client may fail in sending it -
+            # (broken pipe) before it can see our response.
+            size = int(self.headers.get('Content-Length') or 0)
+            while size and (data := self.rfile.read(min(size, _BLOCK_SIZE))):
+                size -= len(data)
+            self.close_connection = True
+            self._send_empty(401)
+            return False
+        return True
+    
+    def _get_etag(self, path: str) -> str:
+        stamp = _get_stamp(path)
+        with self._lock:
+            if (x := self._etags.get(path)) and x[0] == stamp:
+                return x[1]
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(_BLOCK_SIZE), b''):
+                md5.update(data)
+        with self._lock:
+            self._etags[path] = (stamp, md5.hexdigest())
+        return md5.hexdigest()
+    
+    def _get_gzipped(self, path: str, size: int) -> t.Optional[bytes]:
+        """
+        returns: the gzip encoded content, or None if it does not shrink well. -
+            the result is cached, see `_GzipCache`.
+        """
+        if size > _GZIP_MAX_SIZE or \
+                os.path.basename(os.path.dirname(path)) == 'chunks':
+            return None
+        stamp = _get_stamp(path)
+        if (data := self._gzip_cache.get(path, stamp)) is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if data.startswith(_COMPRESSED_MAGICS):
+                data = b''
+            elif len(data := gzip.compress(data, 6)) >= size * 0.9:
+                data = b''
+            self._gzip_cache.put(path, stamp, data)
+        return data or None
+    
+    def _resolve(self) -> t.Optional[str]:
+        """
+        map the request path to a file under `self.root`. a path which is -
+        not a plain relative path, or escapes the root (also by symlinks), -
+        is rejected with 400.
+        """
+        parts = [
+            x for x in unquote(urlsplit(self.path).path).split('/') if x
+        ]
+        path = None
+        if parts and not any(
+            x in ('.', '..') or '\\' in x or ':' in x or '\0' in x
+            for x in parts
+        ):
+            path = os.path.realpath(os.path.join(self.root, *parts))
+            if os.path.commonpath((self.root, path)) != self.root:
+                path = None
+        if path is None:
+            self.close_connection = True
+            self._send_empty(400)
+        return path
+    
+    def _send_empty(self, status: int, headers: dict = None) -> None:
+        self._send_head(status, {**(headers or {}), 'Content-Length': '0'})
+    
+    def _send_head(self, status: int, headers: t.Dict[str, str]) -> None:
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+
+
+def _get_stamp(path: str) -> t.Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
@@ -1,4 +1,5 @@
 import os
+import typing as t
 
 from lk_utils import fs
 
@@ -35,10 +36,18 @@ class LocalOss(BaseOss):
             fs.copy_file(link, file, True)
         print(':t2rp', f'download done [cyan]({name})[/]')
     
+    def download_stream(self, link: str) -> t.Iterator[bytes]:
+        with open(link, 'rb') as f:
+            yield from iter(lambda: f.read(1024 * 1024), b'')
+        print(':t2rp', f'download done [cyan]({fs.filename(link)})[/]')
+    
     def delete(self, link: str) -> None:
         name = fs.filename(link)
         fs.remove_file(link)
         print(':t2rp', f'[dim]delete done [cyan]({name})[/][/]')
+    
+    def exists(self, link: str) -> bool:
+        return os.path.exists(link)
 
 
 class LocalOssPath(BaseOssPath):
@@ -47,4 +56,5 @@ class LocalOssPath(BaseOssPath):
         self.root = f'{paths.oss.apps}/{appid}'
         fs.make_dir(f'{self.root}')
         fs.make_dir(f'{self.root}/assets')
+        fs.make_dir(f'{self.root}/chunks')
         fs.make_dir(f'{self.root}/pypi')
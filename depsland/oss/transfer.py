@@ -0,0 +1,169 @@
+"""
+bounded concurrent transfers on top of any `BaseOss`, and streamed -
+download-and-extract.
+
+transfers start as soon as they are put in the queue, so the caller can keep -
+preparing (e.g. compressing) the next files, or consuming the finished -
+downloads, meanwhile.
+"""
+import os
+import threading
+import typing as t
+from uuid import uuid1
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from time import time
+
+from ._base import BaseOss
+from .. import paths
+from ..config import app_settings
+from ..utils import ziptool
+
+
+class _TransferQueue:
+    _verbs: t.Tuple[str, str]  # e.g. ('uploading', 'uploaded')
+    
+    def __init__(self, oss: BaseOss, max_workers: int = None) -> None:
+        if max_workers is None:
+            max_workers = app_settings['oss'].get('max_workers', 4)
+        self._oss = oss
+        self._futures: t.Dict[Future, str] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+        self._size = 0
+        self._start = time()
+    
+    def wait(self, *futures: Future) -> None:
+        """
+        wait for the given transfers (or all if not given). if any failed (or -
+        interrupted), all pending ones are cancelled and the error is re-raised.
+        """
+        pending = set(futures or self._futures)
+        try:
+            while pending:
+                # poll with a short timeout, so that `KeyboardInterrupt` can -
+                # be delivered on windows. see also `utils.workers.run_in_pool`.
+                done, pending = wait(
+                    pending, timeout=0.5, return_when=FIRST_COMPLETED
+                )
+                for f in done:
+                    f.result()
+        except BaseException:
+            self.cancel()
+            raise
+    
+    def join(self) -> None:
+        """
+        wait for all transfers, then print a summary.
+        """
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown(wait=False)
+        print(':v2', '{} {} files ({:.1f}MB) in {:.1f}s'.format(
+            self._verbs[1],
+            len(self._futures),
+            self._size / 1024 / 1024,
+            time() - self._start,
+        ))
+    
+    def cancel(self) -> None:
+        pending = [f for f in self._futures if not f.done()]
+        if pending:
+            print('stop {}, cancel {} pending jobs'.format(
+                self._verbs[0], len(pending)
+            ), ':v4')
+            for f in pending:
+                f.cancel()
+        self._pool.shutdown(wait=False)
+    
+    def _submit(self, func: t.Callable, *args: t.Any, name: str) -> Future:
+        future = self._pool.submit(func, *args)
+        self._futures[future] = name
+        return future
+
+
+class UploadQueue(_TransferQueue):
+    _verbs = ('uploading', 'uploaded')
+    
+    def put(self, file: str, link: str) -> Future:
+        self._size += os.path.getsize(file)
+        return self._submit(self._oss.upload, file, link, name=link)
+
+
+class DownloadQueue(_TransferQueue):
+    _verbs = ('downloading', 'downloaded')
+    
+    def put(self, link: str, file: str) -> Future:
+        return self._submit(self._download, link, file, name=link)
+    
+    def extract(self, link: str, dir_o: str, file: str = None) -> Future:
+        """
+        download a zip archive and extract it, see `download_and_extract`.
+        """
+        return self._submit(self._extract, link, dir_o, file, name=link)
+    
+    def _download(self, link: str, file: str) -> None:
+        self._oss.download(link, file)
+        with self._lock:
+            self._size += os.path.getsize(file)
+    
+    def _extract(self, link: str, dir_o: str, file: t.Optional[str]) -> None:
+        size = download_and_extract(self._oss, link, dir_o, file)
+        with self._lock:
+            self._size += size
+
+
+def download_and_extract(
+    oss: BaseOss, link: str, dir_o: str, file: str = None
+) -> int:
+    """
+    extract the zip archive at `link` into `dir_o` (overwritten if exists) -
+    while downloading it, see `ziptool.extract_stream`.
+    
+    if the archive cannot be streamed, or the stream breaks, we fall back to -
+    `oss.download` (which is resumable) and then `ziptool.extract_file`.
+    
+    params:
+        file: if given, the archive is also saved to this path.
+    returns: size of the archive.
+    """
+    size = 0
+    
+    def tee() -> t.Iterator[bytes]:
+        nonlocal size
+        f = open(file, 'wb') if file else None
+        try:
+            for data in oss.download_stream(link):
+                size += len(data)
+                if f:
+                    f.write(data)
+                yield data
+        finally:
+            if f:
+                f.close()
+    
+    stream = tee()
+    try:
+        ziptool.extract_stream(stream, dir_o, overwrite=True)
+        return size
+    except Exception as e:
+        if not isinstance(e, NotImplementedError):
+            print(':v3', 'streaming failed, fall back to download', link, e)
+    finally:
+        stream.close()  # release the file (if any) before we reuse it.
+    
+    if file:
+        file_m = file
+    else:
+        os.makedirs(paths.temp.root, exist_ok=True)
+        file_m = '{}/{}.zip'.format(paths.temp.root, uuid1().hex)
+    oss.download(link, file_m)
+    try:
+        ziptool.extract_file(file_m, dir_o, overwrite=True)
+        return os.path.getsize(file_m)
+    finally:
+        if not file:
+            os.remove(file_m)
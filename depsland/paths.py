@@ -124,6 +124,7 @@ class Project:
         self.config = f'{self.root}/config'
         self.depsland = f'{self.root}/depsland'
         self.dist = f'{self.root}/dist'
+        self.hash_cache = f'{self.root}/temp/hash_cache.pkl'
         self.manifest_json = f'{self.root}/manifest.json'
         self.manifest_pkl = f'{self.root}/manifest.pkl'
         self.oss = f'{self.root}/oss'
@@ -205,9 +206,11 @@ class Project:
         os.mkdir(f'{root}/oss/apps')
         os.mkdir(f'{root}/oss/test')
         os.mkdir(f'{root}/pypi')
+        os.mkdir(f'{root}/pypi/blobs')
         os.mkdir(f'{root}/pypi/cache')
         os.mkdir(f'{root}/pypi/downloads')
         os.mkdir(f'{root}/pypi/index')
+        os.mkdir(f'{root}/pypi/index/linkplan')
         os.mkdir(f'{root}/pypi/index/snapdep')
         os.mkdir(f'{root}/pypi/installed')
         # os.mkdir(f'{root}/python')  # later
@@ -547,12 +550,17 @@ class PyPI:
             if self.is_symlink else self.root
         )
         
+        self.blobs = f'{self.root}/blobs'
         # DELETE: is it better not to use custom cache dir?
         self.cache = f'{self.root}/cache'
         self.downloads = f'{self.root}/downloads'
         self.index = f'{self.root}/index'
         self.installed = f'{self.root}/installed'
         
+        self.index_db = f'{self.index}/index.db'
+        self.index_lock = f'{self.index}/.lock'
+        self.index_log = f'{self.index}/changes.log'
+        self.linkplan = f'{self.index}/linkplan'
         self.id_2_paths = f'{self.index}/id_2_paths.json'
         self.name_2_vers = f'{self.index}/name_2_vers.json'
         self.snapdep = f'{self.index}/snapdep'
@@ -591,6 +599,7 @@ class Python:
 class Temp:
     def __init__(self) -> None:
         self.root = f'{project.root}/temp'
+        self.chunks = f'{self.root}/chunks'
         self.self_upgrade = f'{self.root}/.self_upgrade'
         self.unittests = f'{self.root}/.unittests'
 
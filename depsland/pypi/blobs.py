@@ -0,0 +1,164 @@
+"""
+a content-addressed file store for `pypi/installed`.
+
+consecutive versions of a package share most of their files. instead of -
+writing every file again, installed files are hardlinks to blobs in -
+`<pypi>/blobs/<xx>/<sha256>`, so identical bytes are stored only once.
+
+hardlinks share the same inode, editing a file in place affects all copies. -
+this is fine for `pypi/installed` because it is treated as read-only after -
+installation.
+"""
+import errno
+import hashlib
+import os
+import stat
+import typing as t
+
+from lk_utils import fs
+
+from ..paths import pypi as pypi_paths
+from ..utils.fs import atomic_write
+from ..utils.fs import sha256_file
+
+
+class T:
+    AbsPath = str
+    Digest = str  # sha256 hex digest.
+    IngestResult = t.Tuple[int, int]  # (linked_files, saved_bytes)
+
+
+# the blob cannot be linked: too many links, across devices, or the file -
+# system does not support hardlinks. then the data is written as a plain file.
+_NO_LINK_ERRORS = (errno.EMLINK, errno.EXDEV, errno.EPERM)
+
+
+class BlobStore:
+    
+    def __init__(self, root: T.AbsPath = pypi_paths.blobs) -> None:
+        self.root = root
+    
+    def get_path(
+        self, digest: T.Digest, executable: bool = False
+    ) -> T.AbsPath:
+        """
+        executable files are stored separately, because hardlinks share the -
+        permission bits as well.
+        """
+        return '{}/{}/{}{}'.format(
+            self.root, digest[:2], digest, '.x' if executable else ''
+        )
+    
+    def write(
+        self, data: bytes, dst: T.AbsPath, executable: bool = False
+    ) -> bool:
+        """
+        write `data` to `dst` as a hardlink to the blob.
+        
+        returns: true if the blob already existed (no bytes written).
+        """
+        # `dst` may already be a hardlink to another blob, it is always -
+        # replaced by rename, never truncated, which would change the blob -
+        # (and every file linked to it).
+        if not data:
+            with atomic_write(dst) as tmp:
+                _write_file(data, tmp, executable)
+            return False
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self.get_path(digest, executable)
+        existed = os.path.exists(blob)
+        if not existed:
+            self._put(data, blob, executable)
+        try:
+            with atomic_write(dst) as tmp:
+                os.link(blob, tmp)
+        except OSError as e:
+            if e.errno not in _NO_LINK_ERRORS:
+                raise
+            with atomic_write(dst) as tmp:
+                _write_file(data, tmp, executable)
+            return False
+        return existed
+    
+    def ingest_tree(self, root: T.AbsPath) -> T.IngestResult:
+        """
+        move all files under `root` into the store, and replace them with -
+        hardlinks. used for packages installed by pip, and for migrating -
+        existing `pypi/installed` trees.
+        """
+        linked = saved = 0
+        for dirpath, _, filenames in os.walk(root):
+            for n in filenames:
+                file = f'{dirpath}/{n}'
+                if os.path.islink(file):
+                    continue
+                if x := self.ingest_file(file):
+                    linked += 1
+                    saved += x
+        return linked, saved
+    
+    def ingest_file(self, file: T.AbsPath) -> int:
+        """
+        returns: saved bytes. 0 means the file becomes a new blob (or it is -
+            empty, or it is already linked).
+        """
+        st = os.stat(file)
+        if st.st_size == 0:
+            return 0
+        executable = os.name != 'nt' and bool(st.st_mode & stat.S_IXUSR)
+        blob = self.get_path(sha256_file(file), executable)
+        if not os.path.exists(blob):
+            fs.make_dirs(fs.parent(blob))
+            try:
+                os.link(file, blob)  # the file itself becomes the blob.
+                return 0
+            except FileExistsError:  # another worker made it just now.
+                pass
+            except OSError:
+                return 0
+        if os.path.samefile(file, blob):
+            return 0
+        try:
+            with atomic_write(file) as tmp:
+                os.link(blob, tmp)
+        except OSError:
+            return 0
+        return st.st_size
+    
+    def prune(self) -> T.IngestResult:
+        """
+        remove blobs which are no longer linked by any installed file.
+        
+        returns: (removed_blobs, freed_bytes)
+        """
+        removed = freed = 0
+        if not os.path.exists(self.root):
+            return 0, 0
+        for d in os.scandir(self.root):
+            if not d.is_dir():
+                continue
+            for f in os.scandir(d.path):
+                st = os.stat(f.path)  # `f.stat` has no st_nlink on windows.
+                if st.st_nlink == 1:
+                    os.remove(f.path)
+                    removed += 1
+                    freed += st.st_size
+        return removed, freed
+    
+    @staticmethod
+    def _put(data: bytes, blob: T.AbsPath, executable: bool) -> None:
+        # write to a temp file then rename, so concurrent installers never -
+        # see a half-written blob.
+        fs.make_dirs(fs.parent(blob))
+        with atomic_write(blob) as tmp:
+            _write_file(data, tmp, executable)
+
+
+def _write_file(data: bytes, file: T.AbsPath, executable: bool) -> None:
+    with open(file, 'wb') as f:
+        f.write(data)
+    if executable:
+        os.chmod(file, os.stat(file).st_mode | 0o111)
+
+
+blob_store = BlobStore()
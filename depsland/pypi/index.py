@@ -1,12 +1,18 @@
 import atexit
+import threading
 import typing as t
-from collections import defaultdict
 
 from lk_utils import fs
 
+from .index_backend import BaseIndexBackend
+from .index_backend import T as T1
+from .index_backend import get_index_backend
+from ..config import app_settings
 from ..depsolver import T as T0
+from ..normalization import VersionSpec
 from ..normalization import split_filename_of_package
 from ..paths import pypi as pypi_paths
+from ..verspec import VersionTables
 from ..verspec import sort_versions
 
 _root = pypi_paths.root
@@ -19,17 +25,28 @@ class T(T0):
     #   {package_id: (download_path, install_path), ...}
     Name2Versions = t.Dict[T0.PackageName, t.List[T0.ExactVersion]]
     #   versions are sorted in descending order (from new to old).
+    #   note: with sqlite backend, both are dict-like views instead of dicts. -
+    #   see `.index_backend`.
 
 
 class Index:
+    backend: BaseIndexBackend
     id_2_paths: T.Id2Paths
     name_2_vers: T.Name2Versions
+    version_tables: VersionTables
     _changed: t.Set[T.PackageName]
+    _lock: threading.RLock
     _stash_downloads: t.Dict[T0.PackageId, T.AbsPath]
     
-    def __init__(self) -> None:
+    def __init__(self, backend: T1.Backend = None) -> None:
+        self.backend = get_index_backend(
+            backend or app_settings['pypi'].get('index_backend', 'json')
+        )
         self.load_index()
         self._changed = set()
+        self._lock = threading.RLock()
+        #   packages may be installed in parallel. see `depsland.api.user_api -
+        #   .install._install_packages`.
         self._stash_downloads = {}
         atexit.register(self.save_index)
     
@@ -50,16 +67,45 @@ class Index:
         return item in self.id_2_paths
     
     def load_index(self) -> None:
+        self.id_2_paths, self.name_2_vers = self.backend.load()
+        self.version_tables = VersionTables(self.name_2_vers)
+    
+    def query_versions(
+        self, name: T.PackageName, verspecs: t.Iterable[VersionSpec]
+    ) -> t.Tuple[T.ExactVersion, ...]:
+        """
+        returns: versions matching all the specs, from new to old.
         """
-        the initial files were generated by `build/self_build.py:init_pypi_index`
+        with self._lock:
+            return self.version_tables.query(name, verspecs)
+    
+    def reset_index(
+        self, id_2_paths: T.Id2Paths, name_2_vers: T.Name2Versions
+    ) -> None:
         """
-        self.id_2_paths = fs.load(pypi_paths.id_2_paths)
-        # self.id_2_paths = {
-        #   k: tuple(v) for k, v in loads(pypi_paths.id_2_paths).items()}
-        self.name_2_vers = defaultdict(list)
-        self.name_2_vers.update(fs.load(pypi_paths.name_2_vers))
+        replace the whole index. see `.insight.rebuild_index`.
+        """
+        with self._lock:
+            self.id_2_paths, self.name_2_vers = self.backend.reset(
+                id_2_paths, name_2_vers
+            )
+            self.version_tables = VersionTables(self.name_2_vers)
+            self._changed.clear()
+    
+    def remove_from_index(self, pkg_id: T.PackageId) -> None:
+        with self._lock:
+            self.id_2_paths.pop(pkg_id)
+            name, ver = pkg_id.split('-', 1)
+            self.name_2_vers[name].remove(ver)
+            self._changed.add(name)
+            self.version_tables.invalidate(name)
+            self.backend.log_remove(pkg_id)
     
     def add_to_index(self, path: T.AbsPath, type: int) -> None:
+        with self._lock:
+            self._add_to_index(path, type)
+    
+    def _add_to_index(self, path: T.AbsPath, type: int) -> None:
         if type == 0:
             name, ver = split_filename_of_package(fs.basename(path))
             # print('stash download', f'{name}-{ver}', ':vp')
@@ -80,6 +126,16 @@ class Index:
         dl_path: T.AbsPath,
         ins_path: T.AbsPath,
         force: bool = False,
+    ) -> None:
+        with self._lock:
+            self._update_index(pkg_id, dl_path, ins_path, force)
+    
+    def _update_index(
+        self,
+        pkg_id: T.PackageId,
+        dl_path: T.AbsPath,
+        ins_path: T.AbsPath,
+        force: bool = False,
     ) -> None:
         if pkg_id in self.id_2_paths and not force:
             return
@@ -104,8 +160,11 @@ class Index:
             fs.relpath(ins_path, _root),
         )
         name, ver = pkg_id.split('-', 1)
-        self.name_2_vers[name].append(ver)
+        if ver not in self.name_2_vers[name]:
+            self.name_2_vers[name].append(ver)
+            self.version_tables.invalidate(name)
         self._changed.add(name)
+        self.backend.log_update(pkg_id, self.id_2_paths[pkg_id])
     
     def save_index(self) -> None:
         if self._stash_downloads:
@@ -117,12 +176,15 @@ class Index:
                 'indexes',
                 ':v3'
             )
+        with self._lock:
+            self._save_index()
+    
+    def _save_index(self) -> None:
         if self._changed:
             for name in self._changed:
                 print('refresh versions stack', name, ':i2vs')
                 vers = self.name_2_vers[name]
                 sort_versions(vers, reverse=True)
-            fs.dump(self.id_2_paths, pypi_paths.id_2_paths)
-            fs.dump(self.name_2_vers, pypi_paths.name_2_vers)
+            self.backend.save(self.id_2_paths, self.name_2_vers, self._changed)
             self._changed.clear()
             print('saved pypi indexes')
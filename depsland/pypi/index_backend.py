@@ -0,0 +1,473 @@
+"""
+storage backends of `depsland.pypi.index.Index`.
+
+json: the original format. simple and human readable, but the whole files -
+    are loaded on every start. changes are appended to a log file, which is -
+    merged on load and compacted into the json files from time to time.
+sqlite: lookups go to the database on demand, and saving only writes the -
+    changed rows. on first use, it imports the json files once.
+
+both backends are safe for multiple processes sharing one pypi root (e.g. -
+the webui and a cli install at the same time): the json backend guards its -
+files by a file lock, and the sqlite backend relies on sqlite's own locking.
+"""
+import json
+import os
+import sqlite3
+import threading
+import typing as t
+from collections import defaultdict
+from contextlib import contextmanager
+
+from lk_utils import fs
+
+from ..depsolver import T as T0
+from ..paths import pypi as pypi_paths
+from ..utils.filelock import FileLock
+from ..verspec import sort_versions
+
+
+class T:
+    AbsPath = RelPath = str
+    Backend = t.Literal['json', 'sqlite']
+    Id2Paths = t.MutableMapping[T0.PackageId, t.Tuple[RelPath, RelPath]]
+    Name2Versions = t.MutableMapping[T0.PackageName, t.List[T0.ExactVersion]]
+
+
+class BaseIndexBackend:
+    
+    def load(self) -> t.Tuple[T.Id2Paths, T.Name2Versions]:
+        raise NotImplementedError
+    
+    def log_update(
+        self, pkg_id: T0.PackageId, paths: t.Tuple[T.RelPath, T.RelPath]
+    ) -> None:
+        """
+        called right after an id is added (or updated) in memory.
+        """
+        pass
+    
+    def log_remove(self, pkg_id: T0.PackageId) -> None:
+        pass
+    
+    def save(
+        self,
+        id_2_paths: T.Id2Paths,
+        name_2_vers: T.Name2Versions,
+        changed_names: t.Iterable[T0.PackageName],
+    ) -> None:
+        raise NotImplementedError
+    
+    def reset(
+        self,
+        id_2_paths: t.Dict[T0.PackageId, t.Tuple[T.RelPath, T.RelPath]],
+        name_2_vers: t.Dict[T0.PackageName, t.List[T0.ExactVersion]],
+    ) -> t.Tuple[T.Id2Paths, T.Name2Versions]:
+        """
+        replace all the indexes with the given ones, returns the reloaded.
+        """
+        raise NotImplementedError
+
+
+class JsonIndexBackend(BaseIndexBackend):
+    compact_size = 64 * 1024
+    #   compact the log file into json files when it grows larger than this -
+    #   (about 500 entries).
+    
+    def __init__(
+        self,
+        id_2_paths_file: T.AbsPath = pypi_paths.id_2_paths,
+        name_2_vers_file: T.AbsPath = pypi_paths.name_2_vers,
+        log_file: T.AbsPath = pypi_paths.index_log,
+        lock_file: T.AbsPath = pypi_paths.index_lock,
+    ) -> None:
+        self._id_2_paths_file = id_2_paths_file
+        self._name_2_vers_file = name_2_vers_file
+        self._log_file = log_file
+        self._file_lock = FileLock(lock_file)
+    
+    def load(self) -> t.Tuple[T.Id2Paths, T.Name2Versions]:
+        """
+        the initial files were generated by -
+        `build/self_build.py:init_pypi_index`
+        """
+        with self._file_lock:
+            return self._load()
+    
+    def log_update(self, pkg_id, paths) -> None:
+        self._append_log(['+', pkg_id, *paths])
+    
+    def log_remove(self, pkg_id) -> None:
+        self._append_log(['-', pkg_id])
+    
+    def save(self, id_2_paths, name_2_vers, changed_names) -> None:
+        """
+        changes are already in the log file, we do not dump the in-memory -
+        indexes, which may be outdated if other processes have changed the -
+        index meanwhile.
+        """
+        with self._file_lock:
+            if (
+                os.path.exists(self._log_file) and
+                os.path.getsize(self._log_file) > self.compact_size
+            ):
+                self._compact()
+    
+    def reset(self, id_2_paths, name_2_vers):
+        with self._file_lock:
+            fs.dump(id_2_paths, self._id_2_paths_file)
+            fs.dump(name_2_vers, self._name_2_vers_file)
+            self._truncate_log()
+            return self._load()
+    
+    def _append_log(self, entry: list) -> None:
+        with self._file_lock:
+            with open(self._log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def _compact(self) -> None:
+        print(':v1', 'compact pypi index log')
+        id_2_paths, name_2_vers = self._load()
+        fs.dump(id_2_paths, self._id_2_paths_file)
+        fs.dump(name_2_vers, self._name_2_vers_file)
+        self._truncate_log()
+    
+    def _load(self) -> t.Tuple[T.Id2Paths, T.Name2Versions]:
+        id_2_paths = fs.load(self._id_2_paths_file)
+        name_2_vers = defaultdict(list)
+        name_2_vers.update(fs.load(self._name_2_vers_file))
+        if os.path.exists(self._log_file):
+            self._replay_log(id_2_paths, name_2_vers)
+        return id_2_paths, name_2_vers
+    
+    def _replay_log(
+        self, id_2_paths: T.Id2Paths, name_2_vers: T.Name2Versions
+    ) -> None:
+        touched = set()
+        with open(self._log_file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    op, pkg_id, *paths = json.loads(line)
+                except ValueError:
+                    # an incomplete line, the writer process was killed.
+                    continue
+                name, ver = pkg_id.split('-', 1)
+                vers = name_2_vers[name]
+                if op == '+':
+                    id_2_paths[pkg_id] = tuple(paths)
+                    if ver not in vers:
+                        vers.append(ver)
+                        touched.add(name)
+                else:
+                    id_2_paths.pop(pkg_id, None)
+                    if ver in vers:
+                        vers.remove(ver)
+                    if not vers:
+                        name_2_vers.pop(name)
+        for name in touched:
+            if name in name_2_vers:
+                sort_versions(name_2_vers[name], reverse=True)
+    
+    def _truncate_log(self) -> None:
+        if os.path.exists(self._log_file):
+            open(self._log_file, 'w').close()
+
+
+class SqliteIndexBackend(BaseIndexBackend):
+    
+    def __init__(
+        self,
+        db_file: T.AbsPath = pypi_paths.index_db,
+        json_backend: JsonIndexBackend = None,
+    ) -> None:
+        self._conn = None
+        self._db_file = db_file
+        self._json_backend = json_backend or JsonIndexBackend()
+        self._lock = threading.RLock()
+        #   the connection is shared by worker threads. see -
+        #   `depsland.api.user_api.install._install_packages`.
+    
+    def load(self) -> t.Tuple[T.Id2Paths, T.Name2Versions]:
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                self._db_file,
+                check_same_thread=False,
+                isolation_level=None,
+                #   we manage transactions by ourselves, see `_transaction`.
+                timeout=60,
+                #   wait for other processes' writing, instead of raising -
+                #   "database is locked" immediately.
+            )
+            self._conn.execute('pragma journal_mode = wal')
+            #   readers and the writer do not block each other.
+            self._init_tables()
+        return (
+            _SqliteId2Paths(self._conn, self._lock),
+            _SqliteName2Versions(self._conn, self._lock),
+        )
+    
+    def save(
+        self,
+        id_2_paths: '_SqliteId2Paths',
+        name_2_vers: '_SqliteName2Versions',
+        changed_names,
+    ) -> None:
+        with self._transaction():
+            id_2_paths.flush()
+            name_2_vers.flush(changed_names)
+    
+    def reset(self, id_2_paths, name_2_vers):
+        with self._transaction():
+            self._conn.execute('delete from packages')
+            self._conn.execute('delete from versions')
+            self._insert_all(id_2_paths, name_2_vers)
+        return self.load()
+    
+    def _init_tables(self) -> None:
+        with self._transaction():
+            for sql in (
+                '''
+                create table if not exists packages (
+                    id text primary key,
+                    download_path text not null,
+                    install_path text not null
+                )
+                ''',
+                '''
+                create table if not exists versions (
+                    name text primary key,
+                    versions text not null  -- json list, new to old
+                )
+                ''',
+                '''
+                create table if not exists meta (
+                    key text primary key,
+                    value text
+                )
+                ''',
+            ):
+                self._conn.execute(sql)
+            if not self._conn.execute(
+                'select 1 from meta where key = ?', ('imported_from_json',)
+            ).fetchone():
+                self._import_json()
+    
+    @contextmanager
+    def _transaction(self) -> t.Iterator[None]:
+        """
+        "begin immediate" takes the write lock at the beginning, so the -
+        read-modify-write in `_SqliteName2Versions.flush` is atomic among -
+        processes.
+        """
+        with self._lock:
+            self._conn.execute('begin immediate')
+            try:
+                yield
+            except BaseException:
+                self._conn.execute('rollback')
+                raise
+            else:
+                self._conn.execute('commit')
+    
+    def _import_json(self) -> None:
+        """
+        one-shot import from the json files. after that the json files are -
+        no longer read (nor written) while sqlite backend is in use.
+        """
+        try:
+            id_2_paths, name_2_vers = self._json_backend.load()
+        except FileNotFoundError:
+            id_2_paths, name_2_vers = {}, {}
+        else:
+            print(':v1', 'import pypi index from json files: {} ids'.format(
+                len(id_2_paths)
+            ))
+        self._insert_all(id_2_paths, name_2_vers)
+        self._conn.execute(
+            'insert or replace into meta values (?, ?)',
+            ('imported_from_json', '1'),
+        )
+    
+    def _insert_all(self, id_2_paths, name_2_vers) -> None:
+        self._conn.executemany(
+            'insert or replace into packages values (?, ?, ?)',
+            ((k, a, b) for k, (a, b) in id_2_paths.items()),
+        )
+        self._conn.executemany(
+            'insert or replace into versions values (?, ?)',
+            ((k, json.dumps(v)) for k, v in name_2_vers.items()),
+        )
+
+
+class _SqliteId2Paths(t.MutableMapping):
+    """
+    a dict-like view of table "packages". writes are kept in memory until -
+    `flush`.
+    """
+    
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock):
+        self._conn = conn
+        self._lock = lock
+        self._pending = {}
+        self._removed = set()
+    
+    def __contains__(self, id: T0.PackageId) -> bool:
+        if id in self._pending:
+            return True
+        if id in self._removed:
+            return False
+        with self._lock:
+            return self._conn.execute(
+                'select 1 from packages where id = ?', (id,)
+            ).fetchone() is not None
+    
+    def __getitem__(self, id: T0.PackageId) -> t.Tuple[T.RelPath, T.RelPath]:
+        if id in self._pending:
+            return self._pending[id]
+        if id not in self._removed:
+            with self._lock:
+                row = self._conn.execute(
+                    'select download_path, install_path from packages '
+                    'where id = ?', (id,)
+                ).fetchone()
+            if row:
+                return row
+        raise KeyError(id)
+    
+    def __setitem__(self, id: T0.PackageId, paths: t.Sequence[T.RelPath]):
+        self._removed.discard(id)
+        self._pending[id] = tuple(paths)
+    
+    def __delitem__(self, id: T0.PackageId) -> None:
+        if id not in self:
+            raise KeyError(id)
+        self._pending.pop(id, None)
+        self._removed.add(id)
+    
+    def __iter__(self) -> t.Iterator[T0.PackageId]:
+        yield from tuple(self._pending)
+        with self._lock:
+            ids = self._conn.execute('select id from packages').fetchall()
+        for (id,) in ids:
+            if id not in self._pending and id not in self._removed:
+                yield id
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.executemany(
+                'insert or replace into packages values (?, ?, ?)',
+                ((k, a, b) for k, (a, b) in self._pending.items()),
+            )
+            self._conn.executemany(
+                'delete from packages where id = ?',
+                ((k,) for k in self._removed),
+            )
+        self._pending.clear()
+        self._removed.clear()
+
+
+class _SqliteName2Versions(t.MutableMapping):
+    """
+    a dict-like view of table "versions".
+    like `defaultdict(list)`, getting a missing name returns an empty list. -
+    the lists are cached, so in-place modifications (e.g. `append`) are kept -
+    and written back in `flush`.
+    """
+    
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock):
+        self._cache = {}
+        self._conn = conn
+        self._dirty = set()
+        self._lock = lock
+        self._origin = {}  # the lists as they were loaded, to compute diffs.
+    
+    def __contains__(self, name: T0.PackageName) -> bool:
+        if name in self._cache:
+            return bool(self._cache[name])
+        return bool(self[name])
+    
+    def __getitem__(self, name: T0.PackageName) -> t.List[T0.ExactVersion]:
+        if name not in self._cache:
+            with self._lock:
+                row = self._conn.execute(
+                    'select versions from versions where name = ?', (name,)
+                ).fetchone()
+            self._cache[name] = json.loads(row[0]) if row else []
+            self._origin[name] = tuple(self._cache[name])
+        return self._cache[name]
+    
+    def __setitem__(
+        self, name: T0.PackageName, vers: t.List[T0.ExactVersion]
+    ) -> None:
+        self[name]  # noqa. make sure `self._origin[name]` is loaded.
+        self._cache[name] = list(vers)
+        self._dirty.add(name)
+    
+    def __delitem__(self, name: T0.PackageName) -> None:
+        if name not in self:
+            raise KeyError(name)
+        self._cache[name] = []
+        self._dirty.add(name)
+    
+    def __iter__(self) -> t.Iterator[T0.PackageName]:
+        with self._lock:
+            names = self._conn.execute('select name from versions').fetchall()
+        seen = set()
+        for (name,) in names:
+            seen.add(name)
+            if self._cache.get(name, True):
+                yield name
+        for name, vers in tuple(self._cache.items()):
+            if name not in seen and vers:
+                yield name
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    def flush(self, names: t.Iterable[T0.PackageName] = ()) -> None:
+        """
+        other processes may have changed the same names since we loaded -
+        them, so we apply our diffs onto the current rows rather than -
+        overwriting them.
+        should be called in a transaction. see -
+        `SqliteIndexBackend._transaction`.
+        """
+        names = self._dirty.union(names)
+        with self._lock:
+            for name in names:
+                if name not in self._cache:
+                    continue
+                mine, origin = self._cache[name], self._origin[name]
+                row = self._conn.execute(
+                    'select versions from versions where name = ?', (name,)
+                ).fetchone()
+                vers = json.loads(row[0]) if row else []
+                vers = [x for x in vers if x in mine or x not in origin]
+                vers.extend(x for x in mine if x not in vers)
+                if vers:
+                    sort_versions(vers, reverse=True)
+                    self._conn.execute(
+                        'insert or replace into versions values (?, ?)',
+                        (name, json.dumps(vers)),
+                    )
+                else:
+                    self._conn.execute(
+                        'delete from versions where name = ?', (name,)
+                    )
+                self._cache[name] = vers
+                self._origin[name] = tuple(vers)
+        self._dirty.clear()
+
+
+def get_index_backend(type: T.Backend) -> BaseIndexBackend:
+    if type == 'json':
+        return JsonIndexBackend()
+    elif type == 'sqlite':
+        return SqliteIndexBackend()
+    else:
+        raise ValueError(type)
@@ -69,8 +69,7 @@ def rebuild_index(
         verspec.sort_versions(vers, reverse=True)
     
     if _save:
-        fs.dump(id_2_paths, pypi_paths.id_2_paths)
-        fs.dump(name_2_vers, pypi_paths.name_2_vers)
+        pypi.index.reset_index(id_2_paths, name_2_vers)
     return id_2_paths, name_2_vers
 
 
@@ -80,6 +79,7 @@ def _rebuild_dependencies(
 ) -> T.Dependencies:
     dependencies: T.Dependencies = {}
     root = pypi_paths.installed
+    version_tables = verspec.VersionTables(name_2_versions)
     
     for d0 in fs.find_dirs(root):
         name = d0.name
@@ -93,7 +93,7 @@ def _rebuild_dependencies(
                 if d2.name.endswith('.dist-info'):
                     if os.path.exists(x := f'{d2.path}/METADATA'):
                         for (a, b), is_name_id in analyze_metadata(
-                            x, name_2_versions
+                            x, version_tables
                         ):
                             if is_name_id:
                                 node['resolved'].append(f'{a}-{b}')
@@ -169,10 +169,12 @@ def _rebuild_dependencies(
 
 
 def analyze_metadata(
-    file: T.Path, name_2_versions: dict  # FIXME
+    file: T.Path, version_tables: verspec.VersionTables
 ) -> t.Iterator[t.Tuple[t.Tuple[str, str], bool]]:
     """
     analyse 'METADATA' file.
+    params:
+        version_tables: see `depsland.pypi.index.Index.version_tables`.
     yields: iter[tuple[result, is_resolved]]
         result: tuple[str, str]
             if `is_resolved` is True, result is a `tuple[name, version]`.
@@ -211,11 +213,8 @@ def analyze_metadata(
             raise e
         name = norm.normalize_name(raw_name)
         verspecs = norm.normalize_verspecs(name, raw_verspec or '')
-        proper_version = verspec.find_proper_version(
-            tuple(verspecs), candidates=name_2_versions[name]
-        )
-        if proper_version:
-            yield (name, proper_version), True
+        if eligible_versions := version_tables.query(name, verspecs):
+            yield (name, eligible_versions[0]), True
         else:
             print('cannot find a proper version from local index. you may '
                   'download it manually later', file, name, raw_verspec, ':v3')
@@ -29,6 +29,10 @@ class Pip:
         self._pip_exec = pip_exec
         self._pip_general_options = (
             '--disable-pip-version-check',
+            '--no-input',
+            #   never wait for user input (e.g. credentials prompt). pip runs -
+            #   in worker threads (see `depsland.utils.workers`), a prompt -
+            #   there just hangs the whole installation.
             '--no-python-version-warning',
             ('--find-links', paths.pypi.downloads),
             ('--index-url', index_url),
@@ -92,6 +96,29 @@ class Pip:
             *self._pip_general_options,
         )
     
+    def download_many(
+        self,
+        names: t.Iterable[str],
+        destination: str = paths.pypi.downloads,
+        no_dependency: bool = False,
+        no_index: bool = False,
+    ) -> str:
+        """
+        download multiple packages in one pip call.
+        
+        params:
+            names: see `download : [param] name : [docstring]`.
+        
+        each `pip wheel` call pays the interpreter startup, pip import and -
+        index negotiation. putting all names into a requirements file and -
+        calling pip once saves these costs for every package but the first.
+        """
+        from ..utils import make_temp_dir
+        file = '{}/requirements.txt'.format(make_temp_dir())
+        with open(file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(names))
+        return self.download_r(file, destination, no_dependency, no_index)
+    
     def install(
         self,
         name: str,
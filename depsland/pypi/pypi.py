@@ -3,13 +3,20 @@ import typing as t
 
 from lk_utils import fs
 
+from .blobs import BlobStore
+from .blobs import blob_store as _default_blob_store
 from .index import Index
 from .index import T as T0
 from .pip import Pip
 from .pip import pip as _default_pip
+from .wheel import install_wheel
 from .. import normalization as norm
+from .. import paths
+from ..config import app_settings
 from ..paths import pypi as pypi_paths
 from ..venv import link_venv
+from ..venv import make_pth_venv
+from ..venv import relink_venv
 
 __all__ = ['LocalPyPI', 'T', 'pypi']
 
@@ -21,10 +28,15 @@ class T(T0):
 
 
 class LocalPyPI:
+    blob_store: t.Optional[BlobStore]
     index: Index
     pip: Pip
     
     def __init__(self, pip: Pip = _default_pip) -> None:
+        self.blob_store = (
+            _default_blob_store
+            if app_settings['pypi'].get('blob_store', True) else None
+        )
         self.index = Index()
         self.pip = pip
         self.update_index = self.index.update_index
@@ -53,15 +65,74 @@ class LocalPyPI:
                 f'{name}=={ver}', pypi_paths.downloads, no_dependency=True
             )
         for path, _ in self._parse_pip_download_response(resp):
-            # fix path if it's a symlink
-            path = '{}/{}'.format(
-                pypi_paths.downloads, fs.basename(path).lower()
-            )
-            assert fs.exists(path), path
+            path = self._fix_download_path(path)
             if _auto_save_index:
                 self.index.add_to_index(path, 0)
             return path
     
+    def download_many(
+        self,
+        packages: t.Iterable[t.Tuple[T.PackageId, t.Optional[str]]],
+        _auto_save_index: bool = True,
+    ) -> t.Dict[T.PackageId, T.Path]:
+        """
+        download packages in a single pip call.
+        
+        params:
+            packages: ((pkg_id, custom_url), ...)
+                custom_url could be None or empty string.
+        returns: {pkg_id: download_path, ...}
+            if pip resolves a package to a file whose name does not match its -
+            package id, the package is not in the result. the caller should -
+            fall back to `download_one` for the missing ones.
+        """
+        requirements = {}
+        custom_urls = {}
+        for pkg_id, custom_url in packages:
+            if custom_url:
+                assert pkg_id in custom_url, (pkg_id, custom_url)
+                custom_urls[pkg_id] = custom_url
+            else:
+                requirements[pkg_id] = '{}=={}'.format(*self.split(pkg_id))
+        
+        resps = []
+        if requirements:
+            resps.append(self.pip.download_many(
+                requirements.values(), pypi_paths.downloads, no_dependency=True
+            ))
+        if custom_urls:
+            # like `download_one`, custom urls must not be resolved from the -
+            # index, so they go in a separate call with `--no-index`.
+            resps.append(self.pip.download_many(
+                custom_urls.values(),
+                pypi_paths.downloads,
+                no_dependency=True,
+                no_index=True,
+            ))
+        requirements.update(custom_urls)
+        if not requirements:
+            return {}
+        
+        out = {}
+        for path, _ in (
+            x for resp in resps
+            for x in self._parse_pip_download_response(resp)
+        ):
+            path = self._fix_download_path(path)
+            pkg_id = '{}-{}'.format(
+                *norm.split_filename_of_package(fs.basename(path))
+            )
+            if pkg_id in requirements and pkg_id not in out:
+                if _auto_save_index:
+                    self.index.add_to_index(path, 0)
+                out[pkg_id] = path
+        if len(out) < len(requirements):
+            print(
+                'some packages are not matched in batch downloading',
+                sorted(requirements.keys() - out.keys()), ':lv3'
+            )
+        return out
+    
     def install_one(
         self,
         pkg_id: T.PackageId,
@@ -74,7 +145,26 @@ class LocalPyPI:
         if not fs.exists(dst_path):
             fs.make_dirs(dst_path)
         try:
-            self.pip.install(src_path, dst_path, no_dependency=True)
+            if src_path.endswith('.whl'):
+                try:
+                    install_wheel(
+                        src_path,
+                        dst_path,
+                        paths.python.python,
+                        self.blob_store,
+                    )
+                except Exception as e:
+                    print(':v3', 'failed to unpack wheel, fall back to pip',
+                          fs.basename(src_path), e)
+                    fs.remove_tree(dst_path)
+                    fs.make_dirs(dst_path)
+                    self.pip.install(src_path, dst_path, no_dependency=True)
+                    if self.blob_store:
+                        self.blob_store.ingest_tree(dst_path)
+            else:  # sdist. it has to be built by pip.
+                self.pip.install(src_path, dst_path, no_dependency=True)
+                if self.blob_store:
+                    self.blob_store.ingest_tree(dst_path)
         except Exception as e:
             fs.remove_tree(dst_path)
             raise e
@@ -112,11 +202,31 @@ class LocalPyPI:
     
     @staticmethod
     def linking(
-        pkg_ids: t.Iterable[T.PackageId], dst_dir: T.Path, **_kwargs
+        pkg_ids: t.Iterable[T.PackageId],
+        dst_dir: T.Path,
+        mode: t.Literal['symlink', 'pth'] = 'symlink',
+        **_kwargs
     ) -> None:
         print(':d', f'linking required packages to "{dst_dir}"')
         # print(':l', pkg_ids)
-        link_venv(pkg_ids, dst_dir, **_kwargs)
+        if mode == 'pth':
+            make_pth_venv(pkg_ids, dst_dir)
+        else:
+            link_venv(pkg_ids, dst_dir, **_kwargs)
+    
+    @staticmethod
+    def relinking(
+        old_pkg_ids: t.Iterable[T.PackageId],
+        new_pkg_ids: t.Iterable[T.PackageId],
+        dst_dir: T.Path,
+        base_dir: T.Path = None,
+        **_kwargs
+    ) -> None:
+        """
+        see `depsland.venv.emerge.relink_venv`.
+        """
+        print(':d', f'relinking changed packages to "{dst_dir}"')
+        relink_venv(old_pkg_ids, new_pkg_ids, dst_dir, base_dir, **_kwargs)
         
     # -------------------------------------------------------------------------
     # general
@@ -150,6 +260,13 @@ class LocalPyPI:
     #     else:
     #         raise Exception(f'cannot find dist-info for {pkg_id}')
     
+    @staticmethod
+    def _fix_download_path(path: T.Path) -> T.Path:
+        # fix path if it's a symlink
+        path = '{}/{}'.format(pypi_paths.downloads, fs.basename(path).lower())
+        assert fs.exists(path), path
+        return path
+    
     @staticmethod
     def _parse_pip_download_response(
         resp: str
@@ -0,0 +1,267 @@
+"""
+an in-process wheel installer.
+
+a wheel is just a zip file with some conventions. installing it to a target -
+directory (what `pip install <whl> -t <dir> --no-deps` does) is unpacking -
+plus a few fix-ups. doing it in process saves a pip subprocess per package.
+
+ref:
+    https://packaging.python.org/en/latest/specifications/binary-distribution
+    -format/
+"""
+import base64
+import csv
+import hashlib
+import io
+import os
+import re
+import stat
+import typing as t
+from zipfile import ZipFile
+
+from lk_utils import fs
+
+from ..normalization import normalize_name
+
+if t.TYPE_CHECKING:
+    from .blobs import BlobStore
+
+
+class T:
+    AbsPath = str
+    RelPath = str  # relative to target dir, with '/' as separator.
+    Record = t.Tuple[RelPath, str, str]  # (relpath, 'sha256=<digest>', size)
+
+
+class InvalidWheel(Exception):
+    pass
+
+
+def install_wheel(
+    whl_file: T.AbsPath,
+    dst_dir: T.AbsPath,
+    python: str,
+    store: 'BlobStore' = None,
+) -> T.AbsPath:
+    """
+    unpack a wheel to `dst_dir`, with the same layout as `pip install -t`:
+        <dst_dir>
+            |- <package>                # purelib, platlib and data files
+            |- <name>-<ver>.dist-info
+            |- bin                      # scripts and entry points
+            |- include/<name>           # headers
+    
+    params:
+        python: the interpreter path to be written in scripts' shebang.
+        store: if given, files are written as hardlinks to the blob store.
+    """
+    records: t.Dict[T.RelPath, T.Record] = {}
+    
+    with ZipFile(whl_file) as z:
+        dist_info = _find_dist_info_dir(z.namelist(), fs.basename(whl_file))
+        data_dir = dist_info[:-len('.dist-info')] + '.data'
+        dist_name = normalize_name(dist_info.split('-', 1)[0])
+        old_records = _load_records(z.read(f'{dist_info}/RECORD'))
+        
+        for info in z.infolist():
+            if info.is_dir():
+                continue
+            src = info.filename
+            if src == f'{dist_info}/RECORD':
+                continue
+            
+            is_script = False
+            if src.startswith(data_dir + '/'):
+                try:
+                    scheme, rest = src[len(data_dir) + 1:].split('/', 1)
+                except ValueError:
+                    raise InvalidWheel('unexpected path in data dir', src)
+                if scheme in ('purelib', 'platlib', 'data'):
+                    dst = rest
+                elif scheme == 'scripts':
+                    dst = f'bin/{rest}'
+                    is_script = True
+                elif scheme == 'headers':
+                    dst = f'include/{dist_name}/{rest}'
+                else:
+                    raise InvalidWheel('unknown scheme in data dir', src)
+            else:
+                dst = src
+            
+            file_o = _safe_join(dst_dir, dst)
+            fs.make_dirs(fs.parent(file_o))
+            data = z.read(info)
+            if is_script and data.startswith(b'#!python'):
+                data = _fix_shebang(data, python)
+                records[dst] = _make_record(dst, data)
+            elif src in old_records:
+                records[dst] = (dst, *old_records[src][1:])
+            else:
+                records[dst] = _make_record(dst, data)
+            
+            mode = info.external_attr >> 16
+            executable = is_script or bool(mode and mode & stat.S_IXUSR)
+            if store:
+                store.write(data, file_o, executable)
+            else:
+                with open(file_o, 'wb') as f:
+                    f.write(data)
+                if executable:
+                    os.chmod(file_o, os.stat(file_o).st_mode | 0o111)
+        
+        entry_points = (
+            z.read(x).decode('utf-8')
+            if (x := f'{dist_info}/entry_points.txt') in z.namelist()
+            else ''
+        )
+    
+    if entry_points:
+        for relpath in _make_entry_point_scripts(
+            entry_points, f'{dst_dir}/bin', python
+        ):
+            with open(f'{dst_dir}/{relpath}', 'rb') as f:
+                records[relpath] = _make_record(relpath, f.read())
+    
+    installer = f'{dist_info}/INSTALLER'
+    with open(f'{dst_dir}/{installer}', 'wb') as f:
+        f.write(b'depsland\n')
+    records[installer] = _make_record(installer, b'depsland\n')
+    
+    # rewrite RECORD: paths are relative to `dst_dir`.
+    record_file = f'{dist_info}/RECORD'
+    with open(f'{dst_dir}/{record_file}', 'w', encoding='utf-8', newline='') \
+            as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerows(sorted(records.values()))
+        writer.writerow((record_file, '', ''))
+    
+    return dst_dir
+
+
+# -----------------------------------------------------------------------------
+
+
+def _find_dist_info_dir(names: t.Iterable[str], filename: str) -> str:
+    """
+    returns: e.g. 'lk_utils-3.1.3.dist-info'
+    """
+    found = {
+        x.split('/', 1)[0] for x in names
+        if re.match(r'[^/]+\.dist-info/', x)
+    }
+    if len(found) != 1:
+        raise InvalidWheel('cannot determine dist-info dir', filename, found)
+    return found.pop()
+
+
+def _fix_shebang(data: bytes, python: str) -> bytes:
+    """
+    '#!python' -> '#!<python>'. see "recommended installer features" in the -
+    wheel spec.
+    """
+    first_line, rest = data.split(b'\n', 1) if b'\n' in data else (data, b'')
+    first_line = first_line.rstrip(b'\r')
+    args = first_line[len(b'#!python'):]
+    if args and not args.startswith((b' ', b'w')):
+        # e.g. '#!python3' is not the placeholder we are looking for.
+        return data
+    if args.startswith(b'w'):  # '#!pythonw'
+        args = args[1:]
+    if ' ' in python:
+        python = f'"{python}"'
+    return b'#!' + python.encode('utf-8') + args + b'\n' + rest
+
+
+def _load_records(content: bytes) -> t.Dict[T.RelPath, T.Record]:
+    out = {}
+    for row in csv.reader(io.StringIO(content.decode('utf-8'))):
+        if row:
+            path, digest, size = (row + ['', ''])[:3]
+            out[path] = (path, digest, size)
+    return out
+
+
+def _make_entry_point_scripts(
+    entry_points: str, bin_dir: T.AbsPath, python: str
+) -> t.Iterator[T.RelPath]:
+    """
+    generate launchers for "console_scripts" and "gui_scripts".
+    we use pip's vendored distlib to make them, which is also what pip does. -
+    on windows it creates '.exe' launchers.
+    """
+    sections = _parse_entry_points(entry_points)
+    if not any(sections.values()):
+        return
+    fs.make_dirs(bin_dir)
+    try:
+        from pip._vendor.distlib.scripts import ScriptMaker
+    except ImportError:  # not likely to happen, pip is our dependency.
+        ScriptMaker = None
+    
+    for section, is_gui in (('console_scripts', False), ('gui_scripts', True)):
+        for name, target in sections.get(section, {}).items():
+            module, _, func = target.partition(':')
+            if ScriptMaker:
+                maker = ScriptMaker(None, bin_dir)
+                maker.clobber = True
+                maker.executable = python
+                maker.variants = {''}
+                for path in maker.make(
+                    f'{name} = {module}:{func}', {'gui': is_gui}
+                ):
+                    yield 'bin/{}'.format(fs.basename(path))
+            else:
+                file = f'{bin_dir}/{name}'
+                fs.dump(_SCRIPT_TEMPLATE.format(
+                    python=python,
+                    module=module,
+                    attr=func.split('.', 1)[0],
+                    func=func,
+                ), file, 'plain')
+                os.chmod(file, os.stat(file).st_mode | 0o111)
+                yield f'bin/{name}'
+
+
+def _make_record(relpath: T.RelPath, data: bytes) -> T.Record:
+    digest = base64.urlsafe_b64encode(
+        hashlib.sha256(data).digest()
+    ).rstrip(b'=').decode('ascii')
+    return relpath, f'sha256={digest}', str(len(data))
+
+
+def _parse_entry_points(content: str) -> t.Dict[str, t.Dict[str, str]]:
+    """
+    a simple ini parser. `configparser` is not used because entry names may -
+    contain characters it dislikes (e.g. ':').
+    """
+    out: t.Dict[str, t.Dict[str, str]] = {}
+    section = None
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith(('#', ';')):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            section = out.setdefault(line[1:-1].strip(), {})
+        elif section is not None and '=' in line:
+            k, v = line.split('=', 1)
+            section[k.strip()] = v.split('[', 1)[0].strip()
+            #   strip extras, e.g. 'foo = foo.cli:main [extra]'
+    return out
+
+
+def _safe_join(root: T.AbsPath, relpath: T.RelPath) -> T.AbsPath:
+    root = fs.normpath(root)
+    path = fs.normpath(f'{root}/{relpath}')
+    if not path.startswith(root + '/'):
+        raise InvalidWheel('path escapes the target dir', relpath)
+    return path
+
+
+_SCRIPT_TEMPLATE = '''#!{python}
+import re
+import sys
+from {module} import {attr}
+if __name__ == '__main__':
+    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])
+    sys.exit({func}())
+'''
@@ -1,10 +1,16 @@
 from . import ziptool
+from .filelock import FileLock
+from .fs import atomic_write
 from .fs import make_temp_dir
 from .fs import get_content_hash
 from .fs import get_file_hash
+from .fs import get_hash_algorithm
 from .fs import get_updated_time
 from .fs import init_target_tree
+from .fs import sha256_file
+from .hash_cache import HashCache
 from .mklink import mergelink
 from .mklink import mergelinks
 from .mklink import mklink
 from .mklink import mklinks
+from .workers import run_in_pool
@@ -0,0 +1,242 @@
+"""
+binary patches between two versions of a file (or of files in a dir).
+
+both versions are split into small content-defined chunks (see `.chunking`). -
+a chunk of the new version which also exists in the old version becomes a -
+"copy" op (offset and size in the old file), others are kept as literal -
+bytes.
+
+a patch records the sha256 of both versions, `apply_patch` raises -
+`PatchError` if the old file or the result mismatches (or the patch is -
+malformed). the caller should fall back to a full download then.
+
+format: `_MAGIC` followed by zlib compressed, little endian records. the -
+header is a flag byte (0 if there is no old file) and the two sha256 -
+digests, see `_HEADER`. then the ops follow, a copy is `_COPY` (tag, -
+offset, size), a literal is `_LITERAL` (tag, size) plus the bytes. it is a -
+plain format, a downloaded patch is parsed but never evaluated.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+import typing as t
+import zlib
+from zipfile import ZIP_STORED
+from zipfile import ZipFile
+
+from .chunking import find_chunks
+from .fs import atomic_write
+from .fs import sha256_file
+
+
+class T:
+    Op = t.Union[t.Tuple[int, int], bytes]  # (offset, size) | literal
+    Patch = t.TypedDict('Patch', {
+        'old': str,  # sha256 of the old file, empty if no old file
+        'new': str,  # sha256 of the new file
+        'ops': t.List[Op],
+    })
+    Path = str
+
+
+class PatchError(Exception):
+    pass
+
+
+_MAGIC = b'depsland-patch:2\n'
+_HEADER = struct.Struct('<B32s32s')
+_COPY = struct.Struct('<BQQ')
+_LITERAL = struct.Struct('<BQ')
+_OP_COPY, _OP_LITERAL = 0, 1
+
+# anchors are line breaks (for text files) or a random byte (for binary -
+# files), with a 5-bit crc mask test. chunks are about 2KB ~ 8KB.
+_PATTERN = re.compile(b'[\\n\\x8a]')
+_MIN_SIZE = 256
+_MAX_SIZE = 64 * 1024
+
+
+def make_patch(old_file: t.Optional[T.Path], new_file: T.Path) -> bytes:
+    """
+    params:
+        old_file: None means an empty file, i.e. all bytes are literals.
+    """
+    with _open(old_file) as old, _open(new_file) as new:
+        index = {}
+        for offset, size in _find_chunks(old):
+            index.setdefault(
+                hashlib.md5(old[offset:offset + size]).digest(),
+                (offset, size),
+            )
+        
+        ops: t.List[T.Op] = []
+        for offset, size in _find_chunks(new):
+            data = new[offset:offset + size]
+            if (x := index.get(hashlib.md5(data).digest())) and \
+                    old[x[0]:x[0] + x[1]] == data:
+                if ops and isinstance(ops[-1], tuple) and \
+                        sum(ops[-1]) == x[0]:
+                    ops[-1] = (ops[-1][0], ops[-1][1] + x[1])
+                else:
+                    ops.append(x)
+            else:
+                if ops and isinstance(ops[-1], bytes):
+                    ops[-1] += data
+                else:
+                    ops.append(data)
+        
+        patch: T.Patch = {
+            'old': sha256_file(old_file) if old_file else '',
+            'new': sha256_file(new_file),
+            'ops': ops,
+        }
+    return _MAGIC + zlib.compress(_dump_patch(patch), 6)
+
+
+def apply_patch(
+    old_file: t.Optional[T.Path], patch: bytes, new_file: T.Path
+) -> None:
+    """
+    `new_file` can be the same as `old_file`, it is replaced atomically.
+    """
+    if not patch.startswith(_MAGIC):
+        raise PatchError('not a patch')
+    try:
+        data = _load_patch(zlib.decompress(patch[len(_MAGIC):]))
+    except (zlib.error, struct.error) as e:
+        raise PatchError('broken patch', e)
+    
+    if data['old'] and (
+        not old_file or sha256_file(old_file) != data['old']
+    ):
+        raise PatchError('old file mismatch', old_file)
+    
+    # the mmap is closed before the rename, `new_file` may be `old_file`.
+    with atomic_write(new_file) as tmp, _open(old_file) as old:
+        sha256 = hashlib.sha256()
+        with open(tmp, 'wb') as f:
+            for op in data['ops']:
+                if isinstance(op, bytes):
+                    chunk = op
+                else:
+                    chunk = old[op[0]:op[0] + op[1]]
+                    if len(chunk) != op[1]:
+                        raise PatchError('copy out of range', op)
+                f.write(chunk)
+                sha256.update(chunk)
+        if sha256.hexdigest() != data['new']:
+            raise PatchError('new file mismatch', new_file)
+
+
+def make_dir_patch(
+    old_dir: T.Path,
+    new_dir: T.Path,
+    relpaths: t.Iterable[str],
+    file_o: T.Path,
+) -> int:
+    """
+    pack patches of the given files (relative to both dirs) in a zip file.
+    
+    returns: total size of the patches.
+    """
+    total = 0
+    with ZipFile(file_o, 'w', compression=ZIP_STORED) as z:
+        for relpath in relpaths:
+            old_file = f'{old_dir}/{relpath}'
+            patch = make_patch(
+                old_file if os.path.isfile(old_file) else None,
+                f'{new_dir}/{relpath}',
+            )
+            z.writestr(relpath, patch)
+            total += len(patch)
+    return total
+
+
+def apply_dir_patch(file_i: T.Path, dir_o: T.Path) -> None:
+    """
+    `dir_o` is a copy of the old dir, the patched files are updated in place.
+    """
+    with ZipFile(file_i, 'r') as z:
+        for relpath in z.namelist():
+            file = f'{dir_o}/{relpath}'
+            if os.path.isfile(file):
+                apply_patch(file, z.read(relpath), file)
+            else:
+                os.makedirs(os.path.dirname(file), exist_ok=True)
+                apply_patch(None, z.read(relpath), file)
+
+
+# -----------------------------------------------------------------------------
+
+
+class _open:
+    """
+    open a file as a read-only mmap. None or an empty file gives empty bytes.
+    """
+    
+    def __init__(self, file: t.Optional[T.Path]) -> None:
+        self._file = file
+        self._f = None
+        self._m = None
+    
+    def __enter__(self) -> t.Union[bytes, mmap.mmap]:
+        if not self._file or os.path.getsize(self._file) == 0:
+            return b''
+        self._f = open(self._file, 'rb')
+        self._m = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._m
+    
+    def __exit__(self, *_) -> None:
+        if self._m is not None:
+            self._m.close()
+            self._f.close()
+
+
+def _dump_patch(patch: T.Patch) -> bytes:
+    out = [_HEADER.pack(
+        1 if patch['old'] else 0,
+        bytes.fromhex(patch['old']) if patch['old'] else bytes(32),
+        bytes.fromhex(patch['new']),
+    )]
+    for op in patch['ops']:
+        if isinstance(op, bytes):
+            out.append(_LITERAL.pack(_OP_LITERAL, len(op)))
+            out.append(op)
+        else:
+            out.append(_COPY.pack(_OP_COPY, *op))
+    return b''.join(out)
+
+
+def _load_patch(data: bytes) -> T.Patch:
+    """
+    raises: `struct.error` if the data is truncated, `PatchError` if it is -
+        malformed otherwise.
+    """
+    has_old, old, new = _HEADER.unpack_from(data)
+    ops: t.List[T.Op] = []
+    pos = _HEADER.size
+    while pos < len(data):
+        if data[pos] == _OP_COPY:
+            _, offset, size = _COPY.unpack_from(data, pos)
+            ops.append((offset, size))
+            pos += _COPY.size
+        elif data[pos] == _OP_LITERAL:
+            _, size = _LITERAL.unpack_from(data, pos)
+            pos += _LITERAL.size
+            if pos + size > len(data):
+                raise struct.error('truncated literal')
+            ops.append(data[pos:pos + size])
+            pos += size
+        else:
+            raise PatchError('unknown op', data[pos])
+    return {
+        'old': old.hex() if has_old else '',
+        'new': new.hex(),
+        'ops': ops,
+    }
+
+
+def _find_chunks(data: t.Union[bytes, mmap.mmap]) -> t.Iterator[t.Tuple]:
+    return find_chunks(data, _MIN_SIZE, _MAX_SIZE, _PATTERN, 0x1F)
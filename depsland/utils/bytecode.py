@@ -0,0 +1,99 @@
+"""
+compile ".py" files to "__pycache__/*.pyc" ahead of time, so that the first -
+launch of an app does not pay for it.
+
+`py_compile` holds the GIL, threads cannot compile in parallel. we split the -
+files into chunks, and each worker thread (see `.workers.run_in_pool`) hands -
+its chunk to a child python process.
+"""
+import os
+import subprocess
+import sys
+import typing as t
+from functools import partial
+from importlib.util import cache_from_source
+
+from .workers import run_in_pool
+
+
+class T:
+    Path = str
+    # see `py_compile.PycInvalidationMode`
+    InvalidationMode = t.Literal['TIMESTAMP', 'CHECKED_HASH', 'UNCHECKED_HASH']
+
+
+# the child process reads file paths from stdin, one per line.
+_SCRIPT = '''
+import py_compile, sys
+mode = py_compile.PycInvalidationMode[sys.argv[1]]
+for file in sys.stdin.buffer.read().decode('utf-8').splitlines():
+    try:
+        py_compile.compile(file, doraise=True, invalidation_mode=mode)
+    except Exception:
+        pass  # e.g. py2 syntax in unused scripts, same as pip does.
+'''
+
+
+def find_sources(
+    paths: t.Iterable[T.Path], skip_compiled: bool = True
+) -> t.List[T.Path]:
+    """
+    params:
+        paths: files or directories.
+        skip_compiled: skip the source if its ".pyc" exists.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(_find_sources(path))
+        elif path.endswith('.py') and os.path.isfile(path):
+            files.append(path)
+    if skip_compiled:
+        files = [x for x in files if not os.path.exists(cache_from_source(x))]
+    return files
+
+
+def compile_bytecode(
+    files: t.Sequence[T.Path],
+    invalidation_mode: T.InvalidationMode = 'UNCHECKED_HASH',
+    max_workers: int = None,
+    chunk_size: int = 200,
+) -> t.Iterator[int]:
+    """
+    params:
+        files: see `find_sources`.
+        invalidation_mode: "UNCHECKED_HASH" is for files which never change -
+            after installation (e.g. `pypi/installed`), the interpreter does -
+            not even check the source. use "CHECKED_HASH" for files which may -
+            be replaced later.
+    yields: count of compiled files, after each chunk is done.
+    """
+    chunks = [
+        files[i:i + chunk_size] for i in range(0, len(files), chunk_size)
+    ]
+    done = 0
+    for chunk, _ in run_in_pool(
+        partial(_compile_chunk, invalidation_mode=invalidation_mode),
+        chunks,
+        max_workers=max_workers or os.cpu_count() or 1,
+    ):
+        done += len(chunk)
+        yield done
+
+
+def _compile_chunk(
+    files: t.List[T.Path], invalidation_mode: T.InvalidationMode
+) -> None:
+    subprocess.run(
+        (sys.executable, '-c', _SCRIPT, invalidation_mode),
+        input='\n'.join(files).encode('utf-8'),
+        check=True,
+    )
+
+
+def _find_sources(root: T.Path) -> t.Iterator[T.Path]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [x for x in dirnames if x != '__pycache__']
+        for n in filenames:
+            if n.endswith('.py'):
+                yield f'{dirpath}/{n}'
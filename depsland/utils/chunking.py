@@ -0,0 +1,54 @@
+"""
+content-defined chunking.
+
+a boundary is placed right after the first "anchor" found beyond `min_size` -
+from the previous boundary (or at `max_size` if none is found). an anchor is -
+a match of a byte pattern, whose following bytes pass a crc32 mask test. -
+since the boundaries depend on the content (not the offset), an insertion -
+or deletion only changes the chunks around it.
+
+the anchor spacing must be much larger than `min_size`, so that the -
+boundaries after a changed region quickly realign with the old ones.
+
+we search the pattern with `re` (C speed) rather than a rolling hash -
+computed byte by byte in python, which is too slow for large files.
+"""
+import mmap
+import re
+import typing as t
+from zlib import crc32
+
+
+class T:
+    Data = t.Union[bytes, mmap.mmap]
+    Chunk = t.Tuple[int, int]  # (offset, size)
+
+
+def find_chunks(
+    data: T.Data,
+    min_size: int,
+    max_size: int,
+    pattern: re.Pattern,
+    mask: int,
+) -> t.Iterator[T.Chunk]:
+    """
+    params:
+        pattern: a bytes regex, the candidates of anchors.
+        mask: a candidate is an anchor if `crc32(<next 8 bytes>) & mask` is -
+            zero. so the average anchor spacing is about `(mask + 1) * -
+            <average spacing of pattern matches>`.
+    yields: (offset, size) of each chunk.
+    """
+    total = len(data)
+    start = 0
+    while start < total:
+        end = min(start + max_size, total)
+        if end - start > min_size:
+            pos = start + min_size
+            while m := pattern.search(data, pos, end):
+                pos = m.end()
+                if crc32(data[pos:pos + 8]) & mask == 0:
+                    end = pos
+                    break
+        yield start, end - start
+        start = end
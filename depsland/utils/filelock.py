@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+import typing as t
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    an inter-process exclusive lock based on a lock file.
+    it is reentrant in the same process, and thread-safe.
+    
+    usage:
+        with FileLock('path/to/.lock'):
+            ...
+    """
+    
+    def __init__(self, path: str, timeout: float = 60) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._count = 0
+        self._file: t.Optional[t.IO] = None
+        self._lock = threading.RLock()
+    
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+    
+    def __exit__(self, *_) -> None:
+        self.release()
+    
+    def acquire(self) -> None:
+        self._lock.acquire()
+        if self._count == 0:
+            try:
+                self._file = open(self.path, 'a+b')
+                _lock_file(self._file, self.timeout)
+            except BaseException:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._count += 1
+    
+    def release(self) -> None:
+        self._count -= 1
+        if self._count == 0:
+            _unlock_file(self._file)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+
+def _lock_file(file: t.IO, timeout: float) -> None:
+    start = time.monotonic()
+    while True:
+        try:
+            if os.name == 'nt':
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except OSError:
+            if time.monotonic() - start > timeout:
+                raise TimeoutError(f'cannot acquire file lock: {file.name}')
+            time.sleep(0.05)
+
+
+def _unlock_file(file: t.IO) -> None:
+    if os.name == 'nt':
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
@@ -1,28 +1,119 @@
 import atexit
 import hashlib
+import mmap
 import os
 import shutil
 import typing as t
+from contextlib import contextmanager
 from uuid import uuid1
 
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+_MMAP_THRESHOLD = 64 * 1024 * 1024
+
 
 def get_content_hash(content: str) -> str:
     return hashlib.md5(content.encode()).hexdigest()
 
 
-def get_file_hash(filepath: str) -> str:
+def get_file_hash(filepath: str, algorithm: str = 'md5') -> str:
+    """
+    digest of the full content.
+    
+    params:
+        algorithm: 'md5', 'xxh3' or 'blake3', see `get_hash_algorithm`. -
+            an md5 digest is a bare hex digest, which is the same as before -
+            for files under 3MB (previous versions only read the first 8192 -
+            bytes of larger files). others are prefixed with the algorithm -
+            name, e.g. "blake3:3f2a...".
+    """
+    h = _new_hasher(algorithm)
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        if size >= _MMAP_THRESHOLD:
+            # hashlib releases the GIL while consuming a big buffer, mmap -
+            # avoids copying the file into python bytes chunk by chunk.
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+        else:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+    if algorithm == 'md5':
+        return h.hexdigest()
+    return f'{algorithm}:{h.hexdigest()}'
+
+
+def get_hash_algorithm(name: str = 'md5') -> str:
     """
-    if file is too big, read the first 8192 bytes.
-    https://blog.csdn.net/qq_26373925/article/details/115409308
+    check that the algorithm of `get_file_hash` is usable on this machine.
+    
+    params:
+        name: 'md5', 'xxh3', 'blake3', or 'auto' for the fastest installed -
+            one. note 'auto' gives different digests on machines with -
+            different packages installed.
+    """
+    if name == 'auto':
+        return 'blake3' if blake3 else 'xxh3' if xxhash else 'md5'
+    if name not in ('md5', 'xxh3', 'blake3'):
+        raise ValueError('unknown hash algorithm', name)
+    if (name == 'blake3' and blake3 is None) or \
+            (name == 'xxh3' and xxhash is None):
+        raise ImportError(
+            'hash algorithm "{}" requires package "{}" to be installed'.format(
+                name, 'blake3' if name == 'blake3' else 'xxhash'
+            )
+        )
+    return name
+
+
+def _new_hasher(algorithm: str):
+    if algorithm == 'blake3':
+        return blake3.blake3()
+    if algorithm == 'xxh3':
+        return xxhash.xxh3_128()
+    return hashlib.md5()
+
+
+def sha256_file(filepath: str) -> str:
+    """
+    sha256 hex digest of the full content. unlike `get_file_hash`, the -
+    algorithm is fixed, it is used where the digest is an address (blobs, -
+    chunks) or a checksum stored in other files.
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+@contextmanager
+def atomic_write(filepath: str) -> t.Iterator[str]:
+    """
+    yield a temp path next to `filepath`, which is renamed to `filepath` when -
+    the block exits normally, or removed if it raises. so other threads (and -
+    processes) never see a half-written file, and an existing hardlink at -
+    `filepath` is replaced rather than overwritten in place.
+    
+    usage:
+        with atomic_write(file) as tmp:
+            fs.dump(data, tmp)
     """
-    file = open(filepath, 'rb')
-    md5 = hashlib.md5()
-    if os.path.getsize(filepath) > 3 * 1024 * 1024:
-        md5.update(file.read(8192))
-    else:
-        md5.update(file.read())
-    file.close()
-    return md5.hexdigest()
+    tmp = f'{filepath}.{uuid1().hex}.tmp'
+    try:
+        yield tmp
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, filepath)
 
 
 def get_updated_time(path: str, recursive=False) -> int:
@@ -32,15 +123,20 @@ def get_updated_time(path: str, recursive=False) -> int:
         path = os.path.realpath(path)
     assert os.path.isdir(path), path  # if assertion error, it may because this
     #   path not exists
-    mtime = int(os.path.getmtime(path))
-    if recursive is False or not os.listdir(path):
-        return mtime
-    else:
-        # https://stackoverflow.com/questions/29685069/get-the-last-modified
-        # -date-of-a-directory-including-subdirectories-using-pytho
-        return max((mtime, max(map(int, map(
-            os.path.getmtime, (root for root, _, _ in os.walk(path))
-        )))))
+    mtime = os.path.getmtime(path)
+    if recursive is False:
+        return int(mtime)
+    # walk with `os.scandir`, whose entries carry the stat info (on windows) -
+    # or at least the file type (on posix), which is much cheaper than -
+    # `os.walk` + `os.path.getmtime` for large directories.
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    mtime = max(mtime, e.stat(follow_symlinks=False).st_mtime)
+                    stack.append(e.path)
+    return int(mtime)
 
 
 def init_target_tree(root: str, relpath_dirs: t.Iterable[str]) -> None:
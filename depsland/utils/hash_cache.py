@@ -0,0 +1,115 @@
+"""
+a persistent cache of file digests.
+
+an entry is keyed by absolute path, and is valid as long as the file's -
+(size, mtime_ns, inode) are unchanged. so re-publishing a project with a -
+large data directory only hashes the files which are really modified.
+"""
+import os
+import pickle
+import threading
+import typing as t
+
+from .fs import atomic_write
+from .fs import get_file_hash
+from .fs import get_hash_algorithm
+from .workers import run_in_pool
+
+
+class T:
+    Digest = str
+    Path = str
+    Stamp = t.Tuple[int, int, int]  # (size, mtime_ns, inode)
+    Entries = t.Dict[Path, t.Tuple[Stamp, Digest]]
+
+
+# bump it when `get_file_hash` changes. the cache is also discarded if it was -
+# made with another algorithm.
+_VERSION = 2
+# drop the entries not used in current session if the cache grows too large.
+_MAX_ENTRIES = 200_000
+
+
+class HashCache:
+    
+    def __init__(self, file: T.Path, algorithm: str = 'md5') -> None:
+        """
+        params:
+            algorithm: see `.fs.get_hash_algorithm`. it is checked when the -
+                cache is first used.
+        """
+        self.algorithm = algorithm
+        self.file = file
+        self._dirty = False
+        self._entries: t.Optional[T.Entries] = None  # lazy loaded.
+        self._lock = threading.Lock()
+        self._used: t.Set[T.Path] = set()
+    
+    def get_hash(self, path: T.Path) -> T.Digest:
+        return self.get_hashes((path,))[path]
+    
+    def get_hashes(
+        self, paths: t.Iterable[T.Path], max_workers: int = 8
+    ) -> t.Dict[T.Path, T.Digest]:
+        """
+        cache misses are hashed in a thread pool (hashlib releases the GIL -
+        when hashing large data).
+        """
+        if self._entries is None:
+            self.algorithm = get_hash_algorithm(self.algorithm)
+            self._entries = self._load()
+        out = {}
+        misses = []
+        for path in paths:
+            stamp = _get_stamp(path)
+            self._used.add(path)
+            if (x := self._entries.get(path)) and x[0] == stamp:
+                out[path] = x[1]
+            else:
+                misses.append((path, stamp))
+        for (path, stamp), digest in run_in_pool(
+            lambda x: get_file_hash(x[0], self.algorithm),
+            misses,
+            max_workers,
+        ):
+            out[path] = digest
+            with self._lock:
+                self._entries[path] = (stamp, digest)
+                self._dirty = True
+        return out
+    
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        if len(self._entries) > _MAX_ENTRIES:
+            self._entries = {
+                k: v for k, v in self._entries.items() if k in self._used
+            }
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        with atomic_write(self.file) as tmp, open(tmp, 'wb') as f:
+            pickle.dump({
+                'version'  : _VERSION,
+                'algorithm': self.algorithm,
+                'entries'  : self._entries,
+            }, f)
+        self._dirty = False
+    
+    def _load(self) -> T.Entries:
+        if not os.path.exists(self.file):
+            return {}
+        try:
+            with open(self.file, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            print(':v3', 'broken hash cache, ignored', self.file, e)
+            return {}
+        if (data.get('version'), data.get('algorithm')) != (
+            _VERSION, self.algorithm
+        ):
+            return {}
+        return data['entries']
+
+
+def _get_stamp(path: T.Path) -> T.Stamp:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_ino
@@ -0,0 +1,116 @@
+import os
+import typing as t
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+import psutil
+
+_T = t.TypeVar('_T')
+_R = t.TypeVar('_R')
+
+
+def run_in_pool(
+    func: t.Callable[[_T], _R],
+    items: t.Iterable[_T],
+    max_workers: int = 4,
+) -> t.Iterator[t.Tuple[_T, _R]]:
+    """
+    run `func` for each item in a bounded thread pool, yields `(item, result)` -
+    in the order of completion.
+    
+    the jobs we put here are mostly subprocess (pip) or network bound, so -
+    threads are good enough. the tricky part is interruption: python delivers -
+    `KeyboardInterrupt` only to the main thread, and a blocking wait on -
+    futures cannot be interrupted on windows. so we poll with a short timeout, -
+    and once interrupted (or any job failed), we cancel the pending jobs and -
+    terminate the child processes spawned by running jobs, then re-raise.
+    child processes which exist before the pool starts are left alone.
+    if the caller stops iterating early (`GeneratorExit`), the pending jobs -
+    are cancelled, the running ones are left to finish.
+    
+    params:
+        max_workers: if less than 2, jobs run one by one in the current thread.
+    """
+    items = tuple(items)
+    if max_workers < 2 or len(items) < 2:
+        for x in items:
+            yield x, func(x)
+        return
+    
+    known_children = set(_get_child_processes())
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    futures: t.Dict[Future, _T] = {pool.submit(func, x): x for x in items}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(
+                pending, timeout=0.5, return_when=FIRST_COMPLETED
+            )
+            for f in done:
+                yield futures[f], f.result()
+    except GeneratorExit:
+        for f in pending:
+            f.cancel()
+        raise
+    except BaseException:  # including KeyboardInterrupt
+        print(
+            'stop worker pool, cancel {} pending jobs'.format(len(pending)),
+            ':v4'
+        )
+        for f in pending:
+            f.cancel()
+        kill_child_processes(exclude=known_children)
+        raise
+    finally:
+        pool.shutdown(wait=False)
+
+
+def kill_child_processes(
+    exclude: t.Container[t.Tuple[int, float]] = (), timeout: float = 3
+) -> None:
+    """
+    terminate the child processes of the current process, with their -
+    descendants.
+    
+    params:
+        exclude: `(pid, create_time)` of the children to keep, see -
+            `_get_child_processes`.
+    """
+    children = []
+    for key, p in _get_child_processes().items():
+        if key in exclude:
+            continue
+        children.append(p)
+        try:
+            children.extend(p.children(recursive=True))
+        except psutil.NoSuchProcess:
+            pass
+    if not children:
+        return
+    for p in children:
+        try:
+            p.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(children, timeout=timeout)
+    for p in alive:
+        try:
+            p.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+
+def _get_child_processes() -> t.Dict[t.Tuple[int, float], psutil.Process]:
+    """
+    returns: `{(pid, create_time): process, ...}` of the direct children. -
+        the create time tells apart a reused pid.
+    """
+    out = {}
+    for p in psutil.Process(os.getpid()).children():
+        try:
+            out[(p.pid, p.create_time())] = p
+        except psutil.NoSuchProcess:
+            pass
+    return out
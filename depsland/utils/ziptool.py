@@ -1,7 +1,10 @@
 import os
 import shutil
+import struct
 import typing as t
+import zlib
 from zipfile import ZIP_DEFLATED
+from zipfile import ZIP_STORED
 from zipfile import ZipFile
 
 from lk_utils import fs
@@ -44,6 +47,32 @@ def compress_file(file_i: str, file_o: str, overwrite: bool = None) -> str:
     return file_o
 
 
+def compress_files(
+    dir_i: str, relpaths: t.Iterable[str], file_o: str
+) -> str:
+    """
+    compress some files of `dir_i`, the arcnames are their relpaths (no top -
+    name). it makes delta archives, see `extract_files`.
+    """
+    with ZipFile(file_o, 'w', compression=ZIP_DEFLATED, compresslevel=7) as z:
+        for relpath in relpaths:
+            z.write(f'{dir_i}/{relpath}', arcname=relpath)
+    return file_o
+
+
+def extract_files(file_i: str, dir_o: str) -> str:
+    """
+    extract all files of `file_i` into an existing dir, overwriting the files -
+    of the same relpaths. unlike `extract_file`, `dir_o` is not removed first.
+    """
+    with ZipFile(file_i, 'r') as z:
+        if _IS_WINDOWS:
+            z.extractall('\\\\?\\' + dir_o.replace('/', '\\'))
+        else:
+            z.extractall(dir_o)
+    return dir_o
+
+
 def extract_file(file_i: str, path_o: str, overwrite: bool = None) -> str:
     # print(file_i, path_o, overwrite, fs.exists(path_o), ':lv')
     if fs.exists(path_o):
@@ -59,7 +88,6 @@ def extract_file(file_i: str, path_o: str, overwrite: bool = None) -> str:
         # if dir_o.endswith('/.'):
         #     dir_o = dir_o[:-2]
     
-    dirname_o = fs.basename(fs.abspath(dir_o))
     with ZipFile(file_i, 'r', compression=ZIP_DEFLATED, compresslevel=7) as z:
         if _IS_WINDOWS:
             # avoid path limit error in windows.
@@ -68,6 +96,107 @@ def extract_file(file_i: str, path_o: str, overwrite: bool = None) -> str:
         else:
             z.extractall(dir_o)
     
+    _move_up_single_dir(dir_o)
+    return dir_o
+
+
+class StreamError(Exception):
+    """
+    the archive cannot be extracted as a stream (e.g. it uses data -
+    descriptors), or it is broken. the caller should fall back to -
+    `extract_file`.
+    """
+    pass
+
+
+def extract_stream(
+    chunks: t.Iterable[bytes], dir_o: str, overwrite: bool = None
+) -> str:
+    """
+    extract a zip archive while its bytes are arriving (e.g. from a -
+    download), so the extraction overlaps with the network, and the archive -
+    is never written to or read back from disk.
+    
+    a zip file can be read from the start since every entry is preceded by a -
+    local header. it requires the sizes to be known in the local header, -
+    which is true for the archives made by `ZipFile` on a regular file (i.e. -
+    all archives made by us). otherwise `StreamError` is raised.
+    
+    the result is the same as `extract_file` for a dir.
+    """
+    if fs.exists(dir_o):
+        if not _overwrite(dir_o, overwrite):
+            return dir_o
+    os.makedirs(dir_o)
+    if _IS_WINDOWS:
+        root = '\\\\?\\' + dir_o.replace('/', '\\')
+    else:
+        root = dir_o
+    
+    reader = _StreamReader(chunks)
+    while True:
+        sig = reader.read(4)
+        if sig in (b'PK\x01\x02', b'PK\x05\x06'):
+            # the central directory, all entries are done.
+            break
+        if sig != b'PK\x03\x04':
+            raise StreamError('bad local header', sig)
+        (
+            _, flags, method, _, _, crc, comp_size, size, name_len, extra_len
+        ) = struct.unpack('<HHHHHIIIHH', reader.read(26))
+        name = reader.read(name_len).decode(
+            'utf-8' if flags & 0x800 else 'cp437'
+        )
+        extra = reader.read(extra_len)
+        if flags & 0x01:
+            raise StreamError('encrypted entry', name)
+        if flags & 0x08:
+            raise StreamError('sizes are in data descriptor', name)
+        if method not in (ZIP_STORED, ZIP_DEFLATED):
+            raise StreamError('unsupported compression', name, method)
+        if 0xFFFFFFFF in (size, comp_size):
+            size, comp_size = _read_zip64_sizes(extra, size, comp_size)
+        
+        parts = [
+            x for x in name.replace('\\', '/').split('/')
+            if x not in ('', '.', '..')
+        ]
+        if not parts:
+            continue
+        path = os.path.join(root, *parts)
+        if name.endswith('/'):
+            os.makedirs(path, exist_ok=True)
+            reader.skip(comp_size)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        decomp = zlib.decompressobj(-15) if method == ZIP_DEFLATED else None
+        crc_o = size_o = 0
+        with open(path, 'wb') as f:
+            remaining = comp_size
+            while remaining:
+                data = reader.read_some(min(remaining, 1024 * 1024))
+                remaining -= len(data)
+                if decomp:
+                    data = decomp.decompress(data)
+                f.write(data)
+                crc_o = zlib.crc32(data, crc_o)
+                size_o += len(data)
+            if decomp:
+                data = decomp.flush()
+                f.write(data)
+                crc_o = zlib.crc32(data, crc_o)
+                size_o += len(data)
+        if (crc_o, size_o) != (crc, size):
+            raise StreamError('crc or size mismatch', name)
+    
+    reader.drain()
+    _move_up_single_dir(dir_o)
+    return dir_o
+
+
+def _move_up_single_dir(dir_o: str) -> None:
+    dirname_o = fs.basename(fs.abspath(dir_o))
     dlist = tuple(
         x for x in os.listdir(dir_o)
         if x not in ('.DS_Store', '__MACOSX')
@@ -94,7 +223,6 @@ def extract_file(file_i: str, path_o: str, overwrite: bool = None) -> str:
                     'with its parent.)[/]',
                     ':r',
                 )
-    return dir_o
 
 
 def _overwrite(target: str, scheme: t.Optional[bool]) -> bool:
@@ -125,3 +253,58 @@ def _overwrite(target: str, scheme: t.Optional[bool]) -> bool:
         return True
     if scheme is False:
         raise FileExistsError(target)
+
+
+def _read_zip64_sizes(
+    extra: bytes, size: int, comp_size: int
+) -> t.Tuple[int, int]:
+    i = 0
+    while i + 4 <= len(extra):
+        tag, length = struct.unpack('<HH', extra[i:i + 4])
+        if tag == 0x0001:
+            data = extra[i + 4:i + 4 + length]
+            j = 0
+            if size == 0xFFFFFFFF:
+                size = struct.unpack('<Q', data[j:j + 8])[0]
+                j += 8
+            if comp_size == 0xFFFFFFFF:
+                comp_size = struct.unpack('<Q', data[j:j + 8])[0]
+            return size, comp_size
+        i += 4 + length
+    raise StreamError('missing zip64 extra field')
+
+
+class _StreamReader:
+    
+    def __init__(self, chunks: t.Iterable[bytes]) -> None:
+        self._buf = bytearray()
+        self._chunks = iter(chunks)
+    
+    def read(self, size: int) -> bytes:
+        """ read exactly `size` bytes. """
+        while len(self._buf) < size:
+            if (x := next(self._chunks, None)) is None:
+                raise StreamError('unexpected end of stream')
+            self._buf += x
+        out = bytes(self._buf[:size])
+        del self._buf[:size]
+        return out
+    
+    def read_some(self, size: int) -> bytes:
+        """ read at least 1 and at most `size` bytes. """
+        while not self._buf:
+            if (x := next(self._chunks, None)) is None:
+                raise StreamError('unexpected end of stream')
+            self._buf += x
+        out = bytes(self._buf[:size])
+        del self._buf[:size]
+        return out
+    
+    def skip(self, size: int) -> None:
+        while size:
+            size -= len(self.read_some(size))
+    
+    def drain(self) -> None:
+        self._buf.clear()
+        for _ in self._chunks:
+            pass
@@ -0,0 +1,10 @@
+from . import target_venv
+from . import vendor_venv
+
+# -----------------------------------------------------------------------------
+
+from .create import create_from_file
+from .create import create_venv
+from .emerge import link_venv
+from .emerge import make_pth_venv
+from .emerge import relink_venv
@@ -0,0 +1,370 @@
+import hashlib
+import os
+import typing as t
+from collections import defaultdict
+
+# from lk_utils import Signal
+from lk_utils import fs
+
+from .. import paths
+from ..utils.fs import atomic_write
+
+
+class T:
+    AbsPath = str
+    RelPath = str
+    PackageId = str
+    
+    Ownership = t.Dict[RelPath, PackageId]
+    PackageIds = t.Iterable[PackageId]
+
+
+# bump it when the structure of ownership map changes.
+_PLAN_SCHEMA = 1
+_MAX_PLANS = 500
+_MODULE_SUFFIXES = ('.py', '.pyc', '.pyd', '.so')
+
+
+def link_venv(
+    pkg_ids: T.PackageIds,
+    venv_dir: T.AbsPath,
+    overwrite: bool = None,
+    import_index: bool = False,
+    # _signal: Signal[int] = None
+) -> None:
+    """
+    params:
+        import_index: see `write_import_index`.
+    """
+    ownership = get_ownership(pkg_ids)
+    if not ownership:
+        print('no package to link to venv', ':p')
+        fs.make_dirs(venv_dir)
+        return
+    
+    _init_dirs(venv_dir, ownership.keys())
+    for relpath, name_id in sorted(
+        ownership.items(), key=lambda x: x[1]  # sort by name_id.
+    ):
+        print(name_id, relpath, ':vs')
+        fs.make_link(
+            '{}/{}'.format(_name_id_2_path(name_id), relpath),
+            '{}/{}'.format(venv_dir, relpath),
+            overwrite=overwrite,
+        )
+    if import_index:
+        write_import_index(venv_dir, _iter_top_entries(ownership))
+
+
+def relink_venv(
+    old_pkg_ids: T.PackageIds,
+    new_pkg_ids: T.PackageIds,
+    venv_dir: T.AbsPath,
+    base_dir: T.AbsPath = None,
+    import_index: bool = False,
+) -> None:
+    """
+    turn a venv linked from `old_pkg_ids` into one linked from `new_pkg_ids`, -
+    only the links whose owner changed are removed or created.
+    
+    params:
+        base_dir: the venv of `old_pkg_ids` (usually the previous version of -
+            the app). if given, `venv_dir` should be empty, the links of -
+            unchanged packages are copied from `base_dir` as they are. if not -
+            given, `venv_dir` itself is the old venv and is patched in place.
+        import_index: see `write_import_index`.
+    """
+    try:
+        old = get_ownership(old_pkg_ids)
+    except FileNotFoundError as e:
+        # some old package has been removed from `pypi/installed`, we cannot -
+        # tell which links belong to it. link the venv from scratch.
+        print(':v3', 'cannot relink venv, fall back to full linking', e)
+        if not base_dir:
+            fs.remove_tree(venv_dir)
+        link_venv(new_pkg_ids, venv_dir, True, import_index)
+        return
+    new = get_ownership(new_pkg_ids)
+    removed = [k for k, v in old.items() if new.get(k) != v]
+    added = {k: v for k, v in new.items() if old.get(k) != v}
+    print(':v1', 'relink venv: {} kept, {} removed, {} added'.format(
+        len(new) - len(added), len(removed), len(added)
+    ))
+    
+    if base_dir:
+        _init_dirs(venv_dir, new.keys())
+        for relpath, name_id in new.items():
+            if relpath in added:
+                continue
+            src = f'{base_dir}/{relpath}'
+            if not os.path.islink(src):  # the old venv is not as expected.
+                added[relpath] = name_id
+                continue
+            os.symlink(
+                os.readlink(src),
+                f'{venv_dir}/{relpath}',
+                target_is_directory=os.path.isdir(src),
+            )
+    else:
+        for relpath in removed:
+            _remove_link(f'{venv_dir}/{relpath}')
+        _remove_empty_dirs(venv_dir, removed)
+        _init_dirs(venv_dir, added.keys())
+    
+    for relpath, name_id in sorted(added.items(), key=lambda x: x[1]):
+        print(name_id, relpath, ':vs')
+        fs.make_link(
+            '{}/{}'.format(_name_id_2_path(name_id), relpath),
+            '{}/{}'.format(venv_dir, relpath),
+            overwrite=True,
+        )
+    if import_index:
+        write_import_index(venv_dir, _iter_top_entries(new))
+
+
+def make_pth_venv(pkg_ids: T.PackageIds, venv_dir: T.AbsPath) -> None:
+    """
+    an alternative to `link_venv`, which creates no link at all. it writes -
+    "depsland.pth" (installed directories of packages, in priority order) -
+    and the import index (see `write_import_index`) to `venv_dir`. the -
+    import hook loads them when the app starts.
+    """
+    pkg_dirs = [_name_id_2_path(pid) for pid in sorted(set(pkg_ids))]
+    fs.make_dirs(venv_dir)
+    fs.dump('\n'.join(pkg_dirs), f'{venv_dir}/depsland.pth', 'plain')
+    write_import_index(
+        venv_dir, ((n, f'{d}/{n}') for d in pkg_dirs for n in os.listdir(d))
+    )
+
+
+def write_import_index(
+    venv_dir: T.AbsPath, entries: t.Iterable[t.Tuple[str, T.AbsPath]]
+) -> None:
+    """
+    write to `venv_dir`:
+        depsland_modules.json: {top_level_module: [real_path, ...], ...}
+        sitecustomize.py: a copy of `./venv_hook.py`.
+    
+    the venv dir is in `PYTHONPATH` when the app starts, so the hook is run -
+    at startup, it installs a meta path finder which resolves top-level -
+    modules from the real paths directly, instead of scanning path entries -
+    and stating through the links in venv.
+    
+    params:
+        entries: ((top_level_entry_name, real_path), ...)
+            e.g. ('numpy', '<pypi>/installed/numpy/1.26.4/numpy')
+    """
+    modules = defaultdict(list)
+    for n, path in entries:
+        if n == '__pycache__' or n.endswith(('.dist-info', '.egg-info')):
+            continue
+        name, ext = os.path.splitext(n)
+        if os.path.isdir(path):
+            if ext:
+                continue
+            name = n
+        elif ext in _MODULE_SUFFIXES:
+            name = name.split('.', 1)[0]  # e.g. "_foo.cp312-win_amd64.pyd"
+        else:
+            continue
+        if path not in modules[name]:
+            modules[name].append(path)
+    if 'sitecustomize' in modules:
+        print(':v3', 'the venv has its own "sitecustomize", skip import index')
+        return
+    fs.dump(modules, f'{venv_dir}/depsland_modules.json', 'json')
+    fs.copy_file(
+        fs.xpath('venv_hook.py'),
+        f'{venv_dir}/sitecustomize.py',
+        overwrite=True,
+    )
+
+
+def get_ownership(pkg_ids: T.PackageIds) -> T.Ownership:
+    """
+    returns: {relpath: package_id, ...}, relpath is relative to venv root.
+    
+    the result is cached in `pypi/index/linkplan`, keyed by the sorted -
+    package ids and the mtime of their installed directories. besides the -
+    whole map, the ownership of each colliding directory (e.g. "google", -
+    "jaraco") is cached separately, so a venv that differs by a few -
+    packages only walks the directories whose owners changed.
+    """
+    stamps = {
+        pid: os.stat(_name_id_2_path(pid)).st_mtime_ns
+        for pid in sorted(set(pkg_ids))
+    }
+    plan_file = _get_plan_file('', stamps)
+    if (out := _load_plan(plan_file)) is not None:
+        print(':v1', 'reuse link plan', len(out))
+        return out
+    
+    dirname_2_name_ids = defaultdict(list)
+    for pid in stamps:
+        dir_ = _name_id_2_path(pid)
+        # print(pid, dir_, len(os.listdir(dir_)), ':v')
+        for dname in os.listdir(dir_):
+            if dname == '__pycache__':
+                continue
+            dirname_2_name_ids[dname].append(pid)
+    
+    ownership: T.Ownership = {}
+    for dname, name_ids in dirname_2_name_ids.items():
+        if len(name_ids) == 1:
+            ownership[dname] = name_ids[0]
+        else:
+            group_file = _get_plan_file(
+                dname, {x: stamps[x] for x in name_ids}
+            )
+            if (sub := _load_plan(group_file)) is None:
+                sub = _divide_ownerships(dname, name_ids)
+                _save_plan(sub, group_file)
+            ownership.update(sub)
+    
+    _save_plan(ownership, plan_file)
+    _evict_plans()
+    return ownership
+
+
+def _divide_ownerships(
+    relpath: T.RelPath, candidates: T.PackageIds
+) -> T.Ownership:
+    """
+    docs: docs/devnote/merge-links-algorithm.zh.md
+    """
+    file_asset_2_name_ids = defaultdict(list)
+    dir_asset_2_name_ids = defaultdict(list)
+    relpath_2_name_id = {}
+    
+    for pid in candidates:
+        dir_ = '{}/{}'.format(_name_id_2_path(pid), relpath)
+        for asset in fs.find_dirs(dir_):
+            if asset.name == '__pycache__':
+                continue
+            dir_asset_2_name_ids[asset.name].append(pid)
+        for asset in fs.find_files(dir_):
+            file_asset_2_name_ids[asset.name].append(pid)
+    
+    for name, name_ids in file_asset_2_name_ids.items():
+        if len(name_ids) > 1:
+            print(
+                'multiple owners claimed for one file '
+                '(will choose the first one)',
+                name, name_ids, ':v3',
+            )
+        relpath_2_name_id[f'{relpath}/{name}'] = name_ids[0]
+    
+    for name, name_ids in dir_asset_2_name_ids.items():
+        if len(name_ids) > 1:
+            print(
+                '[yellow dim]multiple owners claimed for one dir '
+                '(will merge them)[/]',
+                name, name_ids, ':rv',
+            )
+            relpath_2_name_id.update(
+                _divide_ownerships(f'{relpath}/{name}', name_ids)
+            )
+        else:
+            relpath_2_name_id[f'{relpath}/{name}'] = name_ids[0]
+    
+    return relpath_2_name_id
+
+
+def _init_dirs(root_dir: T.AbsPath, paths: t.Iterable[T.RelPath]) -> None:
+    dirs_to_be_created = set(fs.parent_path(x) for x in paths)
+    print(dirs_to_be_created, ':lv')
+    if '.' in dirs_to_be_created:
+        dirs_to_be_created.remove('.')
+    for relpath in sorted(dirs_to_be_created):
+        abspath = f'{root_dir}/{relpath}'
+        fs.make_dirs(abspath)
+
+
+def _iter_top_entries(
+    ownership: T.Ownership
+) -> t.Iterator[t.Tuple[str, T.AbsPath]]:
+    """
+    a merged directory (e.g. "google") yields one entry for each owner.
+    """
+    for relpath, name_id in ownership.items():
+        top = relpath.split('/', 1)[0]
+        yield top, '{}/{}'.format(_name_id_2_path(name_id), top)
+
+
+def _remove_link(path: T.AbsPath) -> None:
+    if not os.path.lexists(path):
+        return
+    if os.path.islink(path):
+        try:
+            os.unlink(path)
+        except (IsADirectoryError, PermissionError):
+            os.rmdir(path)  # a directory symlink on windows.
+    elif os.path.isdir(path):
+        #   it was split into sub links by `_divide_ownerships`, the sub -
+        #   links are removed before, so it is empty now (or only contains -
+        #   "__pycache__").
+        fs.remove_tree(path)
+    else:
+        os.remove(path)
+
+
+def _remove_empty_dirs(
+    root_dir: T.AbsPath, relpaths: t.Iterable[T.RelPath]
+) -> None:
+    parents = set()
+    for relpath in relpaths:
+        while (relpath := fs.parent_path(relpath)) not in ('.', ''):
+            parents.add(relpath)
+    for relpath in sorted(parents, reverse=True):  # deepest first.
+        path = f'{root_dir}/{relpath}'
+        if (
+            os.path.isdir(path) and
+            not os.path.islink(path) and
+            not os.listdir(path)
+        ):
+            os.rmdir(path)
+
+
+def _get_plan_file(
+    dirname: str, stamps: t.Dict[T.PackageId, int]
+) -> T.AbsPath:
+    key = repr((_PLAN_SCHEMA, dirname, sorted(stamps.items())))
+    return '{}/{}.pkl'.format(
+        paths.pypi.linkplan, hashlib.sha256(key.encode()).hexdigest()
+    )
+
+
+def _load_plan(file: T.AbsPath) -> t.Optional[T.Ownership]:
+    if not os.path.exists(file):
+        return None
+    try:
+        out = fs.load(file)
+    except Exception as e:
+        print(':v3', 'broken link plan, ignored', file, e)
+        return None
+    os.utime(file)  # mark it as recently used.
+    return out
+
+
+def _save_plan(ownership: T.Ownership, file: T.AbsPath) -> None:
+    with atomic_write(file) as tmp:
+        fs.dump(ownership, tmp, 'pickle')
+
+
+def _evict_plans() -> None:
+    files = sorted(
+        (f for f in os.scandir(paths.pypi.linkplan)
+         if f.name.endswith('.pkl')),
+        key=lambda f: f.stat().st_mtime,
+        reverse=True,
+    )
+    for f in files[_MAX_PLANS:]:
+        try:
+            os.remove(f.path)
+        except FileNotFoundError:
+            pass
+
+
+def _name_id_2_path(name_id: T.PackageId) -> T.AbsPath:
+    name, ver = name_id.split('-', 1)
+    return '{}/{}/{}'.format(paths.pypi.installed, name, ver)
@@ -0,0 +1,6 @@
+from .finder import get_library_root
+from .finder import get_top_package_names
+from .finder import get_top_package_names_by_poetry
+from .funcs import T
+from .funcs import expand_package_names
+from .indexer import LibraryIndexer
@@ -0,0 +1,222 @@
+import base64
+import hashlib
+import os
+import re
+import sys
+import typing as t
+
+from lk_utils import fs
+from lk_utils import run_cmd_args
+
+from ...normalization import normalize_name
+
+_poetry = (sys.executable, '-m', 'poetry')
+
+
+class T:
+    Format = t.Literal[
+        'auto',
+        'pyproject.toml',
+        'requirements.txt',
+        # TODO: 'poetry.lock', 'pipfile.lock', 'requirements.lock', \
+        #   'requirements.yaml'.
+    ]
+    LibraryPath = str
+    PackageName = str
+
+
+# -----------------------------------------------------------------------------
+
+
+def get_library_root(working_root: str) -> T.LibraryPath:
+    """
+    find venv root (the "site-packages" folder).
+    we look for the venv by poetry's naming rules first, if not found, ask -
+    `poetry env info` (which is much slower, it takes seconds to import -
+    poetry).
+    """
+    from ...platform.system_info import IS_WINDOWS
+    
+    if venv_root := find_poetry_venv(working_root):
+        print(':v1', 'found venv', venv_root)
+    else:
+        # https://stackoverflow.com/questions/75232761/
+        if 'VIRTUAL_ENV' in os.environ:
+            del os.environ['VIRTUAL_ENV']
+        venv_root = fs.normpath(
+            run_cmd_args(
+                (*_poetry, 'env', 'info'),
+                ('--path', '--no-ansi'),
+                ('--directory', working_root),
+            )
+        )
+        print(venv_root)
+    
+    if IS_WINDOWS:
+        out = '{}/Lib/site-packages'.format(venv_root)
+    else:
+        out = '{}/lib/python{}.{}/site-packages'.format(
+            venv_root, sys.version_info.major, sys.version_info.minor
+        )
+        if not fs.exists(out):
+            # the venv may be created by another python version.
+            for d in fs.find_dirs(f'{venv_root}/lib'):
+                if d.name.startswith('python'):
+                    out = f'{d.path}/site-packages'
+                    break
+    assert fs.exists(out), (working_root, venv_root, out)
+    return out
+
+
+def find_poetry_venv(working_root: str) -> t.Optional[str]:
+    """
+    find the venv of a poetry project without running poetry.
+    
+    poetry puts the venv either in '<working_root>/.venv' (if -
+    "virtualenvs.in-project" is true), or in -
+    '<cache_dir>/virtualenvs/<name>-<hash>-py<major>.<minor>', where the hash -
+    is derived from the project path.
+    see `poetry.utils.env.env_manager.EnvManager.generate_env_name`.
+    
+    returns: the venv root, or None if not found (or ambiguous).
+    """
+    if fs.exists(x := f'{working_root}/.venv/pyvenv.cfg'):
+        return fs.parent(x)
+    
+    if not fs.exists(x := f'{working_root}/pyproject.toml'):
+        return None
+    data = fs.load(x, 'toml')
+    name = (
+        data.get('project', {}).get('name') or
+        data.get('tool', {}).get('poetry', {}).get('name')
+    )
+    if not name:
+        return None
+    
+    name = re.sub(r'[-_.]+', '-', name).lower()  # canonicalized name.
+    sanitized_name = re.sub(r'[ $`!*@"\\\r\n\t]', '_', name)[:42]
+    normalized_cwd = os.path.normcase(os.path.realpath(working_root))
+    hash_ = base64.urlsafe_b64encode(
+        hashlib.sha256(normalized_cwd.encode()).digest()
+    ).decode()[:8]
+    prefix = f'{sanitized_name}-{hash_}-py'
+    
+    venvs_dir = _get_poetry_virtualenvs_dir()
+    if not fs.exists(venvs_dir):
+        return None
+    candidates = [
+        d.path for d in fs.find_dirs(venvs_dir)
+        if d.name.startswith(prefix)
+    ]
+    if len(candidates) > 1:
+        current = '{}{}.{}'.format(prefix, *sys.version_info[:2])
+        candidates = [x for x in candidates if fs.basename(x) == current]
+    if len(candidates) == 1:
+        return candidates[0]
+    return None
+
+
+def _get_poetry_virtualenvs_dir() -> str:
+    if x := os.getenv('POETRY_VIRTUALENVS_PATH'):
+        return fs.normpath(x)
+    if x := os.getenv('POETRY_CACHE_DIR'):
+        return fs.normpath(f'{x}/virtualenvs')
+    if sys.platform == 'win32':
+        base = os.getenv('LOCALAPPDATA') or os.path.expanduser(
+            '~/AppData/Local'
+        )
+        return fs.normpath(f'{base}/pypoetry/Cache/virtualenvs')
+    if sys.platform == 'darwin':
+        return fs.normpath(
+            os.path.expanduser('~/Library/Caches/pypoetry/virtualenvs')
+        )
+    base = os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return fs.normpath(f'{base}/pypoetry/virtualenvs')
+
+
+def get_top_package_names(
+    file: str, format: T.Format = 'auto'
+) -> t.Iterator[T.PackageName]:
+    """
+    NOTE: be sure the yielt result is normalized by `normalize_name`.
+    """
+    if format == 'auto':
+        format = (
+            'pyproject.toml'
+            if file.endswith('pyproject.toml')
+            else 'requirements.txt'
+        )
+    assert file.endswith(('.toml', '.txt'))
+    assert format in ('pyproject.toml', 'requirements.txt')
+    print(file, format)
+    if format == 'pyproject.toml':
+        # yield from _get_top_names_by_poetry_2(working_root=fs.parent(file))
+        yield from _get_top_names_by_poetry_3(file)
+    else:
+        yield from _get_top_names_from_requirements_file(file)
+
+
+def get_top_package_names_by_poetry(
+    working_root: str,
+) -> t.Iterator[T.PackageName]:
+    yield from _get_top_names_by_poetry_2(working_root)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _get_top_names_by_poetry_1(working_root: str) -> t.Iterator[T.PackageName]:
+    # FIXME: there is a bug (?) that it may not show all top names if some \
+    #   packages have custom urls. please use `_get_top_names_by_poetry_2` as \
+    #   a workaround.
+    yield from map(
+        normalize_name,
+        run_cmd_args(
+            _poetry,
+            ('show', '-T', '--no-ansi'),
+            ('--directory', working_root),
+        ).splitlines(),
+    )
+
+
+def _get_top_names_by_poetry_2(working_root: str) -> t.Iterator[T.PackageName]:
+    content = run_cmd_args(
+        _poetry,
+        ('show', '-t', '--no-dev', '--no-ansi'),
+        ('--directory', working_root),
+    )
+    re_pkg_name = re.compile(r'^[-\w]+')
+    for line in content.splitlines():
+        if line.startswith((' ', '│', '├', '└')):
+            continue
+        # print(':vi2', line, bool(re_pkg_name.match(line)))
+        if m := re_pkg_name.match(line):
+            yield normalize_name(m.group())
+
+
+def _get_top_names_by_poetry_3(toml_file: str) -> t.Iterator[T.PackageName]:
+    """
+    parse pyproject.toml and get the names.
+    this may not a good idea. use `_get_top_names_by_poetry_2` instead.
+    """
+    if sys.version_info >= (3, 11):
+        from tomllib import load
+    else:  # pip install toml
+        from toml import load  # noqa
+    with open(toml_file, 'rb') as f:
+        data: dict = load(f)
+    deps: dict = data['tool']['poetry']['dependencies']
+    deps.pop('python')
+    for k, group in data['tool']['poetry']['group'].items():
+        # TODO: skip values if its restrictions not match current version.
+        if k != 'dev':
+            deps.update(group['dependencies'])
+    print(deps, ':l')
+    return map(normalize_name, deps.keys())
+
+
+def _get_top_names_from_requirements_file(
+    reqs_file: str,
+) -> t.Iterator[T.PackageName]:
+    re_name = re.compile(r'^([-\w]+)', re.M)
+    yield from map(normalize_name, re_name.findall(fs.load(reqs_file)))
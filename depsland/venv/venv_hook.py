@@ -0,0 +1,90 @@
+"""
+this file is copied to an app's venv as "sitecustomize.py". see -
+`depsland.venv.emerge.write_import_index` and `.make_pth_venv`.
+
+the venv dir is in `PYTHONPATH` when the app is launched (see -
+`depsland.api.user_api.run`), so python imports this module at startup. it:
+    - adds the package directories listed in "depsland.pth" (if exists) to -
+        `sys.path`, right after the venv dir. ("pth" mode)
+    - installs a meta path finder which looks up top-level modules from -
+        "depsland_modules.json", a map of module name to the real path of -
+        the module, instead of scanning (and stating through the links of) -
+        all path entries.
+
+do not import anything from depsland here, it runs in the app's process.
+"""
+import json
+import os
+import site
+import sys
+from importlib.machinery import PathFinder
+
+
+class DepslandFinder:
+    
+    def __init__(self, modules: dict) -> None:
+        self.modules = modules  # {top_name: [real_path, ...], ...}
+    
+    def find_spec(self, fullname: str, path=None, target=None):
+        if path is None and '.' not in fullname:
+            paths = self.modules.get(fullname)
+            # a name owned by multiple paths is a namespace package (or a -
+            # merged directory), leave it to the default `PathFinder`.
+            if paths and len(paths) == 1:
+                return PathFinder.find_spec(
+                    fullname, [os.path.dirname(paths[0])], target
+                )
+        return None
+    
+    def invalidate_caches(self) -> None:
+        pass
+
+
+def activate(venv_dir: str) -> None:
+    norm_sys_path = [os.path.normcase(os.path.abspath(x)) for x in sys.path]
+    if venv_dir in norm_sys_path:
+        index = norm_sys_path.index(venv_dir) + 1
+        higher_dirs = sys.path[:index - 1]
+    else:
+        index = len(sys.path)
+        higher_dirs = ()
+    
+    if os.path.exists(x := f'{venv_dir}/depsland.pth'):
+        with open(x, encoding='utf-8') as f:
+            dirs = [
+                x for x in f.read().splitlines()
+                if x and not x.startswith('#')
+            ]
+        # keep the same priority as a symlinked venv: package dirs take the -
+        # place of `venv_dir` in `sys.path`.
+        old_sys_path = sys.path[:]
+        for d in dirs:
+            # `addsitedir` also processes the .pth files of packages, e.g. -
+            # "pywin32.pth".
+            site.addsitedir(d)
+        added = [x for x in sys.path if x not in old_sys_path]
+        sys.path[:] = old_sys_path[:index] + added + old_sys_path[index:]
+    
+    try:
+        with open(f'{venv_dir}/depsland_modules.json', encoding='utf-8') as f:
+            modules = json.load(f)
+    except (OSError, ValueError):
+        return
+    # names in the dirs before `venv_dir` (app dir, "lib", "src", ...) have -
+    # higher priority, the finder must not shadow them.
+    for d in higher_dirs:
+        try:
+            for n in os.listdir(d or '.'):
+                modules.pop(n.split('.', 1)[0], None)
+        except OSError:
+            pass
+    finder = DepslandFinder(modules)
+    for i, x in enumerate(sys.meta_path):
+        if x is PathFinder:
+            sys.meta_path.insert(i, finder)
+            break
+    else:
+        sys.meta_path.append(finder)
+
+
+activate(os.path.normcase(os.path.dirname(os.path.abspath(__file__))))
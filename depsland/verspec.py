@@ -1,5 +1,9 @@
+import operator
 import re
 import typing as t
+from bisect import bisect_left
+from bisect import bisect_right
+from functools import lru_cache
 
 import semver  # https://github.com/python-semver/python-semver
 
@@ -9,15 +13,138 @@ from .normalization import split_filename_of_package
 from .normalization import normalize_verspecs
 
 
-def compare_version(v0: str, comp: str, v1: str, _patch: bool = True) -> bool:
+class VersionKey(t.NamedTuple):
     """
+    a parsed version which can be compared as a tuple, following PEP 440.
+    use `version_key` to get one.
+    
+    examples (from old to new):
+        1.0.dev0 < 1.0a1.dev0 < 1.0a1 < 1.0b2.post1 < 1.0rc1 < 1.0 (= 1.0.0) -
+        < 1.0+local < 1.0.post1.dev0 < 1.0.post1 < 1.1 < 1!0.1
+    """
+    epoch: int
+    release: t.Tuple[int, ...]  # trailing zeros are stripped.
+    pre: t.Tuple[int, int, int]
+    #   (-1, 0, 0) for dev-only releases (e.g. '1.0.dev0'), which sort -
+    #   before pre-releases. (0, phase, num) for pre-releases. (1, 0, 0) -
+    #   for others.
+    post: t.Tuple[int, int]  # (0, 0) if absent, else (1, num).
+    dev: t.Tuple[int, int]  # (1, 0) if absent, else (0, num).
+    local: t.Tuple[t.Tuple[int, t.Union[int, str]], ...]
+    #   numeric segments sort after alphanumeric ones.
+
+
+class VersionTable:
+    """
+    versions of one package, with their keys sorted in ascending order, so -
+    that a spec set can be answered by bisection instead of comparing every -
+    candidate.
+    """
+    
+    def __init__(self, versions: t.Iterable[T.Version]) -> None:
+        self._versions = sorted(set(versions), key=version_key)
+        self._keys = [version_key(x) for x in self._versions]
+    
+    def __len__(self) -> int:
+        return len(self._versions)
+    
+    def query(
+        self, verspecs: t.Iterable[VersionSpec]
+    ) -> t.Tuple[T.Version, ...]:
+        """
+        returns: versions matching all the specs, from new to old.
+        """
+        keys = self._keys
+        lo, hi = 0, len(keys)
+        excluded = []
+        for spec in verspecs:
+            if spec.version == '':
+                continue
+            comp, key = spec.comparator, version_key(spec.version)
+            if comp in ('>=', '==', '~='):
+                lo = max(lo, bisect_left(keys, key))
+            elif comp == '>':
+                lo = max(lo, bisect_right(keys, _get_greater_bound(key)))
+            if comp in ('<=', '=='):
+                # '<=1.0' and '==1.0' also match '1.0+local'.
+                hi = min(hi, bisect_right(
+                    keys, key if key.local else key._replace(local=_MAX_LOCAL)
+                ))
+            elif comp == '<':
+                hi = min(hi, bisect_left(keys, _get_less_bound(key)))
+            elif comp == '~=':
+                if upper := _get_compatible_upper_bound(spec.version):
+                    hi = min(hi, bisect_left(keys, upper))
+            elif comp == '!=':
+                excluded.append(spec.version)
+            elif comp not in ('>=', '>'):
+                raise ValueError('unknown comparator', spec)
+            if lo >= hi:
+                return ()
+        out = self._versions[lo:hi]
+        if excluded:
+            out = [
+                x for x in out
+                if not any(_equal(x, y) for y in excluded)
+            ]
+        return tuple(reversed(out))
+
+
+class VersionTables:
+    """
+    lazily built `VersionTable`s of a `name -> versions` mapping.
+    the owner should call `invalidate` when versions of a name changed.
+    see `depsland.pypi.index.Index.version_tables`.
+    """
+    
+    def __init__(
+        self, name_2_vers: t.Mapping[T.Name, t.Sequence[T.Version]]
+    ) -> None:
+        self._name_2_vers = name_2_vers
+        self._tables: t.Dict[T.Name, VersionTable] = {}
+    
+    def __getitem__(self, name: T.Name) -> VersionTable:
+        if name not in self._tables:
+            self._tables[name] = VersionTable(
+                self._name_2_vers[name] if name in self._name_2_vers else ()
+            )
+        return self._tables[name]
+    
+    def invalidate(self, name: T.Name = None) -> None:
+        if name is None:
+            self._tables.clear()
+        else:
+            self._tables.pop(name, None)
+    
+    def query(
+        self, name: T.Name, verspecs: t.Iterable[VersionSpec]
+    ) -> t.Tuple[T.Version, ...]:
+        return self[name].query(verspecs)
+
+
+def compare_version(v0: str, comp: str, v1: str) -> bool:
+    """
+    compare two versions by the PEP 440 ordering, e.g. '1.0rc1' < '1.0' < -
+    '1.0+local' < '1.0.post1'. to check a version against a specifier, use -
+    `match_version`.
+    
     args:
-        comp: '>', '>=', '==', '<=', '<'
+        comp: '>', '>=', '==', '<=', '<', '!='
     """
-    if _patch:
-        v0, v1 = map(_minor_fix_version_form, (v0, v1))
-    r: int = semver.compare(v0, v1)  # -1, 0, 1
-    return eval(f'r {comp} 0', {'r': r})
+    return _COMPARATORS[comp](version_key(v0), version_key(v1))
+
+
+def match_version(ver: str, comp: str, spec_ver: str) -> bool:
+    """
+    check `ver` against the specifier "<comp><spec_ver>". unlike -
+    `compare_version`, the exclusive comparisons and local versions follow -
+    the PEP 440 specifier rules, e.g. '1.0rc1' does not match '<1.0', -
+    '1.0.post1' does not match '>1.0', and '1.0+local' matches '<=1.0'.
+    
+    args:
+        comp: '>', '>=', '==', '<=', '<', '!=', '~='
+    """
+    return _OPERATORS[comp](ver, spec_ver)
 
 
 def find_all_eligible_versions(
@@ -26,20 +153,12 @@ def find_all_eligible_versions(
 ) -> t.Iterator[T.Version]:
     """
     params:
-        candidates: a sorted list of version strings, from new to old.
-            see also `depsland.pypi.index.T.Name2Versions`
+        candidates: version strings, no need to be sorted.
+    yields: versions matching all the specs, from new to old.
     """
     if not candidates:
         return
-    if not verspecs:
-        yield from candidates
-        return
-    for candidate in candidates:
-        for spec in verspecs:
-            if spec.version == '' or compare_version(
-                candidate, spec.comparator, spec.version
-            ):
-                yield candidate
+    yield from VersionTable(candidates).query(verspecs)
 
 
 def find_one_eligible_version(
@@ -58,33 +177,14 @@ def find_proper_version(
 ) -> t.Optional[str]:
     """
     params:
-        candidates: a sorted list of version strings, from new to old.
-            see also `depsland.pypi.index.T.Name2Versions`
+        candidates: version strings, no need to be sorted.
     note: if `verspecs` is empty, return the latest version of candidates.
     """
-    if not candidates: return None
-    if not verspecs: return candidates[0]
-    
-    has_only_one_spec = len(verspecs) == 1
-    filtered_candidates = []
-    for spec in verspecs:
-        for candidate in candidates:
-            if spec.version == '' or compare_version(
-                    candidate, spec.comparator, spec.version):
-                if has_only_one_spec:
-                    return candidate
-                filtered_candidates.append(candidate)
-        if filtered_candidates:
-            candidates = filtered_candidates
-            filtered_candidates = []
-        else:
-            return None
-    # assert filtered_candidates == [] and candidates == [...]
-    return candidates[0]
+    return find_one_eligible_version(verspecs, candidates)
 
 
 def get_max_version(versions: t.Sequence[T.Version]) -> T.Version:
-    return max(versions, key=semver_parse)
+    return max(versions, key=version_key)
 
 
 def get_verspec_from_filename(filename: str) -> VersionSpec:
@@ -117,7 +217,187 @@ def semver_parse(ver: str) -> semver.Version:
 
 def sort_versions(versions: t.List[str], reverse: bool = True) -> None:
     if versions and len(versions) > 1:
-        versions.sort(key=semver_parse, reverse=reverse)
+        versions.sort(key=version_key, reverse=reverse)
+
+
+_VERSION_PATTERN = re.compile(
+    r'''
+    v?
+    (?:(?P<epoch>\d+)!)?
+    (?P<release>\d+(?:\.\d+)*)
+    (?:
+        [-_.]?(?P<pre_l>alpha|beta|preview|pre|rc|a|b|c)[-_.]?(?P<pre_n>\d+)?
+    )?
+    (?:
+        -(?P<post_n1>\d+)
+        | [-_.]?(?P<post_l>post|rev|r)[-_.]?(?P<post_n2>\d+)?
+    )?
+    (?:[-_.]?(?P<dev_l>dev)[-_.]?(?P<dev_n>\d+)?)?
+    (?:\+(?P<local>[a-z0-9]+(?:[-_.][a-z0-9]+)*))?
+    ''',
+    re.I | re.X,
+)
+_PRE_PHASES = {
+    'a': 0, 'alpha': 0,
+    'b': 1, 'beta': 1,
+    'c': 2, 'pre': 2, 'preview': 2, 'rc': 2,
+}
+
+
+@lru_cache(maxsize=None)
+def version_key(ver: str) -> VersionKey:
+    """
+    parse a version string into a comparable key. results are cached, since -
+    the same versions are compared again and again when resolving.
+    
+    a version which does not follow PEP 440 (rare today) sorts before all -
+    the valid ones.
+    """
+    m = _VERSION_PATTERN.fullmatch(ver.strip())
+    if m is None:
+        return VersionKey(-1, (), (1, 0, 0), (0, 0), (1, 0), ((0, ver),))
+    
+    release = tuple(map(int, m['release'].split('.')))
+    while len(release) > 1 and release[-1] == 0:
+        release = release[:-1]
+    
+    if m['pre_l']:
+        pre = (0, _PRE_PHASES[m['pre_l'].lower()], int(m['pre_n'] or 0))
+    elif m['dev_l'] and not (m['post_n1'] or m['post_l']):
+        pre = (-1, 0, 0)
+    else:
+        pre = (1, 0, 0)
+    
+    if m['post_n1']:
+        post = (1, int(m['post_n1']))
+    elif m['post_l']:
+        post = (1, int(m['post_n2'] or 0))
+    else:
+        post = (0, 0)
+    
+    dev = (0, int(m['dev_n'] or 0)) if m['dev_l'] else (1, 0)
+    
+    local = tuple(
+        (1, int(x)) if x.isdigit() else (0, x.lower())
+        for x in re.split(r'[-_.]', m['local'])
+    ) if m['local'] else ()
+    
+    return VersionKey(int(m['epoch'] or 0), release, pre, post, dev, local)
+
+
+_MAX_LOCAL = ((2, 0),)  # greater than any local segments.
+_MAX_POST = (1, float('inf'))  # greater than any post-releases.
+
+
+def _compatible(ver: str, spec_ver: str) -> bool:
+    """
+    '~=2.2.1' means '>=2.2.1, ==2.2.*'.
+    """
+    key, spec_key = version_key(ver), version_key(spec_ver)
+    if key < spec_key:
+        return False
+    prefix = _get_compatible_prefix(spec_ver)
+    release = key.release + (0,) * max(0, len(prefix) - len(key.release))
+    return key.epoch == spec_key.epoch and release[:len(prefix)] == prefix
+
+
+def _get_compatible_prefix(spec_ver: str) -> t.Tuple[int, ...]:
+    """
+    '2.2.1' -> (2, 2)
+    """
+    m = _VERSION_PATTERN.fullmatch(spec_ver.strip())
+    return tuple(map(int, m['release'].split('.')))[:-1] if m else ()
+
+
+def _get_compatible_upper_bound(spec_ver: str) -> t.Optional[VersionKey]:
+    """
+    '2.2.1' -> the smallest key of '2.3', i.e. '2.3.dev0'.
+    """
+    if not (prefix := _get_compatible_prefix(spec_ver)):
+        return None
+    return VersionKey(
+        version_key(spec_ver).epoch,
+        prefix[:-1] + (prefix[-1] + 1,),
+        (-1, 0, 0), (0, 0), (0, 0), (),
+    )
+
+
+def _equal(ver: str, spec_ver: str) -> bool:
+    key, spec_key = version_key(ver), version_key(spec_ver)
+    if not spec_key.local:  # '==1.0' matches '1.0+local'.
+        key = key._replace(local=())
+    return key == spec_key
+
+
+def _get_less_bound(spec_key: VersionKey) -> VersionKey:
+    """
+    '<V' matches versions less than the returned key (exclusive).
+    
+    it does not match pre-releases of V, unless V itself is a pre-release. -
+    e.g. '<1.0' -> '1.0.dev0', '<1.0.post1' -> '1.0.post1.dev0'.
+    """
+    if spec_key.pre[0] != 1 or spec_key.dev[0] == 0:  # a pre-release
+        return spec_key
+    return spec_key._replace(
+        pre=(-1, 0, 0) if spec_key.post[0] == 0 else spec_key.pre,
+        dev=(0, 0),
+        local=(),
+    )
+
+
+def _get_greater_bound(spec_key: VersionKey) -> VersionKey:
+    """
+    '>V' matches versions greater than the returned key (exclusive).
+    
+    it does not match local versions of V, nor post-releases of V unless V -
+    itself is a post-release (or a dev release). e.g. '>1.0' excludes -
+    '1.0+local' and '1.0.post1', '>1.0.post1' excludes '1.0.post1+local'.
+    """
+    if spec_key.post[0] == 1 or spec_key.dev[0] == 0:
+        return spec_key._replace(local=_MAX_LOCAL)
+    return spec_key._replace(post=_MAX_POST, dev=(1, 0), local=_MAX_LOCAL)
+
+
+def _less(ver: str, spec_ver: str) -> bool:
+    return version_key(ver) < _get_less_bound(version_key(spec_ver))
+
+
+def _less_equal(ver: str, spec_ver: str) -> bool:
+    spec_key = version_key(spec_ver)
+    if not spec_key.local:  # '<=1.0' matches '1.0+local'.
+        spec_key = spec_key._replace(local=_MAX_LOCAL)
+    return version_key(ver) <= spec_key
+
+
+def _greater(ver: str, spec_ver: str) -> bool:
+    return version_key(ver) > _get_greater_bound(version_key(spec_ver))
+
+
+def _make_operator(
+    op: t.Callable[[VersionKey, VersionKey], bool]
+) -> t.Callable[[str, str], bool]:
+    return lambda ver, spec_ver: op(version_key(ver), version_key(spec_ver))
+
+
+_COMPARATORS: t.Dict[str, t.Callable[[VersionKey, VersionKey], bool]] = {
+    '<' : operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>' : operator.gt,
+    '>=': operator.ge,
+}
+
+# see `match_version`.
+_OPERATORS: t.Dict[str, t.Callable[[str, str], bool]] = {
+    '<' : _less,
+    '<=': _less_equal,
+    '==': _equal,
+    '!=': lambda ver, spec_ver: not _equal(ver, spec_ver),
+    '>' : _greater,
+    '>=': _make_operator(operator.ge),
+    '~=': _compatible,
+}
 
 
 def _minor_fix_version_form(raw_verspec: str) -> str:
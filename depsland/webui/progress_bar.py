@@ -58,6 +58,11 @@ def play_demo() -> None:
         _prog_ctrl.update_progress(i + 1, f'cleaning stuff {i}')
         sleep(randint(5, 10) / 10)  # 500ms ~ 1000ms
     
+    _prog_ctrl._change_stage('compile', 5)
+    for i in range(5):
+        _prog_ctrl.update_progress(i + 1, f'compiling chunk {i}')
+        sleep(randint(1, 5) / 10)  # 100ms ~ 500ms
+    
     # callback = make_progress_bar()
     # _prog_ctrl.reset()
     # _prog_ctrl.session.update({'total_count': 10})
@@ -126,7 +131,14 @@ class ProgressControl:
         elif stage == 'cleanup':
             session.update({
                 'portion_start': 0.8,
-                'portion_end'  : 0.9,
+                'portion_end'  : 0.85,
+                'progress'     : 0.0,
+                'total_count'  : total_count,
+            })
+        elif stage == 'compile':
+            session.update({
+                'portion_start': 0.85,
+                'portion_end'  : 0.95,
                 # ^ 1.0 is reserved for 'installation done'. see also -
                 #   `make_progress_bar : callback_done`.
                 'progress'     : 0.0,
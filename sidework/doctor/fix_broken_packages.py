@@ -49,11 +49,8 @@ def remove() -> None:
     fs.dump(oss_pypi, paths.oss.pypi)
     
     for id in broken_packages:
-        pypi.index.id_2_paths.pop(id)
-        name, ver = id.split('-')
-        pypi.index.name_2_vers[name].remove(ver)
-    fs.dump(pypi.index.id_2_paths, paths.pypi.id_2_paths)
-    fs.dump(pypi.index.name_2_vers, paths.pypi.name_2_vers)
+        pypi.index.remove_from_index(id)
+    pypi.index.save_index()
     
     # fs.remove(p('_broken_packages.yaml'))
     
@@ -5,7 +5,9 @@ from lk_utils import dumps
 from lk_utils import fs
 
 from depsland.paths import pypi as pypi_paths
+from depsland.pypi import pypi
 from depsland.pypi import rebuild_index as rebuild_pypi_index
+from depsland.pypi.blobs import blob_store
 from depsland.pypi.insight import overview
 
 cli.add_cmd(overview)
@@ -24,10 +26,42 @@ def reset() -> None:
     dumps({}, f'{root}/index/id_2_paths.json')
     dumps({}, f'{root}/index/id_2_paths.pkl')
     dumps(defaultdict(set), f'{root}/index/name_2_ids.pkl')
+    pypi.index.reset_index({}, {})
+
+
+@cli.cmd()
+def dedup() -> None:
+    """
+    move files of `pypi/installed` into the blob store, identical files -
+    become hardlinks. it is safe to run multiple times.
+    """
+    total_linked = total_saved = 0
+    for d in fs.find_dirs(pypi_paths.installed):
+        for v in fs.find_dirs(d.path):
+            linked, saved = blob_store.ingest_tree(v.path)
+            total_linked += linked
+            total_saved += saved
+            print(':i', f'{d.name}-{v.name}', linked, saved)
+    print('deduplicated {} files, saved {:.2f} MB'.format(
+        total_linked, total_saved / 1024 / 1024
+    ))
+
+
+@cli.cmd()
+def prune_blobs() -> None:
+    """
+    remove blobs which are no longer used by any installed package.
+    """
+    removed, freed = blob_store.prune()
+    print('removed {} blobs, freed {:.2f} MB'.format(
+        removed, freed / 1024 / 1024
+    ))
 
 
 if __name__ == '__main__':
     # pox sidework/pypi_index.py rebuild
     # pox sidework/pypi_index.py rebuild :true
     # pox sidework/pypi_index.py reset
+    # pox sidework/pypi_index.py dedup
+    # pox sidework/pypi_index.py prune-blobs
     cli.run()
@@ -0,0 +1,111 @@
+import os
+import random
+import zlib
+
+from argsense import cli
+from lk_utils import fs
+
+from depsland import utils
+from depsland.utils import binpatch
+
+
+@cli.cmd()
+def test_patch_roundtrip() -> None:
+    d = utils.make_temp_dir()
+    rand = random.Random(0)
+    old = bytes(rand.getrandbits(8) for _ in range(300_000))
+    text = ''.join(f'line {i}\n' for i in range(20_000)).encode()
+    cases = {
+        'unchanged': (old, old),
+        'inserted' : (old, old[:1000] + b'new bytes' * 100 + old[1000:]),
+        'replaced' : (old, old[:50_000] + os.urandom(5000) + old[55_000:]),
+        'truncated': (old, old[:100_000]),
+        'text'     : (text, text.replace(b'line 1234\n', b'changed\n')),
+        'emptied'  : (old, b''),
+        'from_none': (None, text),
+    }
+    for name, (data0, data1) in cases.items():
+        file0 = None if data0 is None else _write(f'{d}/{name}.0', data0)
+        file1 = _write(f'{d}/{name}.1', data1)
+        patch = binpatch.make_patch(file0, file1)
+        binpatch.apply_patch(file0, patch, f'{d}/{name}.2')
+        assert _read(f'{d}/{name}.2') == data1, name
+        print(name, len(patch), len(data1), ':i')
+    
+    # patch in place.
+    file0 = _write(f'{d}/inplace', old)
+    patch = binpatch.make_patch(file0, f'{d}/inserted.1')
+    binpatch.apply_patch(file0, patch, file0)
+    assert _read(file0) == _read(f'{d}/inserted.1')
+
+
+@cli.cmd()
+def test_patch_mismatch() -> None:
+    d = utils.make_temp_dir()
+    file0 = _write(f'{d}/a.0', b'hello world\n' * 1000)
+    file1 = _write(f'{d}/a.1', b'hello depsland\n' * 1000)
+    patch = binpatch.make_patch(file0, file1)
+    magic = patch[:patch.index(b'\n') + 1]
+    body = zlib.decompress(patch[len(magic):])
+    
+    bad_patches = {
+        'not a patch'  : b'depsland-patch:1\n' + patch[len(magic):],
+        'truncated'    : patch[:-10],
+        'corrupted'    : magic + b'x' * 100,
+        'unknown op'   : magic + zlib.compress(body + b'\xff'),
+        'short literal': magic + zlib.compress(body[:-1]),
+    }
+    for name, bad in bad_patches.items():
+        _assert_patch_error(file0, bad, f'{d}/a.2', name)
+    
+    other = _write(f'{d}/b.0', b'something else')
+    _assert_patch_error(other, patch, f'{d}/b.0', 'old file mismatch')
+    assert _read(other) == b'something else', 'the old file is changed'
+    _assert_patch_error(None, patch, f'{d}/c.0', 'no old file')
+    assert not os.path.exists(f'{d}/c.0')
+
+
+@cli.cmd()
+def test_dir_patch() -> None:
+    d = utils.make_temp_dir()
+    _write(f'{d}/old/a.txt', b'aaa\n' * 1000)
+    _write(f'{d}/old/sub/b.txt', b'bbb\n' * 1000)
+    _write(f'{d}/new/a.txt', b'aaa\n' * 1000 + b'more\n')
+    _write(f'{d}/new/sub/b.txt', b'bbb\n' * 1000)
+    _write(f'{d}/new/sub/c.txt', b'ccc\n' * 1000)
+    
+    binpatch.make_dir_patch(
+        f'{d}/old', f'{d}/new', ('a.txt', 'sub/c.txt'), f'{d}/patch.zip'
+    )
+    fs.copy_tree(f'{d}/old', f'{d}/out')
+    binpatch.apply_dir_patch(f'{d}/patch.zip', f'{d}/out')
+    for relpath in ('a.txt', 'sub/b.txt', 'sub/c.txt'):
+        assert _read(f'{d}/out/{relpath}') == _read(f'{d}/new/{relpath}'), \
+            relpath
+
+
+def _assert_patch_error(
+    old_file: str, patch: bytes, new_file: str, case: str
+) -> None:
+    try:
+        binpatch.apply_patch(old_file, patch, new_file)
+    except binpatch.PatchError as e:
+        print(case, e, ':i')
+    else:
+        raise AssertionError('no PatchError', case)
+
+
+def _read(file: str) -> bytes:
+    with open(file, 'rb') as f:
+        return f.read()
+
+
+def _write(file: str, data: bytes) -> str:
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, 'wb') as f:
+        f.write(data)
+    return file
+
+
+if __name__ == '__main__':
+    cli.run()
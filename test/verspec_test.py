@@ -0,0 +1,59 @@
+from argsense import cli
+from depsland.verspec import compare_version
+from depsland.verspec import match_version
+from depsland.verspec import sort_versions
+
+
+@cli.cmd()
+def test_version_ordering():
+    ordered = (
+        '0.9', '1.0.dev1', '1.0a1', '1.0a2.dev1', '1.0a2', '1.0b1',
+        '1.0rc1', '1.0', '1.0+local', '1.0.post1.dev1', '1.0.post1', '1.1',
+        '1.10', '2!0.1',
+    )
+    for i, v0 in enumerate(ordered):
+        for v1 in ordered[i + 1:]:
+            assert compare_version(v0, '<', v1), (v0, v1)
+            assert compare_version(v1, '>', v0), (v0, v1)
+            assert compare_version(v0, '!=', v1), (v0, v1)
+    
+    versions = list(reversed(ordered))
+    sort_versions(versions, reverse=False)
+    assert tuple(versions) == ordered, versions
+    
+    for v0, v1 in (
+        ('1.0', '1.0.0'),
+        ('1.0rc1', '1.0c1'),
+        ('1.0-1', '1.0.post1'),
+        ('v1.0', '1.0'),
+    ):
+        assert compare_version(v0, '==', v1), (v0, v1)
+        assert compare_version(v0, '<=', v1), (v0, v1)
+        assert compare_version(v0, '>=', v1), (v0, v1)
+
+
+@cli.cmd()
+def test_match_version():
+    # the expected results are the same as `packaging.specifiers.Specifier`.
+    for ver, comp, spec_ver, result in (
+        ('1.0rc1', '<', '1.0', False),
+        ('0.9', '<', '1.0', True),
+        ('1.0.post1', '>', '1.0', False),
+        ('1.0.post1', '>', '1.0.post0', True),
+        ('1.1', '>', '1.0', True),
+        ('1.0+local', '<=', '1.0', True),
+        ('1.0+local', '==', '1.0', True),
+        ('1.0', '==', '1.0+local', False),
+        ('1.0.1', '!=', '1.0', True),
+        ('2.5.1', '~=', '2.5', True),
+        ('3.0', '~=', '2.5', False),
+        ('2.5.9', '~=', '2.5.1', True),
+        ('2.6', '~=', '2.5.1', False),
+    ):
+        assert match_version(ver, comp, spec_ver) is result, (
+            ver, comp, spec_ver
+        )
+
+
+if __name__ == '__main__':
+    cli.run()
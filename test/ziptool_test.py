@@ -1,5 +1,6 @@
 import os
 from argsense import cli
+from lk_utils import fs
 from depsland import utils
 from depsland.utils import ziptool
 
@@ -38,5 +39,42 @@ def test_unzip_and_move_up_2(root: str):
     ziptool.extract_file(file_i, dire_o, overwrite=True)
 
 
+@cli.cmd()
+def test_extract_stream():
+    """
+    `extract_stream` gives the same tree as `extract_file`, no matter how the -
+    bytes are split into chunks.
+    """
+    a = utils.make_temp_dir()
+    b = f'{a}/b'
+    os.makedirs(f'{b}/sub/subsub')
+    with open(f'{b}/c.txt', 'w') as f:
+        f.write('hello\n' * 1000)
+    with open(f'{b}/sub/d.bin', 'wb') as f:
+        f.write(os.urandom(100_000))
+    open(f'{b}/sub/subsub/e.txt', 'w').close()
+    
+    zipped = ziptool.compress_dir(b, f'{a}/b.zip')
+    ziptool.extract_file(zipped, f'{a}/e1/b')
+    with open(zipped, 'rb') as f:
+        data = f.read()
+    for size in (1, 7, 4096, len(data)):
+        ziptool.extract_stream(
+            (data[i:i + size] for i in range(0, len(data), size)),
+            f'{a}/e2/b',
+            overwrite=True,
+        )
+        assert _list_tree(f'{a}/e2') == _list_tree(f'{a}/e1'), size
+    print(sorted(_list_tree(f'{a}/e1')))
+
+
+def _list_tree(root: str) -> dict:
+    out = {}
+    for f in fs.findall_files(root):
+        with open(f.path, 'rb') as fh:
+            out[f.relpath] = fh.read()
+    return out
+
+
 if __name__ == '__main__':
     cli.run()